@@ -0,0 +1,92 @@
+"""
+CLI cold start benchmark.
+
+Runs metadata-only commands under `python -X importtime` and checks that their total import time stays under a
+target, and that none of them pulls in the heavy ML / vector store stack, or the ORM.
+
+Usage:
+    python benchmarks/cli_startup.py [--target-ms 300] [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Commands that never embed or search, so they should never import the modules below
+COMMANDS = {
+    "--help": ["--help"],
+    "list-docs": ["list-docs", "--limit", "1"],
+}
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "chromadb", "langchain_core", "langchain_text_splitters", "httpx", "sqlalchemy"]
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        Tuple of (total import time in ms, {top-level module: cumulative ms}, set of every imported module)
+    """
+    top_level = {}
+    modules = set()
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+
+        if not cumulative.strip().isdigit(): # Header line
+            continue
+
+        modules.add(name.strip())
+
+        # Top-level imports aren't indented, their cumulative times add up to the whole import cost
+        if name.startswith(" ") and not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative) / 1000
+
+    return sum(top_level.values()), top_level, modules
+
+def run_command(args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.cli", *args], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"`{' '.join(args)}` failed:\n{result.stdout}{result.stderr[-2000:]}")
+
+    return parse_importtime(result.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=300.0, help="Max. total import time per command")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command, the fastest one counts")
+    args = parser.parse_args()
+
+    failed = False
+
+    for name, command in COMMANDS.items():
+        # The fastest run is the least disturbed by the OS, the first one also warms the file cache
+        runs = [run_command(command) for _ in range(args.repeat)]
+        total, top_level, modules = min(runs, key=lambda run: run[0])
+
+        heavy = [module for module in HEAVY_MODULES if module in modules]
+        ok = total <= args.target_ms and not heavy
+        failed = failed or not ok
+
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<10} {total:7.1f} ms (target {args.target_ms:.0f} ms)")
+
+        for module, ms in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:5]:
+            print(f"        {ms:7.1f} ms  {module}")
+
+        if heavy:
+            print(f"        heavy modules imported: {', '.join(heavy)}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
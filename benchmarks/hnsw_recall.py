@@ -0,0 +1,64 @@
+"""
+HNSW recall benchmark.
+
+Samples stored chunk vectors as queries, searches them through Chroma's HNSW index and exactly through an exported
+snapshot (see `python -m src.cli export-snapshot`), and reports recall@k of Chroma against the exact results along
+with the search latency of both.
+
+Usage:
+    python benchmarks/hnsw_recall.py [--snapshot DIR] [--queries 200] [--k 10] [--seed 0]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config import settings
+from src.vectorstore.chroma_store import ChromaStore
+from src.vectorstore.snapshot import MemmapVectorIndex
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", type=Path, default=settings.snapshot_dir, help="Snapshot directory")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled query vectors")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = MemmapVectorIndex(args.snapshot)
+    store = ChromaStore()
+
+    if len(index) == 0:
+        sys.exit("The snapshot is empty")
+
+    if store.count() != len(index):
+        print(f"warning: the store holds {store.count()} vectors but the snapshot {len(index)}, re-export for exact numbers")
+
+    rows = np.random.default_rng(args.seed).choice(len(index), size=min(args.queries, len(index)), replace=False)
+    queries = np.asarray(index.embeddings[rows], dtype=np.float32)
+
+    start = time.perf_counter()
+    exact_rows, _ = index.search(queries, args.k)
+    exact_seconds = time.perf_counter() - start
+
+    recalls = []
+    start = time.perf_counter()
+
+    for query, expected in zip(queries, exact_rows):
+        found = {doc.metadata["chunk_id"] for doc in store.similarity_search_by_vector(query, args.k)}
+        expected = {index.chunk_id(row) for row in expected}
+        recalls.append(len(found & expected) / len(expected))
+
+    hnsw_seconds = time.perf_counter() - start
+
+    print(f"vectors          {len(index)} ({index.manifest['dim']}-dim {index.manifest['dtype']})")
+    print(f"recall@{args.k:<9} {np.mean(recalls):.4f} (min {np.min(recalls):.2f})")
+    print(f"hnsw latency     {hnsw_seconds / len(queries) * 1000:.2f} ms/query")
+    print(f"exact latency    {exact_seconds / len(queries) * 1000:.2f} ms/query (batched)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Int8 quantization recall benchmark.
+
+Compares QuantizedVectorIndex against the exact float index of the same snapshot (export it with
+`python -m src.cli export-snapshot --quantize int8`). Queries are stored vectors with a little gaussian noise, so
+they behave like unseen questions near the corpus rather than exact self-matches. Reports recall@k of the int8
+codes alone and with full precision re-scoring at several shortlist sizes, plus bytes per vector and latency.
+
+Usage:
+    python benchmarks/quantization_recall.py [--snapshot DIR] [--queries 200] [--k 10] [--noise 0.05] [--seed 0]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config import settings
+from src.vectorstore.quantization import QuantizedVectorIndex
+from src.vectorstore.snapshot import MemmapVectorIndex
+
+RESCORE_FACTORS = [0, 1, 2, 4, 8] # 0 = int8 codes only
+
+def recall(found, expected):
+    """Mean fraction of each query's exact top k that was found."""
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)]))
+
+def timed(search, *args, **kwargs):
+    start = time.perf_counter()
+    rows, _ = search(*args, **kwargs)
+
+    return rows, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", type=Path, default=settings.snapshot_dir, help="Snapshot directory, quantized with full precision kept")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--noise", type=float, default=0.05, help="Std. dev. of the noise added to each sampled vector")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    exact_index = MemmapVectorIndex(args.snapshot)
+    quantized_index = QuantizedVectorIndex(args.snapshot)
+
+    if exact_index.embeddings is None:
+        sys.exit("The snapshot has no full precision vectors to compare against, re-export it with --full-precision")
+
+    if len(exact_index) == 0:
+        sys.exit("The snapshot is empty")
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(exact_index), size=min(args.queries, len(exact_index)), replace=False)
+    queries = np.asarray(exact_index.embeddings[rows], dtype=np.float32)
+    queries += rng.normal(0, args.noise, size=queries.shape).astype(np.float32)
+
+    expected, exact_seconds = timed(exact_index.search, queries, args.k)
+
+    float_bytes = exact_index.embeddings.dtype.itemsize * exact_index.manifest["dim"]
+    int8_bytes = quantized_index.codes.dtype.itemsize * exact_index.manifest["dim"]
+
+    print(f"vectors          {len(exact_index)} ({exact_index.manifest['dim']}-dim)")
+    print(f"bytes / vector   {int8_bytes} int8 vs {float_bytes} {exact_index.embeddings.dtype.name} ({float_bytes / int8_bytes:.0f}x), {4 * exact_index.manifest['dim']} float32 in Chroma ({4 * exact_index.manifest['dim'] / int8_bytes:.0f}x)")
+    print(f"exact            {exact_seconds / len(queries) * 1000:7.2f} ms/query (batched)\n")
+    print(f"{'rescore':<10} {'recall@' + str(args.k):>10} {'ms/query':>10}")
+
+    for factor in RESCORE_FACTORS:
+        found, seconds = timed(quantized_index.search, queries, args.k, rescore_factor=factor)
+        label = "int8 only" if factor == 0 else f"{factor} x k"
+
+        print(f"{label:<10} {recall(found, expected):>10.4f} {seconds / len(queries) * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
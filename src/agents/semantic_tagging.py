@@ -1,30 +1,32 @@
+import asyncio
 import json
 import re
 
-from src.llm.client import MistralClient
+from src.config import settings
+from src.llm.client import MistralClient, AsyncMistralClient, call_chat
 from src.llm.prompts import build_tagging_prompt
 from src.db.session import get_session
 from src.db.models import Document as dbDocument
-from src.vectorstore.chroma_store import ChromaStore
+from src.db.queries import set_document_tags
 
 class SemanticTaggingAgent():
     """
     Agent that generates semantic tags for documents using LLM.
 
-    Tags are stored in the SQLite database and can be used for filtering.
+    Tags are stored in the SQLite database, both on the document and in the document_tags index used for filtering.
     """
     def __init__(self, llm_client=None, chroma_store=None):
         """
         Initialize the semantic tagging agent.
 
         Args:
-            llm_client: MistralClient instance
+            llm_client: MistralClient or AsyncMistralClient instance
             chroma_store: ChromaStore instance (optional, for updating vector metadata)
         """
         self.llm_client = llm_client or MistralClient()
         self.chroma_store = chroma_store
 
-    def run(self, document_path, document_id):
+    def run(self, document_path=None, document_id=None):
         """
         Generate and store semantic tags for a document.
 
@@ -53,29 +55,40 @@ class SemanticTaggingAgent():
             doc_path = db_doc.path
 
         if self.chroma_store:
-            chunks = self.chroma_store.get_by_metadata(filter_dict={"document_id": doc_id}, limit=10)
+            chunks = self.chroma_store.get_by_document_ids([doc_id], max_chunks=3).get(doc_id, [])
         else:
             chunks = []
 
-        if chunks:
-            document_text = "\n\n".join(chunk.page_content for chunk in chunks[:3])
-        
-        else:
-            try:
-                with open(doc_path, "r", encoding="utf-8") as f:
-                    document_text = f.read(2000) 
+        try:
+            document_text = self._document_text(chunks, doc_path)
 
-            except Exception as e:
-                return {
-                    "success": False,
-                    "error": f"Could not read document content: {e}",
-                    "tags": [],
-                }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Could not read document content: {e}",
+                "tags": [],
+            }
 
         messages = build_tagging_prompt(document_text, title)
-        response = self.llm_client.chat(messages, temperature=0.5)
+        response = call_chat(self.llm_client, messages, temperature=0.5)
+
+        result = self._tagging_result(response, doc_id, doc_path, title)
+
+        if result["success"]:
+            self._store_tags({doc_id: result["tags_str"]})
+
+        return result
+
+    def _document_text(self, chunks, doc_path):
+        """Text sent to the LLM: the first few chunks, or the start of the file when nothing is indexed."""
+        if chunks:
+            return "\n\n".join(chunk.page_content for chunk in chunks[:3])
 
-        tags = self._parse_tags(response)
+        with open(doc_path, "r", encoding="utf-8") as f:
+            return f.read(2000)
+
+    def _tagging_result(self, response, doc_id, doc_path, title):
+        tags = self.parse_tags(response)
 
         if not tags:
             return {
@@ -85,24 +98,26 @@ class SemanticTaggingAgent():
                 "tags": [],
             }
 
-        tags_str = ",".join(tags)
-
-        with get_session() as session:
-            db_doc = session.query(dbDocument).filter(dbDocument.id == doc_id).first()
-            
-            if db_doc:
-                db_doc.tags = tags_str
-                session.commit()
-
         return {
             "success": True,
             "document_id": doc_id,
             "document_path": doc_path,
             "title": title,
             "tags": tags,
-            "tags_str": tags_str,
+            "tags_str": ",".join(tags),
         }
 
+    def _store_tags(self, tags_by_id):
+        """Write tag strings and the tag index rows for many documents in one transaction."""
+        if not tags_by_id:
+            return
+
+        with get_session() as session:
+            for db_doc in session.query(dbDocument).filter(dbDocument.id.in_(list(tags_by_id))).all():
+                db_doc.tags = tags_by_id[db_doc.id]
+
+            set_document_tags(session, tags_by_id)
+
     def parse_tags(self, response):
         """
         Parse tags from LLM response.
@@ -139,44 +154,128 @@ class SemanticTaggingAgent():
 
         return []
 
-    def tag_all_documents(self, document_type):
+    def tag_all_documents(self, document_type=None, concurrency=None, batch_size=None, resume=True, on_progress=None):
         """
         Generate tags for all documents (or filtered by type).
 
+        Documents are handled in batches: chunk text for the whole batch is fetched in one Chroma query,
+        LLM calls run concurrently, and the batch's tags are committed in one transaction. Finished ids are
+        checkpointed after every batch, so an interrupted run picks up where it stopped.
+
         Args:
             document_type: Optional filter by document type
+            concurrency: Max. LLM calls in flight (defaults to llm_max_concurrency)
+            batch_size: Documents per batch (defaults to tagging_batch_size)
+            resume: Skip documents finished by an earlier, interrupted run
+            on_progress: Optional callback, called as on_progress(finished, total) after each batch
 
         Returns:
             Dictionary with statistics
         """
-        stats = {"total": 0, "success": 0, "failed": 0, "errors": []}
+        stats = {"total": 0, "success": 0, "failed": 0, "skipped": 0, "errors": []}
+        batch_size = batch_size or settings.tagging_batch_size
 
         with get_session() as session:
 
-            query = session.query(dbDocument)
+            query = session.query(dbDocument.id, dbDocument.path, dbDocument.title)
 
             if document_type:
                 query = query.filter(dbDocument.document_type == document_type)
 
-            documents = query.all()
+            documents = query.order_by(dbDocument.id).all()
             stats["total"] = len(documents)
 
-        for db_doc in documents:
+        done = self._load_checkpoint(document_type) if resume else set()
+        documents = [doc for doc in documents if doc.id not in done]
+        stats["skipped"] = stats["total"] - len(documents)
+
+        client = AsyncMistralClient.from_client(self.llm_client, max_concurrency=concurrency)
+
+        async def tag_batches():
+            if on_progress:
+                on_progress(0, len(documents))
+
+            async with client:
+                for start in range(0, len(documents), batch_size):
+                    batch = documents[start:start + batch_size]
+                    tagged_ids = await self._tag_batch(client, batch, stats)
+
+                    done.update(tagged_ids) # Failed documents are retried on resume
+                    self._save_checkpoint(document_type, done)
+
+                    if on_progress:
+                        on_progress(len(batch), len(documents))
+
+        asyncio.run(tag_batches())
+        self._clear_checkpoint()
+
+        return stats
+
+    async def _tag_batch(self, client, batch, stats):
+        """Tags one batch of documents, returns the ids that were tagged successfully."""
+        if self.chroma_store:
+            chunks_by_id = await asyncio.to_thread(self.chroma_store.get_by_document_ids, [doc.id for doc in batch], 3)
+        else:
+            chunks_by_id = {}
+
+        prompts = []
+        failed = []
+
+        for doc in batch:
             try:
-                result = self.run(document_id=db_doc.id)
-                
-                if result["success"]:
-                    stats["success"] += 1
-                
-                else:
-                    stats["failed"] += 1
-                    stats["errors"].append(
-                        {"document_id": db_doc.id, "error": result.get("error", "Unknown error"),}
-                    )
+                document_text = self._document_text(chunks_by_id.get(doc.id), doc.path)
+                prompts.append((doc, build_tagging_prompt(document_text, doc.title)))
 
             except Exception as e:
-                stats["failed"] += 1
-                stats["errors"].append({"document_id": db_doc.id, "error": str(e)})
+                failed.append({"document_id": doc.id, "error": f"Could not read document content: {e}"})
 
-        return stats
+        responses = await client.chat_many([messages for _, messages in prompts], temperature=0.5)
+        results = []
+
+        for (doc, _), response in zip(prompts, responses):
+            if isinstance(response, Exception):
+                failed.append({"document_id": doc.id, "error": str(response)})
+                continue
+
+            result = self._tagging_result(response, doc.id, doc.path, doc.title)
+
+            if result["success"]:
+                results.append(result)
+            else:
+                failed.append({"document_id": doc.id, "error": result.get("error", "Unknown error")})
+
+        await asyncio.to_thread(self._store_tags, {result["document_id"]: result["tags_str"] for result in results})
+
+        stats["success"] += len(results)
+        stats["failed"] += len(failed)
+        stats["errors"].extend(failed)
+
+        return [result["document_id"] for result in results]
+
+    def _load_checkpoint(self, document_type):
+        path = settings.tagging_checkpoint_path
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return set()
+
+        if checkpoint.get("document_type") != document_type:
+            return set() # Left over from a run over a different set of documents
+
+        return set(checkpoint.get("done", []))
+
+    def _save_checkpoint(self, document_type, done):
+        path = settings.tagging_checkpoint_path
+        tmp_path = path.with_suffix(".tmp")
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"document_type": document_type, "done": sorted(done)}, f)
+
+        tmp_path.replace(path) # Atomic, a crash never leaves a half written checkpoint
+
+    def _clear_checkpoint(self):
+        settings.tagging_checkpoint_path.unlink(missing_ok=True)
 
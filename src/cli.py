@@ -1,15 +1,13 @@
 from pathlib import Path
+from typing import List
+
 import typer
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 
-from .config import settings
-from .db.session import init_db
-from .ingestion.pipeline import IngestionPipeline
-from .rag.answer_engine import AnswerEngine
-from .agents.semantic_tagging import SemanticTaggingAgent
-from .vectorstore.chroma_store import ChromaStore
+# Everything heavy (torch, chromadb, langchain, sqlalchemy) is imported inside the commands that need it,
+# so --help and metadata-only commands start fast. benchmarks/cli_startup.py keeps an eye on this.
 
 app = typer.Typer(name="brainy-binder", help="Privacy-first local AI knowledge assistant", add_completion=False)
 console = Console()
@@ -18,10 +16,14 @@ console = Console()
 def ingest(
     data_dir: Path = typer.Option(None, "--data-dir"),
     reset_index: bool = typer.Option(False, "--reset-index"),
+    reset_shard: List[str] = typer.Option(None, "--reset-shard", help="Rebuild only this vector store shard (repeatable)"),
 ):    
     
     """Ingest documents from a directory into the knowledge base."""
 
+    from .config import settings
+    from .db.session import init_db
+    from .ingestion.pipeline import IngestionPipeline
     
     console.print(Panel.fit("[bold cyan]Brainy Binder - Document Ingestion[/bold cyan]", border_style="cyan"))
 
@@ -34,7 +36,7 @@ def ingest(
         raise typer.Exit(code=1)
 
     try:
-        pipeline = IngestionPipeline(data_dir=data_directory, reset_index=reset_index)
+        pipeline = IngestionPipeline(data_dir=data_directory, reset_index=reset_index, reset_shards=reset_shard)
         stats = pipeline.run()
 
         if stats["files_processed"] > 0:
@@ -50,22 +52,54 @@ def ingest(
 @app.command()
 def query(
     question=typer.Argument(..., help="Question to ask"),
-    top_k=typer.Option(None, "--top-k", "-k", help="Number of source documents to retrieve"),
+    top_k: int = typer.Option(None, "--top-k", "-k", help="Number of source documents to retrieve"),
+    mmr: bool = typer.Option(False, "--mmr", help="Re-select diverse sources with Maximal Marginal Relevance"),
+    rerank: bool = typer.Option(None, "--rerank/--no-rerank", help="Re-score sources with a cross-encoder (default from settings)"),
+    tag: List[str] = typer.Option(None, "--tag", help="Only search documents with this tag (repeat to require several)"),
     show_sources: bool = typer.Option(True, "--show-sources/--no-sources", help="Show source documents"),
 ):
     
     """Ask a question and get an answer from your knowledge base."""
 
-    init_db()
+    from rich.live import Live
+    from .server.client import connect_daemon
+
     console.print(f"\n[cyan]Question:[/cyan] {question}\n")
 
     try:
-        engine = AnswerEngine(top_k=top_k)
+        filter_dict = None
+
+        if tag:
+            # Resolved through the tag index here, the search itself only sees a document_id pre-filter
+            from .db.queries import tag_filter
+
+            filter_dict = tag_filter(tag)
+
+            if filter_dict is None:
+                console.print(f"[yellow]No documents tagged {', '.join(tag)}.[/yellow]")
+                return
+
+        daemon = connect_daemon()
+        search_type = "mmr" if mmr else None
+
+        with console.status("[bold cyan]Searching knowledge base...[/bold cyan]"):
+            if daemon is not None:
+                tokens, sources = daemon.query(question, top_k=top_k, filter_dict=filter_dict, search_type=search_type, rerank=rerank)
+
+            else:
+                from .db.session import init_db
+                from .rag.answer_engine import AnswerEngine
+
+                init_db()
+                engine = AnswerEngine(top_k=top_k, search_type=search_type, rerank=rerank)
+                tokens, sources = engine.answer_question_stream(question, top_k=top_k, filter_dict=filter_dict)
 
-        with console.status("[bold cyan]Searching and generating answer...[/bold cyan]"):
-            answer, sources = engine.answer_question(question, top_k=top_k)
+        answer = ""
 
-        console.print(Panel(answer, title="[bold green]Answer[/bold green]", border_style="green"))
+        with Live(Panel("[dim]Generating answer...[/dim]", title="[bold green]Answer[/bold green]", border_style="green"), console=console, refresh_per_second=12) as live:
+            for token in tokens:
+                answer += token
+                live.update(Panel(answer, title="[bold green]Answer[/bold green]", border_style="green"))
 
         if show_sources and sources:
             console.print("\n[bold cyan]Sources:[/bold cyan]\n")
@@ -97,20 +131,30 @@ def summarize(
     
     """Summarize a specific document."""
 
+    from .server.client import connect_daemon
+
     if not path and not doc_id:
         console.print("[red]Error: Must provide either --path or --doc-id[/red]")
         raise typer.Exit(code=1)
 
-    init_db()
-
     try:
-        engine = AnswerEngine()
+        daemon = connect_daemon()
 
         with console.status("[bold cyan]Generating summary...[/bold cyan]"):
-            summary = engine.summarize_document(document_path=path, document_id=doc_id)
+            if daemon is not None:
+                result = daemon.summarize(document_path=path, document_id=doc_id)
+                summary, title = result["summary"], result["title"]
+
+            else:
+                from .db.session import init_db
+                from .rag.answer_engine import AnswerEngine
+
+                init_db()
+                engine = AnswerEngine()
+                summary = engine.summarize_document(document_path=path, document_id=doc_id)
 
-        doc_info = engine.get_document_info(document_path=path, document_id=doc_id)
-        title = doc_info["title"] if doc_info else "Document"
+                doc_info = engine.get_document_info(document_path=path, document_id=doc_id)
+                title = doc_info["title"] if doc_info else "Document"
 
         console.print(Panel(summary, title=f"[bold green]Summary: {title}[/bold green]", border_style="green"))
 
@@ -126,17 +170,25 @@ def tag_doc(
     
     """Generate semantic tags for a document."""
 
+    from .server.client import connect_daemon
+
     if not path and not doc_id:
         console.print("[red]Error: Must provide either --path or --doc-id[/red]")
         raise typer.Exit(code=1)
 
-    init_db()
-
     try:
-        agent = SemanticTaggingAgent()
+        daemon = connect_daemon()
 
         with console.status("[bold cyan]Generating tags...[/bold cyan]"):
-            result = agent.run(document_path=path, document_id=doc_id)
+            if daemon is not None:
+                result = daemon.tag(document_path=path, document_id=doc_id)
+
+            else:
+                from .db.session import init_db
+                from .agents.semantic_tagging import SemanticTaggingAgent
+
+                init_db()
+                result = SemanticTaggingAgent().run(document_path=path, document_id=doc_id)
 
         if result["success"]:
             console.print(f"\n[bold green]✓ Tags generated for: {result['title']}[/bold green]\n")
@@ -150,12 +202,54 @@ def tag_doc(
         console.print(f"[red]Error: {e}[/red]")
         raise typer.Exit(code=1)
 
+@app.command()
+def tag_all(
+    doc_type=typer.Option(None, "--type", "-t", help="Only tag documents of this type (note, pdf, word)"),
+    concurrency: int = typer.Option(None, "--concurrency", "-c", help="Max. LLM requests in flight"),
+    restart: bool = typer.Option(False, "--restart", help="Ignore the checkpoint of an interrupted run"),
+):
+
+    """Generate semantic tags for every document, resuming an interrupted run."""
+
+    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
+    from .db.session import init_db
+    from .agents.semantic_tagging import SemanticTaggingAgent
+    from .vectorstore.chroma_store import ChromaStore
+
+    init_db()
+
+    try:
+        agent = SemanticTaggingAgent(chroma_store=ChromaStore())
+
+        with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), BarColumn(), TextColumn("{task.completed}/{task.total}"), console=console) as progress:
+            task = progress.add_task("Tagging documents...", total=None)
+
+            def on_progress(finished, total):
+                progress.update(task, total=total, advance=finished)
+
+            stats = agent.tag_all_documents(document_type=doc_type, concurrency=concurrency, resume=not restart, on_progress=on_progress)
+
+        console.print(f"\n[bold green]✓ Tagged {stats['success']} of {stats['total']} documents[/bold green]")
+
+        if stats["skipped"]:
+            console.print(f"[cyan]Skipped {stats['skipped']} documents finished by an earlier run[/cyan]")
+
+        if stats["failed"]:
+            console.print(f"[yellow]{stats['failed']} documents failed:[/yellow]")
+
+            for error in stats["errors"][:10]:
+                console.print(f"  [dim]{error['document_id']}: {error['error']}[/dim]")
+
+    except Exception as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(code=1)
+
 @app.command()
 def chat():
 
     """Start an interactive chat session."""
 
-    init_db()
+    from .server.client import connect_daemon
 
     console.print(
         Panel.fit(
@@ -166,7 +260,17 @@ def chat():
         )
     )
 
-    engine = AnswerEngine()
+    daemon = connect_daemon()
+
+    if daemon is not None:
+        ask = daemon.query
+
+    else:
+        from .db.session import init_db
+        from .rag.answer_engine import AnswerEngine
+
+        init_db()
+        ask = AnswerEngine().answer_question_stream
 
     while True:
         console.print()
@@ -181,9 +285,14 @@ def chat():
 
         try:
             with console.status("[bold cyan]Thinking...[/bold cyan]"):
-                answer, sources = engine.answer_question(question)
+                tokens, sources = ask(question)
 
-            console.print(f"\n[bold green]Brainy Binder:[/bold green] {answer}\n")
+            console.print("\n[bold green]Brainy Binder:[/bold green] ", end="")
+
+            for token in tokens:
+                console.print(token, end="", markup=False, highlight=False)
+
+            console.print("\n")
 
             if sources:
                 console.print("[dim]Sources:[/dim]")
@@ -201,15 +310,25 @@ def chat():
 def list_docs(
     doc_type=typer.Option(None, "--type", "-t", help="Filter by document type (note, pdf, bookmark)"),
     limit=typer.Option(50, "--limit", "-n", help="Maximum number of documents to show"),
+    tag: List[str] = typer.Option(None, "--tag", help="Only show documents with this tag (repeat to require several)"),
 ):
     
     """List indexed documents."""
 
-    init_db()
+    # Metadata only, read with plain sqlite3 so the ORM isn't imported
+    from .db.readonly import DatabaseNotReady, list_documents
 
     try:
-        engine = AnswerEngine()
-        documents = engine.list_documents(document_type=doc_type, limit=limit)
+        try:
+            documents = list_documents(document_type=doc_type, limit=limit, tags=tag)
+
+        except DatabaseNotReady:
+            # First run or an older database, init_db creates / migrates the tables
+            from .db.session import init_db
+            from .db import queries
+
+            init_db()
+            documents = queries.list_documents(document_type=doc_type, limit=limit, tags=tag)
 
         if not documents:
             console.print("[yellow]No documents found.[/yellow]")
@@ -236,11 +355,77 @@ def list_docs(
         console.print(f"[red]Error: {e}[/red]")
         raise typer.Exit(code=1)
 
+@app.command()
+def serve():
+
+    """Keep the models and stores warm and answer CLI requests over a local socket."""
+
+    from .config import settings
+    from .db.session import init_db
+    from .server.client import DaemonClient
+    from .server.daemon import BrainyBinderDaemon
+
+    if DaemonClient().is_running():
+        console.print(f"[yellow]A daemon is already listening on {settings.daemon_socket_path}[/yellow]")
+        raise typer.Exit(code=1)
+
+    init_db()
+
+    with console.status("[bold cyan]Loading models...[/bold cyan]"):
+        daemon = BrainyBinderDaemon()
+        daemon.warm_up()
+
+    console.print(f"[green]Listening on {daemon.socket_path}[/green] [dim](Ctrl+C to stop)[/dim]")
+    daemon.run()
+
+@app.command()
+def export_snapshot(
+    out_dir: Path = typer.Option(None, "--out", "-o", help="Snapshot directory (default from settings)"),
+    dtype=typer.Option(None, "--dtype", help="float16 (half the size) or float32 vectors"),
+    quantize=typer.Option(None, "--quantize", help="Also write int8 scalar-quantized vectors (default from settings)"),
+    full_precision: bool = typer.Option(True, "--full-precision/--no-full-precision", help="Keep the float vectors used to re-score int8 results"),
+):
+
+    """Export every embedding to a memory-mappable snapshot for read-only search and evaluation."""
+
+    from .config import settings
+    from .vectorstore.chroma_store import ChromaStore
+    from .vectorstore.snapshot import export_snapshot as write_snapshot
+
+    out_dir = Path(out_dir or settings.snapshot_dir).expanduser().resolve()
+    quantize = quantize or settings.snapshot_quantization
+
+    if quantize not in ("", "int8"):
+        console.print(f"[red]Error: Unsupported quantization: {quantize} (use int8)[/red]")
+        raise typer.Exit(code=1)
+
+    try:
+        with console.status("[bold cyan]Exporting embeddings...[/bold cyan]"):
+            manifest = write_snapshot(ChromaStore(), out_dir, dtype=dtype)
+
+            if quantize == "int8":
+                from .vectorstore.quantization import quantize_snapshot
+
+                manifest = quantize_snapshot(out_dir, keep_full_precision=full_precision)
+
+        size_mb = sum(path.stat().st_size for path in Path(out_dir).iterdir()) / (1024 * 1024)
+        formats = ([manifest["dtype"]] if full_precision or not quantize else []) + ([quantize] if quantize else [])
+        console.print(f"[green]Exported {manifest['count']} vectors ({manifest['dim']}-dim {' + '.join(formats)}, {size_mb:.1f} MB) to {out_dir}[/green]")
+
+    except Exception as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(code=1)
+
 @app.command()
 def info():
     
     """Show configuration and basic stats."""
 
+    from .config import settings
+    from .db.session import init_db
+    from .db.queries import list_documents
+    from .vectorstore.chroma_store import ChromaStore
+
     console.print(Panel.fit("[bold cyan]Brainy Binder - System Information[/bold cyan]", border_style="cyan"))
 
     info_table = Table(show_header=False, box=None)
@@ -266,14 +451,17 @@ def info():
         chroma_store = ChromaStore()
         vector_count = chroma_store.count()
 
-        engine = AnswerEngine()
-        documents = engine.list_documents(limit=10000)
+        documents = list_documents(limit=10000)
         doc_count = len(documents)
 
         console.print(f"\n[bold]Statistics:[/bold]")
         console.print(f"  Indexed documents: [green]{doc_count}[/green]")
         console.print(f"  Vector chunks: [green]{vector_count}[/green]")
 
+        if chroma_store.shard_by:
+            for shard, count in chroma_store.shard_counts().items():
+                console.print(f"    Shard {shard}: [green]{count}[/green]")
+
     except Exception as e:
         console.print(f"\n[yellow]Could not load statistics: {e}[/yellow]")
 
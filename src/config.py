@@ -12,15 +12,69 @@ class Settings(BaseSettings):
     llm_temp: float = Field(0.7, ge=0.0, le=2.0)
     llm_max_tokens: int = Field (2048, gt=0)
     llm_timeout: int = Field(120, gt=0)
+    llm_max_retries: int = Field(3, ge=0) # Retries on timeouts, connection errors, 429 and 5xx
+    llm_backoff_base: float = Field(0.5, gt=0) # Seconds, doubled on every retry
+    llm_backoff_max: float = Field(8.0, gt=0)
+    llm_max_concurrency: int = Field(4, gt=0) # In-flight requests for the async client
 
     data_dir: Path = BASE_DIR / "data"
     chroma_db_dir: Path = BASE_DIR / "chroma_db"
     sqlite_db_path: Path = BASE_DIR / "src" / "db" / "brainy_binder.db"
+    sqlite_cache_size_mb: int = Field(64, gt=0) # Page cache per connection
+    sqlite_mmap_size_mb: int = Field(256, ge=0) # Memory mapped reads, 0 turns them off
+    sqlite_busy_timeout_ms: int = Field(5000, ge=0)
+    sqlite_write_batch: int = Field(500, gt=0) # Document rows written per transaction
 
     embedding_model_name: str = "all-MiniLM-L6-v2"
     top_k: int = Field(5, gt=0)
+    search_type: str = "similarity" # "similarity" or "mmr"
+    mmr_fetch_k: int = Field(20, gt=0) # Candidates over-fetched for MMR re-selection
+    mmr_lambda: float = Field(0.5, ge=0.0, le=1.0) # 1 = pure relevance, 0 = pure diversity
+    hybrid_search: bool = True # Fuse BM25 keyword matches with the vector results
+    rrf_k: int = Field(60, gt=0) # Reciprocal rank fusion damping constant
+    rerank: bool = False # Re-score retrieved chunks with a cross-encoder
+    reranker_model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_fetch_k: int = Field(20, gt=0) # Candidates retrieved for the cross-encoder to choose from
+    rerank_batch_size: int = Field(32, gt=0)
+    rerank_latency_budget_ms: int = Field(300, gt=0) # Reranking is skipped when scoring is expected to take longer
+    rerank_cache_size: int = Field(4096, gt=0) # (query, chunk) scores kept in memory
+    rerank_probe_pairs: int = Field(2, gt=0) # Pairs scored to measure the cross-encoder's speed when there's no estimate
+    rerank_probe_interval: int = Field(10, gt=0) # While over budget, every n-th call re-measures the speed on a sample
+    context_token_budget: int = Field(3000, gt=0) # Max. tokens of retrieved context packed into a RAG prompt
     chunk_size: int = Field(1000, gt=0) # Max size of chunks in charactors
     chunk_overlap: int = Field(300, ge=0)
+    chunking_mode: str = "plain" # "plain" splits every file the same way, "structured" cuts markdown and Word files on headings
+    chunk_length_unit: str = "chars" # How plain chunks are measured: "chars" (chunk_size) or "tokens" (chunk_tokens)
+    chunk_tokens: int = Field(200, gt=0) # Max. embedding model tokens per chunk, for structured chunks and the tokens unit
+    chunk_overlap_tokens: int = Field(30, ge=0)
+    embedding_max_tokens: int = Field(256, gt=0) # Input length the embedding model reads, the rest is truncated
+    oversized_chunks: str = "ignore" # Chunks longer than embedding_max_tokens: "ignore", "warn" or "split" (the last two load the tokenizer in every ingest worker)
     chroma_collection_name: str = "brainy_binder"
+    chroma_shard_by: str = "" # Metadata key chunks are routed to one collection per value by, e.g. "document_type" (empty keeps one collection, re-ingest with --reset-index after changing)
+    chroma_shard_groups: dict[str, str] = {} # Optional value -> shard name map to put several values in one shard, e.g. {"pdf": "office", "word": "office"}
+    chroma_shard_workers: int = Field(4, gt=0) # Threads a query fans out over shards with
+    snapshot_dir: Path = BASE_DIR / "snapshot" # Where export-snapshot writes the memory-mappable embedding snapshot
+    snapshot_dtype: str = "float16" # "float16" or "float32" snapshot vectors
+    snapshot_block_rows: int = Field(65_536, gt=0) # Rows scored per matrix product by the snapshot index
+    snapshot_quantization: str = "" # "int8" also writes scalar-quantized codes with export-snapshot
+    quantized_rescore_factor: int = Field(4, ge=0) # Int8 shortlist of k * this re-scored at full precision, 0 disables
+    response_cache_enabled: bool = True # Reuse answers and summaries for identical prompts
+    response_cache_max_entries: int = Field(10_000, gt=0) # Least recently used responses are evicted past this
+    summary_group_tokens: int = Field(3000, gt=0) # Max. tokens of text summarized in one LLM call
+    tagging_batch_size: int = Field(32, gt=0) # Documents prefetched and committed together by tag-all
+    tagging_checkpoint_path: Path = BASE_DIR / ".tagging_checkpoint.json"
+
+    ingest_workers: int = Field(4, gt=0) # Processes used for loading and chunking files
+    ingest_queue_size: int = Field(32, gt=0) # Max chunked files waiting to be embedded (backpressure)
+    embedding_batch_size: int = Field(512, gt=0) # Chunks embedded together, across file boundaries
+    stream_threshold_mb: int = Field(32, gt=0) # Files at least this big are streamed in parts instead of loaded whole
+    stream_threshold_pages: int = Field(200, gt=0) # PDFs with at least this many pages are streamed too, whatever their size
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = Field(500_000, gt=0) # Least recently used vectors are evicted past this
+    query_cache_size: int = Field(1024, gt=0) # Query embeddings kept in memory
+    query_cache_ttl: int = Field(3600, gt=0) # Seconds before a cached query embedding expires
+
+    daemon_socket_path: Path = BASE_DIR / ".brainy_binder.sock" # Unix socket of `serve`
+    use_daemon: bool = True # CLI commands go through a running `serve` process when there is one
 
 settings = Settings()
\ No newline at end of file
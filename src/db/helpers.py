@@ -0,0 +1,75 @@
+import threading
+
+from sqlalchemy import func, select, tuple_
+
+BATCH_SIZE = 500 # Keeps IN (...) lists under SQLite's variable limit
+
+def batched(items, size=BATCH_SIZE):
+    """Consecutive slices of items, each short enough for one IN (...) list."""
+    items = list(items)
+
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class LRUEviction:
+    """
+    Keeps a SQLite cache table under max_entries rows by evicting the least recently used ones.
+
+    The table needs a last_used column. Its size is counted once, on the first write, then tracked in memory,
+    so writes don't pay for a COUNT(*). Once it grows past the limit, the oldest rows are evicted down to 90% of
+    it, so we don't evict on every single write.
+    """
+    def __init__(self, model, key_columns, max_entries, delete=None):
+        """
+        Args:
+            model: ORM class of the cache table
+            key_columns: Columns that identify a row, e.g. [Entry.key]
+            max_entries: Row limit
+            delete: Optional delete(session, keys) that also removes rows linked to the evicted keys, keys are
+                single values for one key column and tuples for several
+        """
+        self.model = model
+        self.key_columns = list(key_columns)
+        self.max_entries = max_entries
+        self.delete = delete or self.delete_rows
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def added(self, session, n):
+        """
+        Record n new rows written in this session, and evict if the table grew past max_entries.
+
+        Args:
+            session: Session the rows were inserted in
+            n: Number of new rows, over-counting (e.g. overwrites) only makes eviction a bit early
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = session.query(func.count()).select_from(self.model).scalar() # Includes the new rows
+
+            else:
+                self._entries += n
+
+            overflow = self._entries - self.max_entries
+
+        if overflow <= 0:
+            return
+
+        oldest = select(*self.key_columns).order_by(self.model.last_used).limit(overflow + self.max_entries // 10)
+        keys = [row[0] if len(self.key_columns) == 1 else tuple(row) for row in session.execute(oldest)]
+        self.delete(session, keys)
+
+        with self._lock:
+            self._entries -= len(keys)
+
+    def reset(self, entries=None):
+        """Forget the tracked size after rows were deleted elsewhere, None recounts on the next write."""
+        with self._lock:
+            self._entries = entries
+
+    def delete_rows(self, session, keys):
+        key = self.key_columns[0] if len(self.key_columns) == 1 else tuple_(*self.key_columns)
+
+        # Composite keys take one variable per column
+        for batch in batched(keys, BATCH_SIZE // len(self.key_columns)):
+            session.query(self.model).filter(key.in_(batch)).delete(synchronize_session=False)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, DateTime, Text, Integer
+from sqlalchemy import String, DateTime, Text, Integer, Float, LargeBinary
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 class Base(DeclarativeBase):
@@ -14,6 +14,7 @@ class Document(Base):
     Document metadata model.    
 
     Stored metadata about documents such as path, type, title, timestamps and tags.
+    File size, mtime and content hash are kept so unchanged files can be skipped on re-ingest.
     """
 
     __tablename__ = "Documents"
@@ -25,4 +26,68 @@ class Document(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     tags: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
\ No newline at end of file
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    file_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    file_mtime: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True) # sha256 of the raw file
+
+class EmbeddingCacheEntry(Base):
+    """
+    Cached chunk embedding.
+
+    Keyed on the embedding model and the sha256 of the chunk text, so identical chunks are only embedded once.
+    """
+
+    __tablename__ = "embedding_cache"
+
+    model_name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    text_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False) # float32 bytes
+    last_used: Mapped[float] = mapped_column(Float, nullable=False, index=True) # Unix time, used for LRU eviction
+
+class LexicalChunk(Base):
+    """
+    Row mapping for the chunks_fts full text index.
+
+    Each chunk's rowid in chunks_fts is this id, the document_id index makes per-document deletes cheap.
+    """
+
+    __tablename__ = "lexical_chunks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    chunk_id: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    document_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+
+class ResponseCacheEntry(Base):
+    """
+    Cached LLM response, keyed by a hash of everything that determines the output.
+    """
+
+    __tablename__ = "response_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used: Mapped[Optional[float]] = mapped_column(Float, nullable=True, index=True) # Unix time, used for LRU eviction
+
+class ResponseCacheDocument(Base):
+    """
+    Links a cached response to the documents its prompt was built from, so it can be dropped when they change.
+    """
+
+    __tablename__ = "response_cache_documents"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    document_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+
+class DocumentTag(Base):
+    """
+    One semantic tag of a document.
+
+    Normalized copy of Document.tags, the tag index answers tag -> documents without scanning every tag string.
+    """
+
+    __tablename__ = "document_tags"
+
+    document_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tag: Mapped[str] = mapped_column(String(255), primary_key=True, index=True)
@@ -0,0 +1,167 @@
+from sqlalchemy import func, insert, text
+
+from .helpers import BATCH_SIZE
+from .session import get_session
+from .models import Document, DocumentTag
+from .readonly import list_documents_sql, normalize_tag, tagged_documents_sql
+
+def parse_tag_string(tags):
+    """Splits a comma-joined Document.tags string into unique normalized tags."""
+    return list(dict.fromkeys(normalize_tag(tag) for tag in (tags or "").split(",") if tag.strip()))
+
+def get_document_info(document_path=None, document_id=None):
+    """
+    Look up one document's metadata by id or path.
+
+    Returns:
+        Dictionary of the document's fields, or None if it isn't indexed
+    """
+    with get_session() as session:
+        if document_id:
+            db_doc = session.query(Document).filter(Document.id == document_id).first()
+
+        elif document_path:
+            db_doc = session.query(Document).filter(Document.path == document_path).first()
+
+        else:
+            raise ValueError("Must provide either document_path or document_id")
+
+        if not db_doc:
+            return None
+
+        return {
+            "id": db_doc.id,
+            "path": db_doc.path,
+            "document_type": db_doc.document_type,
+            "title": db_doc.title,
+            "tags": db_doc.tags,
+            "description": db_doc.description,
+            "created_at": db_doc.created_at,
+            "updated_at": db_doc.updated_at,
+        }
+
+def list_documents(document_type=None, limit=100, tags=None):
+    """
+    List indexed documents, optionally of one type or carrying all the given tags.
+
+    Only touches SQLite, so it is cheap enough for commands that never load the vector store. The SQL is shared
+    with readonly.list_documents, which list-docs uses to skip importing the ORM.
+    """
+    sql, params = list_documents_sql(document_type, limit, tags)
+
+    with get_session() as session:
+        return [dict(row) for row in session.execute(text(sql), params).mappings()]
+
+
+def document_ids_for_tags(tags):
+    """
+    Look up the documents tagged with every one of the tags.
+
+    Args:
+        tags: Tag strings, matched case-insensitively
+
+    Returns:
+        Sorted list of document ids
+    """
+    sql, params = tagged_documents_sql(tags)
+
+    with get_session() as session:
+        return sorted(row.document_id for row in session.execute(text(sql), params))
+
+def tag_filter(tags, filter_dict=None):
+    """
+    Chroma style where filter restricting a search to the documents tagged with every one of the tags.
+
+    Args:
+        tags: Tag strings
+        filter_dict: Optional filter to combine with
+
+    Returns:
+        The filter, or None if no document carries the tags (so there's nothing to search)
+    """
+    document_ids = document_ids_for_tags(tags)
+
+    if not document_ids:
+        return None
+
+    tag_where = {"document_id": {"$in": document_ids}}
+
+    return {"$and": [filter_dict, tag_where]} if filter_dict else tag_where
+
+def get_document_tags(document_ids):
+    """
+    Tags of many documents.
+
+    Returns:
+        Dictionary mapping each document id to its list of tags
+    """
+    tags_by_id = {document_id: [] for document_id in document_ids}
+
+    with get_session() as session:
+        for start in range(0, len(document_ids), BATCH_SIZE):
+            rows = session.query(DocumentTag).filter(DocumentTag.document_id.in_(document_ids[start:start + BATCH_SIZE])).all()
+
+            for row in rows:
+                tags_by_id[row.document_id].append(row.tag)
+
+    return tags_by_id
+
+def list_tags(limit=100):
+    """
+    Tags in use, most common first.
+
+    Returns:
+        List of (tag, document count) tuples
+    """
+    with get_session() as session:
+        count = func.count(DocumentTag.document_id)
+        rows = session.query(DocumentTag.tag, count).group_by(DocumentTag.tag).order_by(count.desc(), DocumentTag.tag).limit(limit).all()
+
+        return [(row[0], row[1]) for row in rows]
+
+def set_document_tags(session, tags_by_id):
+    """
+    Replace the indexed tags of many documents, inside the caller's transaction.
+
+    Args:
+        session: Open database session
+        tags_by_id: Dictionary mapping document id to a comma-joined tag string
+    """
+    document_ids = list(tags_by_id)
+    delete_document_tags(session, document_ids)
+
+    rows = [
+        {"document_id": document_id, "tag": tag}
+        for document_id, tags in tags_by_id.items()
+        for tag in parse_tag_string(tags)
+    ]
+
+    if rows:
+        session.execute(insert(DocumentTag), rows)
+
+def delete_document_tags(session, document_ids=None):
+    """Drop the indexed tags of some documents, or of all of them, inside the caller's transaction."""
+    if document_ids is None:
+        session.query(DocumentTag).delete()
+        return
+
+    for start in range(0, len(document_ids), BATCH_SIZE):
+        session.query(DocumentTag).filter(
+            DocumentTag.document_id.in_(document_ids[start:start + BATCH_SIZE])
+        ).delete(synchronize_session=False)
+
+def backfill_document_tags():
+    """
+    Fill the tag index from Document.tags for databases tagged before the index existed.
+
+    Returns:
+        Number of documents indexed
+    """
+    with get_session() as session:
+        if session.query(DocumentTag.document_id).first() is not None:
+            return 0
+
+        rows = session.query(Document.id, Document.tags).filter(Document.tags.isnot(None), Document.tags != "").all()
+        set_document_tags(session, {row.id: row.tags for row in rows})
+
+        return len(rows)
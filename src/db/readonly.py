@@ -0,0 +1,95 @@
+import sqlite3
+
+from src.config import settings
+
+# Metadata reads without the ORM. sqlalchemy takes longer to import than the CLI's startup target, so the SQL of
+# these queries is built here once: list-docs runs it on a plain read-only sqlite3 connection, queries.py runs the
+# same SQL through a session.
+
+class DatabaseNotReady(Exception):
+    """The database file or one of its tables doesn't exist yet, init_db has to run first."""
+
+def normalize_tag(tag):
+    """Tags are matched case-insensitively and without surrounding whitespace."""
+    return tag.strip().lower()
+
+def tagged_documents_sql(tags):
+    """
+    SQL selecting the ids of documents that carry every one of the tags, served by the tag index.
+
+    Returns:
+        Tuple of (SQL string, dictionary of named parameters)
+    """
+    tags = list(dict.fromkeys(normalize_tag(tag) for tag in tags))
+    names = [f"tag_{i}" for i in range(len(tags))]
+
+    sql = (
+        f"SELECT document_id FROM document_tags WHERE tag IN ({', '.join(':' + name for name in names)}) "
+        "GROUP BY document_id HAVING COUNT(tag) = :tag_count"
+    )
+
+    return sql, dict(zip(names, tags), tag_count=len(tags))
+
+def list_documents_sql(document_type=None, limit=100, tags=None):
+    """
+    SQL listing indexed documents, optionally of one type or carrying all the given tags.
+
+    Returns:
+        Tuple of (SQL string, dictionary of named parameters), rows have id, path, document_type, title and tags
+    """
+    sql = "SELECT id, path, document_type, title, tags FROM Documents"
+    conditions = []
+    params = {}
+
+    if document_type:
+        conditions.append("document_type = :document_type")
+        params["document_type"] = document_type
+
+    if tags:
+        tagged_sql, tagged_params = tagged_documents_sql(tags)
+        conditions.append(f"id IN ({tagged_sql})")
+        params.update(tagged_params)
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    sql += " LIMIT :limit"
+    params["limit"] = int(limit)
+
+    return sql, params
+
+def connect_readonly():
+    """Read-only connection to the metadata database, waiting for a writer like the ORM's connections do."""
+    path = settings.sqlite_db_path
+
+    if not path.exists():
+        raise DatabaseNotReady(f"No database at {path}")
+
+    connection = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=settings.sqlite_busy_timeout_ms / 1000)
+    connection.row_factory = sqlite3.Row
+
+    return connection
+
+def list_documents(document_type=None, limit=100, tags=None):
+    """
+    queries.list_documents on a read-only sqlite3 connection.
+
+    Raises:
+        DatabaseNotReady: The database or a table it needs doesn't exist yet
+    """
+    sql, params = list_documents_sql(document_type, limit, tags)
+
+    try:
+        connection = connect_readonly()
+
+    except sqlite3.OperationalError as e:
+        raise DatabaseNotReady(str(e)) from e
+
+    try:
+        return [dict(row) for row in connection.execute(sql, params)]
+
+    except sqlite3.OperationalError as e: # no such table / column
+        raise DatabaseNotReady(str(e)) from e
+
+    finally:
+        connection.close()
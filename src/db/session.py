@@ -1,5 +1,5 @@
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
 
 from src.config import settings
@@ -20,11 +20,55 @@ def init_db():
 
     # Object that knows where the db is and how to communicate with it
     engine = create_engine(db_url, echo=False, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+    new_tag_index = not inspect(engine).has_table("document_tags")
     
     Base.metadata.create_all(engine)
+    add_missing_columns(engine)
     
     session_factory = sessionmaker(bind=engine, expire_on_commit=False) # When called, returns a Session object with this engine
 
+    if new_tag_index:
+        from .queries import backfill_document_tags # queries imports this module
+
+        backfill_document_tags()
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection.
+
+    WAL lets readers (e.g. list-docs) run while an ingest is writing, and with WAL synchronous=NORMAL is still
+    crash safe but doesn't fsync on every commit.
+    """
+    cursor = dbapi_connection.cursor()
+
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_mb * 1024}") # Negative means KiB rather than pages
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}") # Wait for a writer instead of failing right away
+
+    cursor.close()
+
+def add_missing_columns(engine):
+    """
+    Add columns that were introduced after a table was first created.
+
+    create_all only creates missing tables, so older databases need the new (nullable) columns added by hand.
+    """
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
 @contextmanager
 def get_session():
     """
@@ -1,39 +1,419 @@
+import itertools
+import re
+from collections import OrderedDict
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from src.config import settings
 
-def chunk_documents(documents):
-    """
-    Split documents into smaller chunks to make downstream tasks more efficent.
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$") # ATX markdown heading
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+SECTION_SEPARATOR = " > "
+STREAMED_SECTION_CHARS = 1 << 20 # Longest section text held while streaming a file, longer ones are chunked in parts
 
-    Args:
-        documents: List of documents to chunk
-        chunk_size: Size of each chunk
-        chunk_overlap: Overlap between chunks
+_token_counter = None
 
-    Returns:
-        List of chunked elements with metadata
+def chunk_batches(chunks, n):
+    """Consecutive lists of up to n chunks, pulled lazily from a chunk stream."""
+    iterator = iter(chunks)
+
+    while batch := list(itertools.islice(iterator, n)):
+        yield batch
+
+class TokenCounter:
     """
-    chunk_size = settings.chunk_size
-    chunk_overlap = settings.chunk_overlap
+    Counts embedding model tokens (without special tokens).
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap, # Good for keeping context
+    The recursive splitter measures the same pieces again and again while merging, so counts go through an
+    LRU cache, and count_many sends all uncached texts through the tokenizer in one batched call.
+    """
+    def __init__(self, tokenizer=None, cache_size=65536):
+        self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self._counts = OrderedDict()
+
+    def __call__(self, text):
+        return self.count_many([text])[0]
+
+    def count_many(self, texts):
+        missing = [text for text in dict.fromkeys(texts) if text not in self._counts]
+
+        if missing:
+            for text, count in zip(missing, self._tokenize(missing)):
+                self._counts[text] = count
+
+        counts = []
+
+        for text in texts:
+            self._counts.move_to_end(text)
+            counts.append(self._counts[text])
+
+        while len(self._counts) > self.cache_size:
+            self._counts.popitem(last=False)
+
+        return counts
+
+    def special_tokens(self):
+        """Tokens the model adds around every input, e.g. [CLS] and [SEP]."""
+        tokenizer = self._get_tokenizer()
+
+        return tokenizer.num_special_tokens_to_add() if hasattr(tokenizer, "num_special_tokens_to_add") else 2
+
+    def _tokenize(self, texts):
+        tokenizer = self._get_tokenizer()
+
+        try:
+            return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+        except TypeError:
+            return [len(tokenizer.tokenize(text)) for text in texts] # Tokenizers that can't batch
+
+    def _get_tokenizer(self):
+        if self.tokenizer is None:
+            from src.vectorstore.embeddings import get_tokenizer
+
+            self.tokenizer = get_tokenizer()
+
+        return self.tokenizer
+
+def get_token_counter():
+    """One cached counter per process, ingest workers each get their own."""
+    global _token_counter
+
+    if _token_counter is None:
+        _token_counter = TokenCounter()
+
+    return _token_counter
+
+def token_length(text):
+    """Length of text in embedding model tokens."""
+    return get_token_counter()(text)
+
+def max_model_tokens():
+    """Longest input the embedding model reads, from the model itself if it is already loaded in this process."""
+    from src.vectorstore.embeddings import _models
+
+    model = _models.get(settings.embedding_model_name)
+
+    return getattr(model, "max_seq_length", None) or settings.embedding_max_tokens
+
+def make_text_splitter():
+    if settings.chunk_length_unit == "tokens":
+        return make_token_splitter()
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=settings.chunk_size,
+        chunk_overlap=settings.chunk_overlap, # Good for keeping context
         length_function=len,
         separators=["\n\n", "\n", ". ", " ", ""] # Priority of splitting
     )
 
-    chunked_docs = []
+class EmbeddingTokenSplitter(RecursiveCharacterTextSplitter):
+    """Recursive splitter measuring in embedding model tokens, with the first level of splits counted in one batch."""
+    def split_text(self, text):
+        get_token_counter().count_many(text.split(self._separators[0])) # Warms the cache the splitter reads from
+
+        return super().split_text(text)
+
+def make_token_splitter(chunk_size=None):
+    """Splitter whose sizes are counted in embedding model tokens, so chunks fit what the model actually reads."""
+    chunk_size = chunk_size or settings.chunk_tokens
+
+    return EmbeddingTokenSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=min(settings.chunk_overlap_tokens, chunk_size // 2),
+        length_function=token_length,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+def iter_fitted_chunks(chunks, batch_size=256, counts=None):
+    """
+    Make sure chunks fit the embedding model's input, which silently truncates anything longer.
+
+    Lengths are counted a batch at a time. Depending on settings.oversized_chunks, longer chunks are re-split
+    by tokens or left for the model to truncate. chunk_index is renumbered so it stays consecutive.
+
+    Args:
+        chunks: Iterable of chunk Documents of one file, in reading order
+        counts: Optional dictionary, counts["oversized"] goes up by one per chunk that was too long, so the
+            caller can report it (this may run in a worker process, where printing would garble the progress bar)
+
+    Yields:
+        Chunk Documents that fit the model (in "warn" mode, oversized ones are yielded as they are)
+    """
+    mode = settings.oversized_chunks
+
+    if mode == "ignore":
+        yield from chunks
+        return
+
+    counter = get_token_counter()
+    limit = max_model_tokens() - counter.special_tokens()
+    chunk_index = 0
+
+    for batch in chunk_batches(chunks, batch_size):
+        for chunk, count in zip(batch, counter.count_many([chunk.page_content for chunk in batch])):
+            pieces = [chunk]
+
+            if count > limit:
+                if counts is not None:
+                    counts["oversized"] = counts.get("oversized", 0) + 1
+
+                if mode == "split":
+                    pieces = [Document(page_content=piece, metadata=chunk.metadata.copy()) for piece in make_token_splitter(limit).split_text(chunk.page_content)]
+
+            for piece in pieces:
+                piece.metadata["chunk_index"] = chunk_index
+                chunk_index += 1
+
+                yield piece
+
+def split_markdown_sections(doc):
+    """
+    Split a markdown document on its headings.
+
+    Returns:
+        One Document per section, starting with its heading line, with the heading path in metadata["section"]
+    """
+    return list(iter_markdown_sections([doc]))
+
+def iter_markdown_sections(documents, max_chars=None):
+    """
+    Split a stream of markdown blocks (see loaders.iter_text_file) on their headings.
+
+    The heading path and code fence state carry over from one block to the next, so a section that straddles
+    a block boundary comes out the same as from the whole file.
+
+    Args:
+        documents: Documents holding consecutive blocks of one markdown file
+        max_chars: Optional limit on the text held for one section, longer sections are emitted in parts that
+            each start with the section's heading line again
+
+    Yields:
+        One Document per section, starting with its heading line, with the heading path in metadata["section"]
+    """
+    path = [] # (level, title) of the enclosing headings
+    lines = []
+    size = 0
+    metadata = None # Of the block the current section starts in
+    in_fence = False
+
+    for line, line_metadata in iter_block_lines(documents):
+        if metadata is None:
+            metadata = line_metadata
+
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+
+        match = None if in_fence else HEADING_PATTERN.match(line)
+
+        if match:
+            yield from close_markdown_section(lines, path, metadata)
+            lines, size, metadata = [], 0, line_metadata
+
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+
+        elif max_chars and size > max_chars:
+            yield from close_markdown_section(lines, path, metadata)
+            lines = lines[:1] if path else [] # Sections under a heading start with the heading line
+            size, metadata = sum(len(kept) + 1 for kept in lines), line_metadata
+
+        lines.append(line)
+        size += len(line) + 1
+
+    if metadata is not None:
+        yield from close_markdown_section(lines, path, metadata)
+
+def iter_block_lines(documents):
+    """Lines of consecutive text blocks with their block's metadata, a line cut by a block boundary comes out whole."""
+    partial, metadata = "", None
+
+    for doc in documents:
+        lines = (partial + doc.page_content).split("\n")
+        partial, metadata = lines.pop(), doc.metadata # partial is "" when the block ends on a line break
+
+        for line in lines:
+            yield line, metadata
+
+    if partial:
+        yield partial, metadata
+
+def close_markdown_section(lines, path, metadata):
+    """The section made of lines as a one item list, or an empty list if it holds no text."""
+    text = "\n".join(lines).strip()
+
+    if not text:
+        return []
+
+    metadata = metadata.copy()
+    metadata["section"] = SECTION_SEPARATOR.join(title for _, title in path)
+
+    return [Document(page_content=text, metadata=metadata)]
+
+def split_section(section):
+    """
+    Split one section into token sized pieces.
+
+    Every piece starts with the section's heading line, so each chunk still says what it is about, and the body
+    is split with a budget reduced by the heading's length.
+    """
+    heading, body = "", section.page_content
+
+    # Sections under a heading start with the heading line (see split_markdown_sections and load_word_file)
+    if section.metadata.get("section"):
+        heading, _, body = body.partition("\n")
+        body = body.strip()
+
+    if not body:
+        return [heading] if heading else []
+
+    if not heading:
+        return make_token_splitter().split_text(body)
+
+    chunk_tokens = settings.chunk_tokens
+    budget = max(chunk_tokens - token_length(heading) - 1, chunk_tokens // 2)
+
+    return [f"{heading}\n{piece}" for piece in make_token_splitter(budget).split_text(body)]
+
+def iter_section_chunks(sections):
+    """
+    Chunk each section on its own, so no chunk mixes two sections.
+
+    Args:
+        sections: Section Documents in reading order, with metadata["section"]
+
+    Yields:
+        Chunk Documents with a running chunk_index
+    """
+    chunk_index = 0
+
+    for section in sections:
+        for piece in split_section(section):
+            metadata = section.metadata.copy()
+            metadata["chunk_index"] = chunk_index
+            chunk_index += 1
+
+            yield Document(page_content=piece, metadata=metadata)
+
+def iter_chunks(documents, text_splitter=None):
+    """
+    Split a stream of documents (pages or blocks of one file) into chunks without materializing the file.
+
+    The text after the last complete chunk is carried into the next page, so chunks run across page boundaries
+    and only about one page plus one chunk of text is held at a time. A chunk keeps the metadata of the page it
+    starts on.
+
+    Args:
+        documents: Iterable of Document objects in reading order
+        text_splitter: Optional splitter, the plain splitter from settings by default
+
+    Yields:
+        Chunk Documents with a running chunk_index
+    """
+    text_splitter = text_splitter or make_text_splitter()
+    chunk_index = 0
+    carry, carry_metadata = "", None
 
     for doc in documents:
-        chunks = text_splitter.split_text(doc.page_content)
+        text = carry + "\n" + doc.page_content if carry else doc.page_content
+        pieces = text_splitter.split_text(text)
+
+        if not pieces:
+            continue
+
+        # The last piece may continue on the next page, so it's held back and split again with it
+        for i, piece in enumerate(pieces[:-1]):
+            metadata = (carry_metadata if i == 0 and carry_metadata is not None else doc.metadata).copy()
+            metadata["chunk_index"] = chunk_index
+            chunk_index += 1
+
+            yield Document(page_content=piece, metadata=metadata)
+
+        carry = pieces[-1]
+        carry_metadata = carry_metadata if len(pieces) == 1 and carry_metadata is not None else doc.metadata
+
+    if carry:
+        metadata = carry_metadata.copy()
+        metadata["chunk_index"] = chunk_index
+
+        yield Document(page_content=carry, metadata=metadata)
+
+def structured_sections(documents):
+    """Sections of a markdown or Word document, or None for formats without usable structure."""
+    if not documents:
+        return None
+
+    metadata = documents[0].metadata
+
+    if metadata.get("document_type") == "word" and all("section" in doc.metadata for doc in documents):
+        return documents # load_word_file already splits on heading styles
+
+    if str(metadata.get("source_path", "")).lower().endswith(".md"):
+        return [section for doc in documents for section in split_markdown_sections(doc)]
+
+    return None
+
+def iter_file_chunks(documents):
+    """
+    Chunk a stream of documents of one file like chunk_documents does, without materializing the file.
+
+    Markdown is split on its headings block by block and Word files, which iter_document loads whole anyway,
+    along their heading styles. Other formats, and everything with chunking_mode "plain", go through iter_chunks.
+
+    Args:
+        documents: Iterable of Documents of one file (blocks, pages or sections) in reading order
+
+    Yields:
+        Chunk Documents with a running chunk_index, not yet checked against the model (see iter_fitted_chunks)
+    """
+    documents = iter(documents)
+    first = next(documents, None)
+
+    if first is None:
+        return
+
+    documents = itertools.chain([first], documents)
+
+    if settings.chunking_mode == "structured":
+        if str(first.metadata.get("source_path", "")).lower().endswith(".md"):
+            yield from iter_section_chunks(iter_markdown_sections(documents, max_chars=STREAMED_SECTION_CHARS))
+            return
+
+        if first.metadata.get("document_type") == "word":
+            documents = list(documents)
+            sections = structured_sections(documents)
+
+            yield from iter_section_chunks(sections) if sections is not None else iter_chunks(documents)
+            return
+
+    yield from iter_chunks(documents)
+
+def chunk_documents(documents):
+    """
+    Split documents into smaller chunks to make downstream tasks more efficent.
+
+    With chunking_mode "structured", markdown and Word documents are cut along their headings and sized in
+    embedding tokens. Everything else uses the plain splitter, measured in characters or tokens
+    (chunk_length_unit). Either way chunks are checked against the embedding model's input length.
+
+    Args:
+        documents: List of documents to chunk, the pages of one file in reading order
+
+    Returns:
+        Tuple of (list of chunked elements with metadata, number of chunks longer than the embedding model's
+        input, re-split or left to be truncated depending on settings.oversized_chunks)
+    """
+    sections = structured_sections(documents) if settings.chunking_mode == "structured" else None
+    counts = {"oversized": 0}
 
-        for i, chunk in enumerate(chunks):
-            chunk_metadata = doc.metadata.copy()
-            chunk_metadata["chunk_index"] = i
-            chunk_metadata["total_chunks"] = len(chunks)
+    if sections is not None:
+        chunked_docs = list(iter_fitted_chunks(iter_section_chunks(sections), counts=counts))
+    else:
+        chunked_docs = list(iter_fitted_chunks(iter_chunks(documents), counts=counts))
 
-            chunked_docs.append(Document(page_content=chunk, metadata=chunk_metadata))
+    # Indexes run across pages, so (document, chunk_index) is unique and keeps reading order
+    for chunk in chunked_docs:
+        chunk.metadata["total_chunks"] = len(chunked_docs)
 
-    return chunked_docs
\ No newline at end of file
+    return chunked_docs, counts["oversized"]
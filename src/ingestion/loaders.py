@@ -1,6 +1,9 @@
+import re
+
 from langchain_core.documents import Document
 from langchain_community.document_loaders import PyPDFLoader
-from docx import Document
+from pypdf import PdfReader
+import docx
 
 def load_text_file(filepath):
     """
@@ -29,22 +32,55 @@ def load_text_file(filepath):
 
     return [Document(page_content=content, metadata=metadata)]
 
-def load_pdf_file(filepath):
+def iter_text_file(filepath, block_size=1 << 20):
     """
-    Load a PDF (.pdf) file.
+    Stream a text (.txt) or markdown (.md) file in blocks, so huge exports never sit in memory whole.
+
+    Args:
+        filepath: Path to the file
+        block_size: Characters read per block
+    Yields:
+        Documents holding consecutive blocks of the file, each ending on a line break where possible
+    """
+    metadata = None
+    carry = ""
+
+    with open(filepath, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            block = carry + block
+            cut = block.rfind("\n") + 1 or len(block) # Keep the partial last line for the next block
+            block, carry = block[:cut], block[cut:]
+
+            if metadata is None:
+                first_line = block.split("\n", 1)[0]
+                title = first_line.lstrip("#").strip() if first_line.startswith("#") else filepath.stem
+
+                metadata = {
+                    "source_path": str(filepath),
+                    "document_type": "note",
+                    "title": title,
+                    "filepath": filepath.suffix
+                }
+
+            yield Document(page_content=block, metadata=metadata.copy())
+
+    if carry:
+        yield Document(page_content=carry, metadata=(metadata or {}).copy())
+
+def iter_pdf_file(filepath):
+    """
+    Stream a PDF (.pdf) file page by page.
 
     Args:
         filepath: Path to the pdf
-    Return:
-        A list containing a Document objects (usually per page)
+    Yields:
+        One Document per page
     """
     loader = PyPDFLoader(str(filepath))
 
-    documents = loader.load()
-
     title = filepath.stem
 
-    for doc in documents:
+    for doc in loader.lazy_load():
         doc.metadata.update(
             {
                 "source_path": str(filepath),
@@ -54,21 +90,33 @@ def load_pdf_file(filepath):
             }
         )
 
-    return documents
+        yield doc
+
+def pdf_page_count(filepath):
+    """Number of pages in a PDF, read from its page tree without extracting any text."""
+    return len(PdfReader(str(filepath)).pages)
+
+def load_pdf_file(filepath):
+    """
+    Load a PDF (.pdf) file.
+
+    Args:
+        filepath: Path to the pdf
+    Return:
+        A list containing a Document objects (usually per page)
+    """
+    return list(iter_pdf_file(filepath))
 
 def load_word_file(filepath):
     """
-    Load a Word (.docx) file.
+    Load a Word (.docx) file, split on its heading styled paragraphs.
 
     Args:
         filepath: Path to the word doc
     Return:
-        A list containing a single Document
+        A list of Documents, one per section, with the heading path in metadata["section"]
     """
-    doc = Document(filepath)
-
-    paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-    contents = "\n\n".join(paragraphs)
+    doc = docx.Document(filepath)
 
     metadata = {
         "source_path": str(filepath),
@@ -77,7 +125,46 @@ def load_word_file(filepath):
         "filepath": filepath.suffix
     }
 
-    return [Document(page_content=contents, metadata=metadata)]
+    sections = []
+    path = [] # (level, heading) of the enclosing headings
+    paragraphs = []
+
+    def close_section():
+        if paragraphs:
+            section_metadata = metadata.copy()
+            section_metadata["section"] = " > ".join(heading for _, heading in path)
+            sections.append(Document(page_content="\n\n".join(paragraphs), metadata=section_metadata))
+
+    for p in doc.paragraphs:
+        if not p.text.strip():
+            continue
+
+        level = heading_level(p)
+
+        if level is not None:
+            close_section()
+            paragraphs = []
+            path = [(lvl, heading) for lvl, heading in path if lvl < level] + [(level, p.text.strip())]
+
+        paragraphs.append(p.text)
+
+    close_section()
+
+    if not sections:
+        return [Document(page_content="", metadata=dict(metadata, section=""))]
+
+    return sections
+
+def heading_level(paragraph):
+    """Outline level of a heading styled paragraph (Title is 0, Heading N is N), None for body text."""
+    style = paragraph.style.name if paragraph.style is not None else ""
+
+    if style == "Title":
+        return 0
+
+    match = re.match(r"Heading (\d)", style)
+
+    return int(match.group(1)) if match else None
 
 def load_document(filepath):
     """
@@ -105,6 +192,27 @@ def load_document(filepath):
         print(f"Error loading {filepath}: {e}")
         return None
 
+def iter_document(filepath):
+    """
+    Stream a document based on its file-type. Word files can't be read partially and are loaded whole.
+
+    Unlike load_document, errors are raised to the caller, which may already have used part of the document.
+
+    Args:
+        filepath: Path to the document
+
+    Yields:
+        Document objects (blocks, pages or the whole document)
+    """
+    suffix = filepath.suffix.lower()
+
+    if suffix in [".txt", ".md"]:
+        yield from iter_text_file(filepath)
+    elif suffix == ".pdf":
+        yield from iter_pdf_file(filepath)
+    elif suffix == ".docx":
+        yield from load_word_file(filepath)
+
 def discover_documents(data_dir):
     """
     Discover all supported documents in a directory tree.
@@ -1,22 +1,95 @@
+import hashlib
+import multiprocessing
+import queue
+import threading
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
+from sqlalchemy import insert, update
 
 from src.config import settings
+from src.db.helpers import batched
 from src.db.session import get_session
 from src.db.models import Document as dbDocument
+from src.db.queries import delete_document_tags
+from src.llm.cache import ResponseCache
 from src.vectorstore.chroma_store import ChromaStore
-from .loaders import discover_documents, load_document
-from .chunking import chunk_documents
+from src.vectorstore.lexical_index import LexicalIndex
+from .loaders import discover_documents, load_document, iter_document, pdf_page_count
+from .chunking import chunk_batches, chunk_documents, iter_file_chunks, iter_fitted_chunks
 
 console = Console()
 
+_DONE = object() # Marks the end of a stage's queue
+
+def hash_file(filepath, block_size=1 << 20):
+    """Sha256 of a file's raw bytes, read in blocks."""
+    digest = hashlib.sha256()
+
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def load_and_chunk(filepath, known_hash=None):
+    """
+    Hash, load and chunk a single file. Runs inside the worker processes, so it has to stay a module level function.
+
+    Args:
+        filepath: Path to the document
+        known_hash: Content hash stored for this file on a previous ingest, if any
+
+    Returns:
+        Dictionary with the filepath, content_hash, metadata of the first loaded document, chunks and the number
+        of oversized_chunks. metadata is None if the file couldn't be loaded, and unchanged is True if the content
+        matches known_hash.
+    """
+    result = {"filepath": filepath, "content_hash": hash_file(filepath), "metadata": None, "chunks": [], "oversized_chunks": 0, "unchanged": False}
+
+    if result["content_hash"] == known_hash:
+        result["unchanged"] = True # Only the mtime moved, nothing to re-embed
+        return result
+
+    documents = load_document(filepath)
+
+    if documents:
+        result["metadata"] = documents[0].metadata
+        result["chunks"], result["oversized_chunks"] = chunk_documents(documents)
+
+    return result
+
+def worker_context():
+    """Start method for the loader processes: forkserver where the platform has it, spawn otherwise."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
 class IngestionPipeline:
-    def __init__(self, reset_index, data_dir=None):
+    """
+    Staged ingestion pipeline.
+
+    Files are loaded and chunked in a process pool, a single embedding thread embeds chunks in large cross-file batches,
+    and a writer thread stores each batch in SQLite and Chroma. Bounded queues between the stages give backpressure.
+    """
+    def __init__(self, reset_index, data_dir=None, num_workers=None, queue_size=None, embedding_batch_size=None, reset_shards=None):
         self.data_dir = data_dir or settings.data_dir
         self.chroma_store = ChromaStore()
+        self.lexical_index = LexicalIndex() if settings.hybrid_search else None
+        self.response_cache = ResponseCache() if settings.response_cache_enabled else None
         self.reset_index = reset_index # Ensures a clean ingestion state
+        self.reset_shards = reset_shards or [] # Vector store shards to drop and rebuild, leaving the rest alone
+        self.num_workers = num_workers or settings.ingest_workers
+        self.queue_size = queue_size or settings.ingest_queue_size
+        self.embedding_batch_size = embedding_batch_size or settings.embedding_batch_size
+        self._stats_lock = threading.Lock()
+        self._touched = [] # Files whose mtime changed but content didn't
+        self._open_files = {} # Writer state per file with parts still in flight: id, chunk ids written so far, failed
+        self.oversized_chunks = 0 # Of the last run, kept out of the stats dict run returns
 
     def run(self):
+        self.oversized_chunks = 0
         stats = {
             "files_discovered": 0,
             "files_processed": 0,
@@ -29,22 +102,46 @@ class IngestionPipeline:
             console.print("[yellow]Resetting index...[/yellow]")
 
             self.chroma_store.reset()
+
+            # Document ids are reused after a reset, so answers must not stay linked to the old ones
+            if self.response_cache is not None:
+                self.response_cache.invalidate_documents([entry["id"] for entry in self.load_known_documents().values()])
+
             self.clear_database()
 
+            if self.lexical_index is not None:
+                self.lexical_index.reset()
+
             console.print("[green]Index reset complete![/green]")
 
+        elif self.reset_shards:
+            for shard in self.reset_shards:
+                console.print(f"[yellow]Resetting shard {shard}...[/yellow]")
+                console.print(f"[green]Shard {shard} reset, {self.reset_shard(shard)} documents will be re-indexed[/green]")
+
+        known = self.load_known_documents()
+
+        if self.lexical_index is not None and known and self.lexical_index.count() == 0:
+            console.print("[yellow]Building keyword index from existing vectors...[/yellow]")
+            self.lexical_index.rebuild(self.chroma_store)
+
         console.print(f"[cyan]Discovering documents in {self.data_dir}...[/cyan]")
         filepaths = discover_documents(self.data_dir)
         stats["files_discovered"] = len(filepaths)
 
+        removed = self.purge_removed_documents(known, filepaths)
+
+        if removed:
+            console.print(f"[yellow]Removed {removed} deleted files from the index[/yellow]")
+
         if not filepaths:
             console.print(f"[red]No documents found in {self.data_dir}![/red]")
             return stats
-        
+
         console.print(f"[green]Found {len(filepaths)} files in {self.data_dir}[/green]")
 
         with Progress(
-            SpinnerColumn(), 
+            SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             BarColumn(),
             TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
@@ -52,69 +149,491 @@ class IngestionPipeline:
         ) as progress:
             task = progress.add_task("Processing documents...", total=len(filepaths))
 
+            def advance(n=1):
+                progress.update(task, advance=n)
+
+            chunk_queue = queue.Queue(maxsize=self.queue_size)
+            write_queue = queue.Queue(maxsize=2) # Keeps at most a couple of embedded batches in memory
+
+            embedder = threading.Thread(target=self._embed_stage, args=(chunk_queue, write_queue, stats, advance), daemon=True)
+            writer = threading.Thread(target=self._write_stage, args=(write_queue, stats, advance), daemon=True)
+            embedder.start()
+            writer.start()
+
+            try:
+                self._load_stage(filepaths, known, chunk_queue, stats, advance)
+            finally:
+                chunk_queue.put(_DONE)
+                embedder.join()
+                writer.join()
+
+        self.update_file_stats(self._touched)
+        self._touched = []
+
+        console.print("\n[bold green]Ingestion complete![/bold green]")
+        console.print(f"   > Files discovered: {stats['files_discovered']}")
+        console.print(f"   > Files processed: {stats['files_processed']}")
+        console.print(f"   > Files failed: {stats['files_failed']}")
+        console.print(f"   > Chunks created: {stats['chunks_created']}")
+
+        if self.oversized_chunks:
+            outcome = "re-split" if settings.oversized_chunks == "split" else "truncated by the embedding model"
+            console.print(f"   > Oversized chunks: {self.oversized_chunks} ({outcome})")
+
+        console.print(f"   > Total vectors in store: {self.chroma_store.count()}")
+
+        cache = self.chroma_store.embedding_service.cache
+
+        if cache is not None:
+            cache_stats = cache.stats()
+            console.print(f"   > Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+
+        return stats
+
+    def _load_stage(self, filepaths, known, chunk_queue, stats, advance):
+        """Stage 1: load and chunk new or changed files in a process pool, feeding the embedding stage."""
+        max_in_flight = self.num_workers * 2
+        large_files = []
+
+        # The embed and write threads are already running, and forking a multi-threaded process can copy locks held
+        # by them into the workers, so workers start from a fresh interpreter instead
+        with ProcessPoolExecutor(max_workers=self.num_workers, mp_context=worker_context()) as executor:
+            pending = {}
+
             for filepath in filepaths:
                 try:
-                    if self.is_filed_indexed(filepath):
-                        progress.update(task, advance=1)
-                        continue
-                
-                    documents = load_document(filepath)
+                    stat = filepath.stat()
+
+                except OSError as e:
+                    # Deleted or unreadable since discovery
+                    console.print(f"[red]Error processing {filepath} due to error {e}[/red]")
+                    self._bump(stats, files_failed=1)
+                    advance()
+                    continue
+
+                entry = known.get(str(filepath))
+
+                # Cheap check first, only files whose size or mtime moved get hashed
+                if entry and entry["file_size"] == stat.st_size and entry["file_mtime"] == stat.st_mtime:
+                    advance()
+                    continue
+
+                if self._streamed(filepath, stat):
+                    large_files.append((filepath, stat, entry))
+                    continue
+
+                # Only keep a few files per worker in flight, so a slow embedder throttles loading
+                if len(pending) >= max_in_flight:
+                    self._drain(pending, chunk_queue, stats, advance, return_when=FIRST_COMPLETED)
+
+                future = executor.submit(load_and_chunk, filepath, entry["content_hash"] if entry else None)
+                pending[future] = (filepath, stat, entry)
+
+            self._drain(pending, chunk_queue, stats, advance)
+
+        for filepath, stat, entry in large_files:
+            self._stream_file(filepath, stat, entry, chunk_queue, stats, advance)
+
+    def _streamed(self, filepath, stat):
+        """
+        Whether a file goes through _stream_file. Text extracted from a PDF can be much bigger than the file, so
+        long PDFs are streamed by page count even when they're small on disk.
+        """
+        if stat.st_size >= settings.stream_threshold_mb * 1024 * 1024:
+            return True
+
+        if filepath.suffix.lower() != ".pdf":
+            return False
+
+        try:
+            return pdf_page_count(filepath) >= settings.stream_threshold_pages
+
+        except Exception:
+            return False # Unreadable, loading it in a worker reports the error
+
+    def _stream_file(self, filepath, stat, entry, chunk_queue, stats, advance):
+        """
+        Load, chunk and queue a large file in parts of embedding_batch_size chunks, so memory stays flat
+        however big the file is. A final part without chunks tells the writer the file is complete.
+        """
+        try:
+            content_hash = hash_file(filepath)
+
+        except OSError as e:
+            console.print(f"[red]Error processing {filepath} due to error {e}[/red]")
+            self._bump(stats, files_failed=1)
+            advance()
+            return
 
-                    if not documents:
-                        stats["files_failed"] += 1
-                        progress.update(task, advance=1)
-                        continue
+        item = {
+            "filepath": filepath,
+            "content_hash": content_hash,
+            "file_size": stat.st_size,
+            "file_mtime": stat.st_mtime,
+            "document_id": entry["id"] if entry else None,
+            "metadata": None,
+            "chunks": [],
+            "first": False,
+            "last": True,
+        }
+
+        if entry and item["content_hash"] == entry["content_hash"]:
+            self._touched.append(item)
+            advance()
+            return
+
+        first = True
+        counts = {"oversized": 0}
+
+        try:
+            for chunks in chunk_batches(iter_fitted_chunks(iter_file_chunks(iter_document(filepath)), counts=counts), self.embedding_batch_size):
+                part = dict(item, metadata=chunks[0].metadata, chunks=chunks, first=first, last=False)
+                self._bump(stats, chunks_created=len(chunks))
+                chunk_queue.put(part) # Blocks when the embedder falls behind
+                first = False
+
+        except Exception as e:
+            console.print(f"[red]Error processing {filepath} due to error {e}[/red]")
+            item["failed"] = True
+
+        self._report_oversized(filepath, counts["oversized"])
+
+        if first:
+            # Nothing reached the writer, so there is nothing to finish
+            self._bump(stats, files_failed=1)
+            advance()
+            return
+
+        chunk_queue.put(item)
+
+    def _drain(self, pending, chunk_queue, stats, advance, return_when=ALL_COMPLETED):
+        done, _ = wait(pending, return_when=return_when)
+
+        for future in done:
+            filepath, stat, entry = pending.pop(future)
 
-                    chunks = chunk_documents(documents)
-                    stats["chunks_created"] += len(chunks)
+            try:
+                item = future.result()
 
-                    doc_id = self.store_document_metadata(filepath, documents[0])
+            except Exception as e:
+                console.print(f"[red]Error processing {filepath} due to error {e}[/red]")
+                self._bump(stats, files_failed=1)
+                advance()
+                continue
 
-                    for chunk in chunks:
-                        chunk.metadata["document_id"] = doc_id
+            item["file_size"] = stat.st_size
+            item["file_mtime"] = stat.st_mtime
+            item["document_id"] = entry["id"] if entry else None
+            item["first"] = item["last"] = True # Small files travel in one part
 
-                    self.chroma_store.add_documents(chunks)
+            if item["unchanged"]:
+                self._touched.append(item)
+                advance()
+                continue
 
-                    stats["files_processed"] += 1
-                    stats["documents_index"] += 1
+            if item["metadata"] is None:
+                self._bump(stats, files_failed=1)
+                advance()
+                continue
+
+            self._bump(stats, chunks_created=len(item["chunks"]))
+            self._report_oversized(filepath, item["oversized_chunks"])
+            chunk_queue.put(item) # Blocks when the embedder falls behind
+
+    def _report_oversized(self, filepath, n):
+        """Counts a file's oversized chunks, and warns when they'll be truncated rather than re-split."""
+        if not n:
+            return
+
+        self.oversized_chunks += n # Only the load stage (one thread) reports
+
+        if settings.oversized_chunks == "warn":
+            console.print(f"[yellow]Warning: {n} chunks of {filepath} are longer than the embedding model's input and will be truncated[/yellow]")
+
+    def _embed_stage(self, chunk_queue, write_queue, stats, advance):
+        """Stage 2: embed chunks from many files in one model call."""
+        batch = []
+        batch_chunks = 0
+
+        while True:
+            item = chunk_queue.get()
+
+            if item is not _DONE:
+                batch.append(item)
+                batch_chunks += len(item["chunks"])
+
+            if batch and (item is _DONE or batch_chunks >= self.embedding_batch_size):
+                texts = [chunk.page_content for entry in batch for chunk in entry["chunks"]]
+
+                try:
+                    embeddings = self.chroma_store.embedding_service.embed_documents(texts) if texts else []
 
                 except Exception as e:
+                    embeddings = e # The writer reports it, since it tracks which files are complete
+
+                write_queue.put((batch, embeddings))
+
+                batch = []
+                batch_chunks = 0
+
+            if item is _DONE:
+                write_queue.put(_DONE)
+                return
+
+    def _write_stage(self, write_queue, stats, advance):
+        """
+        Stage 3: store a whole embedded batch with one SQLite transaction and one Chroma write.
+
+        A file counts as processed once its last part is written. Streamed files arrive in several parts,
+        the first one creates the document row and the last one cleans up after the previous version.
+        """
+        while True:
+            item = write_queue.get()
+
+            if item is _DONE:
+                return
+
+            batch, embeddings = item
+
+            try:
+                if isinstance(embeddings, Exception):
+                    raise embeddings
+
+                self._write_batch(batch, embeddings)
+
+            except Exception as e:
+                for filepath in dict.fromkeys(entry["filepath"] for entry in batch):
                     console.print(f"[red]Error processing {filepath} due to error {e}[/red]")
-                    stats["files_failed"] += 1
-                
-                progress.update(task, advance=1)
+                    self._open_files.setdefault(filepath, {})["failed"] = True
 
-        console.print("\n[bold green]Ingestion complete![/bold green]")
-        console.print(f"   > Files discovered: {stats['files_discovered']}")
-        console.print(f"   > Files processed: {stats['files_processed']}")
-        console.print(f"   > Files failed: {stats['files_failed']}")
-        console.print(f"   > Chunks created: {stats['chunks_created']}")
-        console.print(f"   > Total vectors in store: {self.chroma_store.count()}")     
-        
-        return stats
+            for entry in batch:
+                if not entry["last"]:
+                    continue
+
+                state = self._open_files.pop(entry["filepath"], {})
+
+                if state.get("failed") or entry.get("failed"):
+                    self._bump(stats, files_failed=1)
+                else:
+                    self._bump(stats, files_processed=1, documents_index=1)
+
+                advance()
+
+    def _write_batch(self, batch, embeddings):
+        # Later parts of a file that already failed are dropped, the next ingest retries the whole file
+        rows = []
+        offset = 0
+
+        for entry in batch:
+            n = len(entry["chunks"])
+
+            if not self._open_files.get(entry["filepath"], {}).get("failed"):
+                rows.append((entry, embeddings[offset:offset + n]))
+
+            offset += n
+
+        first_parts = [entry for entry, _ in rows if entry["first"]]
+
+        for entry, doc_id in zip(first_parts, self.store_documents_metadata(first_parts)):
+            self._open_files[entry["filepath"]] = {"id": doc_id, "chunk_ids": []}
+
+        chunks = []
+        vectors = []
+
+        for entry, entry_vectors in rows:
+            doc_id = self._open_files[entry["filepath"]]["id"]
+
+            for chunk in entry["chunks"]:
+                chunk.metadata["document_id"] = doc_id
+
+            chunks.extend(entry["chunks"])
+            vectors.extend(entry_vectors)
+
+        ids = self.chroma_store.chunk_ids(chunks)
+
+        if chunks:
+            self.chroma_store.upsert_documents(chunks, ids=ids, embeddings=vectors)
+
+            if self.lexical_index is not None:
+                self.lexical_index.upsert_chunks(ids, chunks)
+
+        offset = 0
+
+        for entry, _ in rows:
+            n = len(entry["chunks"])
+            self._open_files[entry["filepath"]]["chunk_ids"].extend(ids[offset:offset + n])
+            offset += n
+
+        finished = [entry for entry, _ in rows if entry["last"] and not entry.get("failed")]
+
+        # Changed files keep their id, chunks that didn't survive the edit are dropped
+        replaced = [entry["document_id"] for entry in finished if entry["document_id"] is not None]
+        keep_ids = [chunk_id for entry in finished for chunk_id in self._open_files[entry["filepath"]]["chunk_ids"]]
+        self.chroma_store.delete_by_document(replaced, keep_ids=keep_ids)
+
+        if self.lexical_index is not None:
+            self.lexical_index.delete_by_document(replaced, keep_ids=keep_ids)
 
-    def is_filed_indexed(self, filepath):
+        # Cached answers and summaries built from the old chunks are stale now
+        if self.response_cache is not None:
+            self.response_cache.invalidate_documents(replaced)
+
+        # Files only get their fingerprint now that every chunk is stored and the old ones are gone
+        self.update_file_stats(finished)
+
+    def _bump(self, stats, **counts):
+        with self._stats_lock:
+            for key, n in counts.items():
+                stats[key] += n
+
+    def load_known_documents(self):
+        """
+        Load the stored fingerprint of every indexed file in one query.
+
+        Returns:
+            Dictionary mapping path to a dict with id, file_size, file_mtime and content_hash
+        """
         with get_session() as session:
-            exists = session.query(dbDocument).filter(dbDocument.path == str(filepath)).first() is not None
-            return exists
+            rows = session.query(dbDocument.id, dbDocument.path, dbDocument.file_size, dbDocument.file_mtime, dbDocument.content_hash).all()
+
+        return {
+            row.path: {"id": row.id, "file_size": row.file_size, "file_mtime": row.file_mtime, "content_hash": row.content_hash}
+            for row in rows
+        }
+
+    def purge_removed_documents(self, known, filepaths):
+        """
+        Delete vectors and metadata of indexed files under data_dir that no longer exist.
+
+        Args:
+            known: Output of load_known_documents
+            filepaths: Files discovered on this run
+
+        Returns:
+            Number of documents removed
+        """
+        discovered = {str(filepath) for filepath in filepaths}
+        data_dir = Path(self.data_dir)
+
+        removed_ids = [
+            entry["id"] for path, entry in known.items()
+            if path not in discovered and Path(path).is_relative_to(data_dir) and not Path(path).exists()
+        ]
+
+        if not removed_ids:
+            return 0
+
+        self.chroma_store.delete_by_document(removed_ids)
+
+        if self.lexical_index is not None:
+            self.lexical_index.delete_by_document(removed_ids)
+
+        if self.response_cache is not None:
+            self.response_cache.invalidate_documents(removed_ids)
 
-    def store_document_metadata(self, filepath, doc):
         with get_session() as session:
-            db_doc = dbDocument(
-                path = str(filepath),
-                document_type = doc.metadata.get("document_type",'unknown'),
-                title=doc.metadata.get("title", filepath.stem),
-                description=doc.metadata.get("description", ""),
-                tags=""
-            )
+            session.query(dbDocument).filter(dbDocument.id.in_(removed_ids)).delete(synchronize_session=False)
+            delete_document_tags(session, removed_ids)
+
+        return len(removed_ids)
+
+    def store_documents_metadata(self, entries):
+        """
+        Store metadata rows for a batch of files.
+
+        New files are inserted with one executemany INSERT ... RETURNING id, changed files are updated in place
+        with one executemany UPDATE, in transactions of at most sqlite_write_batch rows.
+
+        Args:
+            entries: List of file entries from load_and_chunk (with document_id set)
+
+        Returns:
+            List of database ids, in the same order as entries
+        """
+        doc_ids = []
+
+        for batch in batched(entries, settings.sqlite_write_batch):
+            rows = [self._document_row(entry) for entry in batch]
+            new_rows = [dict(row, tags="") for row, entry in zip(rows, batch) if entry["document_id"] is None]
+            changed_rows = [dict(row, id=entry["document_id"]) for row, entry in zip(rows, batch) if entry["document_id"] is not None]
+
+            with get_session() as session:
+                new_ids = iter(session.execute(
+                    insert(dbDocument).returning(dbDocument.id, sort_by_parameter_order=True), new_rows
+                ).scalars().all() if new_rows else [])
+
+                if changed_rows:
+                    session.execute(update(dbDocument), changed_rows) # Bulk UPDATE by primary key
+
+            doc_ids.extend(entry["document_id"] if entry["document_id"] is not None else next(new_ids) for entry in batch)
+
+        return doc_ids
+
+    def _document_row(self, entry):
+        metadata = entry["metadata"]
+
+        # No fingerprint until the chunks are stored (see update_file_stats), or a failed or interrupted write would
+        # leave a row that matches the file on disk and the next run would skip it for good
+        return {
+            "path": str(entry["filepath"]),
+            "document_type": metadata.get("document_type", "unknown"),
+            "title": metadata.get("title", entry["filepath"].stem),
+            "description": metadata.get("description", ""),
+            "file_size": None,
+            "file_mtime": None,
+            "content_hash": None,
+        }
+
+    def update_file_stats(self, entries):
+        """Record the size, mtime and content hash of files that are fully indexed, so the next run skips them on stat alone."""
+        rows = [
+            {
+                "id": entry["document_id"] if entry["document_id"] is not None else self._open_files[entry["filepath"]]["id"],
+                "file_size": entry["file_size"],
+                "file_mtime": entry["file_mtime"],
+                "content_hash": entry["content_hash"],
+            }
+            for entry in entries
+        ]
+
+        for batch in batched(rows, settings.sqlite_write_batch):
+            with get_session() as session:
+                session.execute(update(dbDocument), batch)
+
+    def reset_shard(self, shard):
+        """
+        Drop one vector store shard and mark its documents as changed, so this run re-indexes just them.
+
+        Document ids are kept, so tags and metadata survive the rebuild.
+
+        Returns:
+            Number of documents in the shard
+        """
+        if not self.chroma_store.shard_by:
+            raise ValueError("The vector store isn't sharded, set CHROMA_SHARD_BY or use --reset-index")
+
+        if shard not in self.chroma_store.shards():
+            raise ValueError(f"Unknown shard: {shard} (existing: {', '.join(self.chroma_store.shards()) or 'none'})")
+
+        document_ids = sorted(self.chroma_store.document_ids(shard=shard))
+        self.chroma_store.reset(shard=shard)
+
+        if self.lexical_index is not None:
+            self.lexical_index.delete_by_document(document_ids)
+
+        if self.response_cache is not None:
+            self.response_cache.invalidate_documents(document_ids)
+
+        # Forgetting the fingerprint makes the next discovery pass treat the files as changed
+        rows = [{"id": document_id, "file_size": None, "file_mtime": None, "content_hash": None} for document_id in document_ids]
 
-            session.add(db_doc)
-            session.commit()
-            session.refresh(db_doc)
-            doc_id = db_doc.id
+        for batch in batched(rows, settings.sqlite_write_batch):
+            with get_session() as session:
+                session.execute(update(dbDocument), batch)
 
-        return doc_id
+        return len(document_ids)
 
     def clear_database(self):
         with get_session() as session:
-            session.query(dbDocument).delete()
\ No newline at end of file
+            session.query(dbDocument).delete()
+            delete_document_tags(session)
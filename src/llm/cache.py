@@ -0,0 +1,127 @@
+import hashlib
+import time
+
+from sqlalchemy.dialects.sqlite import insert
+
+from src.config import settings
+from src.db.helpers import BATCH_SIZE, LRUEviction
+from src.db.session import get_session
+from src.db.models import ResponseCacheEntry, ResponseCacheDocument
+
+def cache_key(*parts):
+    """Sha256 over the parts that determine an LLM response."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+def retrieval_fingerprint(documents):
+    """Hash of the retrieved chunks, their ids and their content, in prompt order."""
+    return cache_key(*(
+        f"{doc.metadata.get('chunk_id', '')}:{hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()}"
+        for doc in documents
+    ))
+
+class ResponseCache:
+    """
+    Persistent LLM response cache stored in the SQLite database.
+
+    Keys are content hashes (see cache_key), so a stale entry can never be hit, it just stops being asked for.
+    Entries can also be linked to documents and dropped as soon as one of them is re-indexed or removed.
+    The least recently used entries are evicted once the cache grows past max_entries.
+    """
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or settings.response_cache_max_entries
+        self._eviction = LRUEviction(ResponseCacheEntry, [ResponseCacheEntry.key], self.max_entries, delete=self._delete)
+
+    def get_many(self, keys):
+        """
+        Returns:
+            Dictionary mapping each cached key to its response
+        """
+        if not keys:
+            return {}
+
+        keys = list(keys)
+        found = {}
+
+        with get_session() as session:
+            for start in range(0, len(keys), BATCH_SIZE):
+                batch = keys[start:start + BATCH_SIZE]
+                rows = session.query(ResponseCacheEntry.key, ResponseCacheEntry.response).filter(ResponseCacheEntry.key.in_(batch)).all()
+                found.update((row.key, row.response) for row in rows)
+
+            if found:
+                session.query(ResponseCacheEntry).filter(ResponseCacheEntry.key.in_(list(found))).update(
+                    {"last_used": time.time()}, synchronize_session=False
+                )
+
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, responses, document_ids=None):
+        """
+        Args:
+            responses: Dictionary mapping key to response text
+            document_ids: Optional dictionary mapping key to the ids of the documents the response was built from
+        """
+        if not responses:
+            return
+
+        now = time.time()
+        stmt = insert(ResponseCacheEntry)
+        stmt = stmt.on_conflict_do_update(index_elements=["key"], set_={"response": stmt.excluded.response, "last_used": now})
+
+        links = [
+            {"key": key, "document_id": document_id}
+            for key, ids in (document_ids or {}).items() for document_id in set(ids) if document_id is not None
+        ]
+
+        with get_session() as session:
+            session.execute(stmt, [{"key": key, "response": response, "last_used": now} for key, response in responses.items()])
+
+            if links:
+                session.execute(insert(ResponseCacheDocument).on_conflict_do_nothing(), links)
+
+            self._eviction.added(session, len(responses)) # Overwrites are over-counted, which only makes eviction a bit early
+
+    def put(self, key, response, document_ids=None):
+        self.put_many({key: response}, {key: document_ids} if document_ids else None)
+
+    def invalidate_documents(self, document_ids):
+        """
+        Drop every response built from any of these documents.
+
+        Args:
+            document_ids: Database document ids whose chunks changed or were removed
+        """
+        if not document_ids:
+            return
+
+        document_ids = list(document_ids)
+
+        with get_session() as session:
+            keys = []
+
+            for start in range(0, len(document_ids), BATCH_SIZE):
+                batch = document_ids[start:start + BATCH_SIZE]
+                keys.extend(
+                    row.key for row in session.query(ResponseCacheDocument.key).filter(ResponseCacheDocument.document_id.in_(batch)).distinct()
+                )
+
+            self._delete(session, keys)
+
+        self._eviction.reset()
+
+    def clear(self):
+        """Helper function: Drops every cached response."""
+        with get_session() as session:
+            session.query(ResponseCacheDocument).delete()
+            session.query(ResponseCacheEntry).delete()
+
+        self._eviction.reset(0)
+
+    def _delete(self, session, keys):
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start:start + BATCH_SIZE]
+            session.query(ResponseCacheDocument).filter(ResponseCacheDocument.key.in_(batch)).delete(synchronize_session=False)
+            session.query(ResponseCacheEntry).filter(ResponseCacheEntry.key.in_(batch)).delete(synchronize_session=False)
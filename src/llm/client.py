@@ -1,67 +1,351 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+
 import httpx
 
 from src.config import settings
 
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+def is_retryable(error):
+    """Transient failures worth retrying: timeouts, dropped connections and overloaded servers."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+
+    return isinstance(error, httpx.TransportError)
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Exponential backoff with full jitter, so many retrying callers don't hit the server in lockstep."""
+    base = settings.llm_backoff_base if base is None else base
+    cap = settings.llm_backoff_max if cap is None else cap
+
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def request_error(e):
+    """Wraps an httpx error with the response body, if there is one."""
+    detail = ""
+
+    if hasattr(e, "response") and e.response is not None:
+        try:
+            detail = f"\nResponse body: {e.response.text}"
+
+        except Exception:
+            pass
+
+    return Exception(f"LLM request failed: {e}{detail}")
+
+def parse_completion(data):
+    if data.get("choices"):
+        return data["choices"][0]["message"]["content"]
+
+    raise ValueError(f"Unexpceted response format: {data}")
+
+def call_chat(client, messages, **kwargs):
+    """
+    Call chat on either client from synchronous code.
+
+    Lets AnswerEngine and SemanticTaggingAgent take a MistralClient or an AsyncMistralClient.
+    """
+    if isinstance(client, AsyncMistralClient):
+        return client.run_sync(client.chat(messages, **kwargs))
+
+    return client.chat(messages, **kwargs)
+
 class MistralClient:
-    def __init__(self, base_url=None, model_name=None, api_key=None, timeout=None, temp=None, max_tokens=None):
+    def __init__(self, base_url=None, model_name=None, api_key=None, timeout=None, temp=None, max_tokens=None, max_retries=None):
         self.base_url = (base_url or settings.llm_base_url).rstrip("/")
         self.model_name = model_name or settings.llm_model_name
         self.api_key = api_key
         self.timeout = timeout or settings.llm_timeout
         self.temp = temp or settings.llm_temp
         self.max_tokens = max_tokens or settings.llm_max_tokens
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
 
         headers = {}
 
         if self.api_key:
             headers["Authorization"] = f"Bearer {self.api_key}"
-        
+
         self.client = httpx.Client(
             base_url=self.base_url, headers=headers, timeout=self.timeout
         )
 
-    def chat(self, messages):
+    def _payload(self, messages, temperature=None, stream=False):
         payload = {
             "model": self.model_name,
             "messages": messages,
-            "temperature": self.temp,
+            "temperature": self.temp if temperature is None else temperature,
             "max_tokens": self.max_tokens
         }
 
+        if stream:
+            payload["stream"] = True
+
+        return payload
+
+    def chat(self, messages, temperature=None):
+        payload = self._payload(messages, temperature)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.post("/chat/completions", json=payload)
+                response.raise_for_status()
+
+                return parse_completion(response.json())
+
+            except httpx.HTTPError as e:
+                if attempt < self.max_retries and is_retryable(e):
+                    time.sleep(backoff_delay(attempt))
+                    continue
+
+                raise request_error(e) from e
+
+    def chat_stream(self, messages, temperature=None):
+        """
+        Stream a chat completion token by token over server-sent events.
+
+        Args:
+            messages: Chat messages
+            temperature: Optional override of the client's temperature
+
+        Yields:
+            Content deltas as they arrive
+
+        Raises:
+            Exception: The request failed, the server sent an error event, or the stream ended before [DONE]
+        """
+        payload = self._payload(messages, temperature, stream=True)
+
         try:
-            response = self.client.post("/chat/completions", json=payload)
-            response.raise_for_status()
+            with self.client.stream("POST", "/chat/completions", json=payload) as response:
+                if response.is_error:
+                    response.read() # Streamed bodies have to be read before the error detail is available
+
+                response.raise_for_status()
+
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+
+                    data = line[len("data:"):].strip()
+
+                    if data == "[DONE]":
+                        return
+
+                    chunk = json.loads(data)
+
+                    # Errors after the 200 headers went out can only arrive as an event
+                    if chunk.get("error"):
+                        raise Exception(f"LLM request failed mid-stream: {chunk['error']}")
+
+                    if not chunk.get("choices"):
+                        continue
 
-            data = response.json()
+                    content = chunk["choices"][0].get("delta", {}).get("content")
+
+                    if content:
+                        yield content
 
-            if data.get("choices"):
-                return data["choices"][0]["message"]["content"]
-                
-            raise ValueError(f"Unexpceted response format: {data}")
-            
         except httpx.HTTPError as e:
-            detail = ""
-            
-            if hasattr(e, "response") and e.response is not None:
-                try:
-                    detail = f"\nResponse body: {e.response.text}"
-                
-                except Exception:
-                    pass
-
-            raise Exception(f"LLM request failed: {e}{detail}") from e
-        
+            raise request_error(e) from e
+
+        # A cut-off answer must not pass for a complete one
+        raise Exception("LLM request failed: the stream ended before [DONE]")
+
     def generate(self, prompt):
         messages=[{"role": "user", "content": prompt}]
         return self.chat(messages)
-    
+
     def close(self):
         self.client.close()
 
+        with _twins_lock:
+            twins = _twins.pop(self, {})
+
+        for twin in twins.values(): # Async clients made by AsyncMistralClient.from_client
+            twin.close()
+
     # For context manager
     def __enter__(self):
         return self
-    
+
     # For context manager
-    def __exit__(self):
-        self.close()
\ No newline at end of file
+    def __exit__(self, *exc_info):
+        self.close()
+
+_twins = weakref.WeakKeyDictionary() # MistralClient -> {max_concurrency: AsyncMistralClient}
+_twins_lock = threading.Lock()
+
+class AsyncMistralClient:
+    """
+    Asyncio client for the same OpenAI-compatible endpoint as MistralClient.
+
+    Requests share a pooled httpx.AsyncClient, at most max_concurrency of them are in flight at once,
+    and transient failures are retried with exponential backoff and jitter. chat and generate keep
+    MistralClient's signatures but are coroutines.
+
+    httpx and asyncio primitives belong to one event loop, so each loop using the client gets its own pool,
+    created under a lock so threads running their own loops never replace or close each other's. run_sync
+    sends every synchronous call to one background loop, whose pool stays open and is reused across calls.
+    """
+    def __init__(self, base_url=None, model_name=None, api_key=None, timeout=None, temp=None, max_tokens=None, max_concurrency=None, max_retries=None):
+        self.base_url = (base_url or settings.llm_base_url).rstrip("/")
+        self.model_name = model_name or settings.llm_model_name
+        self.api_key = api_key
+        self.timeout = timeout or settings.llm_timeout
+        self.temp = temp or settings.llm_temp
+        self.max_tokens = max_tokens or settings.llm_max_tokens
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
+
+        self.headers = {}
+
+        if self.api_key:
+            self.headers["Authorization"] = f"Bearer {self.api_key}"
+
+        self._pools = {} # Event loop -> (httpx.AsyncClient, asyncio.Semaphore)
+        self._background_loop = None
+        self._background_thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_client(cls, client, max_concurrency=None):
+        """
+        Async client with the same endpoint, model and sampling settings as a MistralClient.
+
+        The async client is created once per MistralClient and concurrency limit, so repeated sync callers
+        (e.g. one summarizer per summarize call) share its connection pool.
+        """
+        if isinstance(client, cls):
+            return client
+
+        with _twins_lock:
+            twins = _twins.setdefault(client, {})
+
+            if max_concurrency not in twins:
+                twins[max_concurrency] = cls(
+                    base_url=client.base_url, model_name=client.model_name, api_key=client.api_key, timeout=client.timeout,
+                    temp=client.temp, max_tokens=client.max_tokens, max_concurrency=max_concurrency, max_retries=client.max_retries
+                )
+
+            return twins[max_concurrency]
+
+    def _get_client(self):
+        """The running loop's (client, semaphore), created on first use inside it."""
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            pool = self._pools.get(loop)
+
+            if pool is None:
+                # Loops that were closed without aclose (e.g. an asyncio.run that raised) can't be used again
+                for stale in [other for other in self._pools if other.is_closed()]:
+                    del self._pools[stale]
+
+                client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    headers=self.headers,
+                    timeout=httpx.Timeout(self.timeout, connect=10.0),
+                    limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency, keepalive_expiry=30.0),
+                )
+                pool = self._pools[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+
+            return pool
+
+    _payload = MistralClient._payload
+
+    async def chat(self, messages, temperature=None, timeout=None):
+        """
+        Chat completion with retries.
+
+        Args:
+            messages: Chat messages
+            temperature: Optional override of the client's temperature
+            timeout: Optional per-request timeout in seconds
+
+        Returns:
+            The completion text
+        """
+        client, semaphore = self._get_client()
+        payload = self._payload(messages, temperature)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore: # Not held while backing off
+                    response = await client.post("/chat/completions", json=payload, timeout=timeout or client.timeout)
+                    response.raise_for_status()
+
+                return parse_completion(response.json())
+
+            except httpx.HTTPError as e:
+                if attempt < self.max_retries and is_retryable(e):
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+
+                raise request_error(e) from e
+
+    async def generate(self, prompt, timeout=None):
+        messages=[{"role": "user", "content": prompt}]
+        return await self.chat(messages, timeout=timeout)
+
+    async def chat_many(self, message_lists, temperature=None, timeout=None):
+        """
+        Run many chat completions concurrently, bounded by max_concurrency.
+
+        Returns:
+            A list with the completion text, or the raised Exception, for each message list
+        """
+        return await asyncio.gather(
+            *(self.chat(messages, temperature=temperature, timeout=timeout) for messages in message_lists),
+            return_exceptions=True
+        )
+
+    def run_sync(self, coro):
+        """
+        Run a coroutine of this client to completion from synchronous code.
+
+        Every call, from any thread, runs on the same background event loop, so the connection pool is kept
+        between calls. Must not be called from inside a coroutine running on that loop.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._get_background_loop()).result()
+
+    def _get_background_loop(self):
+        with self._lock:
+            if self._background_loop is None:
+                self._background_loop = asyncio.new_event_loop()
+                self._background_thread = threading.Thread(target=self._background_loop.run_forever, name="llm-client-loop", daemon=True)
+                self._background_thread.start()
+
+            return self._background_loop
+
+    async def aclose(self):
+        """Close the running loop's connection pool."""
+        with self._lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+
+        if pool is not None:
+            await pool[0].aclose()
+
+    def close(self):
+        """Close the background loop used by run_sync, and its connection pool."""
+        with self._lock:
+            loop, thread = self._background_loop, self._background_thread
+            self._background_loop = self._background_thread = None
+
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    # For async context manager
+    async def __aenter__(self):
+        return self
+
+    # For async context manager
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -1,3 +1,5 @@
+RAG_PROMPT_VERSION = 2 # Bump when the RAG prompt changes, cached answers are keyed on it
+
 def build_rag_prompt(question, context_chunks):
     system_message = """You are Brainy Binder, a helpful AI assistant that answers questions based on a personal knowledge base.
 
@@ -25,6 +27,8 @@ def build_rag_prompt(question, context_chunks):
     ]
 
 
+SUMMARY_PROMPT_VERSION = 1 # Bump when the summarization prompts change, cached summaries are keyed on it
+
 def build_summarization_prompt(document_text, title):
 
     system_message = """You are Brainy Binder, a helpful AI assistant that summarizes documents.
@@ -45,6 +49,48 @@ def build_summarization_prompt(document_text, title):
     ]
 
 
+def build_section_summary_prompt(section_text, title, part, total_parts):
+
+    system_message = """You are Brainy Binder, a helpful AI assistant that summarizes documents.
+
+    You are given one part of a longer document. Follow these guidelines:
+    1. Capture the main ideas and key points of this part only
+    2. Preserve important details, names, numbers, and facts
+    3. Use concise bullet points
+    4. Do not add an introduction or conclusion, the summary will be merged with the other parts"""
+
+    title_text = f" titled '{title}'" if title else ""
+    user_message = f"""Summarize part {part} of {total_parts} of the document{title_text}: {section_text}"""
+
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def build_combine_summaries_prompt(summaries, title, final):
+
+    system_message = """You are Brainy Binder, a helpful AI assistant that summarizes documents.
+
+    You are given summaries of consecutive parts of a document, in order. Follow these guidelines:
+    1. Merge them into one coherent summary, removing repetition
+    2. Keep the most important ideas, names, and facts
+    3. Use bullet points for readability
+    4. Organize logically, following the order of the document"""
+
+    if final:
+        system_message += "\n    5. Keep the summary concise (3-7 bullets for most documents)"
+
+    title_text = f" titled '{title}'" if title else ""
+    parts = "\n\n".join(f"Part {i}:\n{summary}" for i, summary in enumerate(summaries, 1))
+    user_message = f"""Combine these partial summaries of the document{title_text} into one summary:\n\n{parts}"""
+
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+
+
 def build_tagging_prompt(document_text, title):
 
     system_message = """You are Brainy Binder, a helpful AI assistant that generates semantic tags for documents.
@@ -1,40 +1,140 @@
-from pathlib import Path
 from langchain_core.documents import Document
 from src.config import settings
 from src.vectorstore.chroma_store import ChromaStore
-from src.llm.client import MistralClient
-from src.llm.prompts import build_rag_prompt, build_summarization_prompt
+from src.vectorstore.lexical_index import LexicalIndex
+from src.llm.cache import ResponseCache, cache_key, retrieval_fingerprint
+from src.llm.client import MistralClient, AsyncMistralClient, call_chat
+from src.llm.prompts import RAG_PROMPT_VERSION, build_rag_prompt
 from src.db.models import Document as dbDocument
 from src.db.session import get_session
+from src.db.queries import get_document_info, list_documents
+from .context import ContextPacker
+from .fusion import reciprocal_rank_fusion
+from .reranker import CrossEncoderReranker
+from .summarizer import HierarchicalSummarizer
 
 class AnswerEngine:
-    def __init__(self, chroma_store=None, llm_client=None, top_k=None):
+    NO_RESULTS_ANSWER = "I couldn't find any relevant information in your knowledge base to answer this question."
+
+    def __init__(self, chroma_store=None, llm_client=None, top_k=None, search_type=None, lexical_index=None, response_cache=None, rerank=None, reranker=None):
         self.chroma_store = chroma_store or ChromaStore()
         self.llm_client = llm_client or MistralClient()
         self.top_k = top_k or settings.top_k
+        self.search_type = search_type or settings.search_type
+        self.lexical_index = lexical_index or (LexicalIndex() if settings.hybrid_search else None)
+        self.response_cache = response_cache or (ResponseCache() if settings.response_cache_enabled else None)
+        self.context_packer = ContextPacker()
+        self.rerank = settings.rerank if rerank is None else rerank
+        self.reranker = reranker or CrossEncoderReranker() # Model is only loaded on first rerank
 
-    def answer_question(self, question, top_k=None):
-        k = top_k or self.top_k
+    def answer_question(self, question, top_k=None, filter_dict=None, search_type=None, rerank=None):
+        messages, documents = self._prepare_answer(question, top_k, filter_dict, search_type, rerank)
+
+        if not documents:
+            return (self.NO_RESULTS_ANSWER, [])
+
+        key = self._answer_key(question, documents)
+        answer = self._cached_answer(key)
 
-        documents = self.chroma_store.similarity_search(question, k=k)
+        if answer is None:
+            answer = call_chat(self.llm_client, messages)
+            self._cache_answer(key, answer, documents)
+
+        return answer, documents
+
+    def answer_question_stream(self, question, top_k=None, filter_dict=None, search_type=None, rerank=None):
+        """
+        Like answer_question, but the answer is generated lazily.
+
+        Retrieval happens right away, the LLM call starts when the token iterator is first consumed.
+
+        Returns:
+            Tuple of (iterator over answer tokens, source documents)
+        """
+        messages, documents = self._prepare_answer(question, top_k, filter_dict, search_type, rerank)
 
         if not documents:
-            return ("I couldn't find any relevant information in your knowledge base to answer this question.", [])
+            return iter([self.NO_RESULTS_ANSWER]), []
+
+        key = self._answer_key(question, documents)
+        answer = self._cached_answer(key)
 
-        context_chunks = []
+        if answer is not None:
+            return iter([answer]), documents
 
-        for doc in documents:
-            source = doc.metadata.get("source_path", "Unknown")
+        if isinstance(self.llm_client, AsyncMistralClient):
+            answer = call_chat(self.llm_client, messages)
+            self._cache_answer(key, answer, documents)
 
-            if source != "Unknown":
-                source = Path(source).name
+            return iter([answer]), documents
 
-            context_chunks.append({"content": doc.page_content, "source": source})
+        return self._stream_and_cache(key, messages, documents), documents
+
+    def _stream_and_cache(self, key, messages, documents):
+        tokens = []
+
+        for token in self.llm_client.chat_stream(messages):
+            tokens.append(token)
+            yield token
+
+        # Only reached when the stream completed, a partial answer is never cached
+        self._cache_answer(key, "".join(tokens), documents)
+
+    def _answer_key(self, question, documents):
+        """Cache key of an answer: model, sampling, prompt version, the question and a fingerprint of its context."""
+        return cache_key(
+            "answer", self.llm_client.model_name, self.llm_client.temp, RAG_PROMPT_VERSION, self.context_packer.token_budget,
+            question, retrieval_fingerprint(documents)
+        )
+
+    def _cached_answer(self, key):
+        if self.response_cache is None:
+            return None
+
+        return self.response_cache.get(key)
+
+    def _cache_answer(self, key, answer, documents):
+        if self.response_cache is None:
+            return
+
+        # Linked to its source documents, so re-indexing any of them drops the answer
+        self.response_cache.put(key, answer, [doc.metadata.get("document_id") for doc in documents])
+
+    def _prepare_answer(self, question, top_k, filter_dict, search_type, rerank=None):
+        """Retrieves context and builds the RAG prompt, returns (messages, documents)."""
+        k = top_k or self.top_k
 
+        documents = self.retrieve(question, k, filter_dict, search_type, rerank)
+
+        if not documents:
+            return None, []
+
+        # Sources are narrowed to what actually made it into the prompt
+        context_chunks, documents = self.context_packer.pack(documents)
         messages = build_rag_prompt(question, context_chunks)
-        answer = self.llm_client.chat(messages)
 
-        return answer, documents
+        return messages, documents
+
+    def retrieve(self, question, k, filter_dict=None, search_type=None, rerank=None):
+        """
+        Retrieve context chunks for a question.
+
+        Vector results are fused with BM25 keyword matches using reciprocal rank fusion when hybrid search is on.
+        With reranking, more candidates are fetched and the cross-encoder picks the best k of them.
+        """
+        rerank = self.rerank if rerank is None else rerank
+        n = max(k, settings.rerank_fetch_k) if rerank else k
+
+        documents = self.chroma_store.similarity_search(question, filter_dict=filter_dict, k=n, search_type=search_type or self.search_type)
+
+        if self.lexical_index is not None:
+            lexical = self.lexical_index.search(question, k=n, filter_dict=filter_dict)
+            documents = reciprocal_rank_fusion([documents, lexical], k=n)
+
+        if rerank:
+            return self.reranker.rerank(question, documents, k)
+
+        return documents[:k]
 
     def summarize_document(self, document_path, document_id):
         if not document_path and not document_id:
@@ -53,57 +153,18 @@ class AnswerEngine:
             title = db_doc.title
             doc_id = db_doc.id
 
-        chunks = self.chroma_store.get_by_metadata(filter_dict={"document_id": doc_id}, limit=1000)
+        # Sorted by chunk_index, vector stores do not preseve original insertion order
+        chunks = self.chroma_store.get_by_document_ids([doc_id]).get(doc_id, [])
 
         if not chunks:
             raise ValueError(f"No indexed content found for document: {title}")
 
-        sorted_chunks = sorted(chunks, key=lambda x: x.metadata.get("chunk_index", 0)) # Vector stores do not preseve original insertion order
-        full_text = "\n\n".join(chunk.page_content for chunk in sorted_chunks)
-
-        messages = build_summarization_prompt(full_text, title)
-        summary = self.llm_client.chat(messages)
+        summary = HierarchicalSummarizer(self.llm_client, cache=self.response_cache).summarize(chunks, title, document_id=doc_id)
 
         return summary
 
     def get_document_info(self, document_path, document_id):
-        with get_session() as session:
-            if document_id:
-                db_doc = session.query(dbDocument).filter(dbDocument.id == document_id).first()
-
-            elif document_path:
-                db_doc = session.query(dbDocument).filter(dbDocument.path == document_path).first()
-                
-            else:
-                raise ValueError("Must provide either document_path or document_id")
-
-            if not db_doc:
-                return None
-
-            return {
-                "id": db_doc.id,
-                "path": db_doc.path,
-                "document_type": db_doc.document_type,
-                "title": db_doc.title,
-                "tags": db_doc.tags,
-                "description": db_doc.description,
-                "created_at": db_doc.created_at,
-                "updated_at": db_doc.updated_at,
-            }
+        return get_document_info(document_path=document_path, document_id=document_id)
 
     def list_documents(self, document_type=None, limit=100):
-        with get_session() as session:
-            query = session.query(dbDocument)
-            
-            if document_type:
-                query = query.filter(dbDocument.document_type == document_type)
-            
-            docs = query.limit(limit).all()
-
-            return [{
-                "id": doc.id, 
-                "path": doc.path, 
-                "document_type": doc.document_type, 
-                "title": doc.title, 
-                "tags": doc.tags
-                } for doc in docs]
\ No newline at end of file
+        return list_documents(document_type=document_type, limit=limit)
@@ -0,0 +1,147 @@
+import hashlib
+from pathlib import Path
+
+from src.config import settings
+from .summarizer import CHARS_PER_TOKEN, estimate_tokens
+
+MIN_OVERLAP = 20 # Shorter matches between neighbouring chunks are more likely coincidence than splitter overlap
+
+def strip_overlap(left, right, min_overlap=MIN_OVERLAP):
+    """
+    Length of the longest suffix of left that is also a prefix of right.
+
+    The text splitter repeats up to chunk_overlap characters at the start of each chunk, this finds that repeat.
+    """
+    if len(left) < min_overlap or len(right) < min_overlap:
+        return 0
+
+    probe = right[:min_overlap]
+    start = max(0, len(left) - len(right))
+
+    # Every candidate overlap starts where the probe occurs in left, the earliest one is the longest overlap
+    while True:
+        pos = left.find(probe, start)
+
+        if pos == -1:
+            return 0
+
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+
+        start = pos + 1
+
+def merge_chunks(chunks):
+    """Join chunks that follow each other in a document, dropping the text the splitter repeated."""
+    text = chunks[0].page_content
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        content = chunk.page_content
+
+        # Structured chunks repeat their section heading, once per passage is enough
+        if chunk.metadata.get("section") and chunk.metadata.get("section") == previous.metadata.get("section"):
+            heading = previous.page_content.partition("\n")[0]
+
+            if content.startswith(heading + "\n"):
+                content = content[len(heading) + 1:]
+
+        overlap = strip_overlap(text, content)
+        text += content[overlap:] if overlap else "\n\n" + content
+
+    return text
+
+class ContextPacker:
+    """
+    Turns ranked retrieval results into as little prompt text as possible.
+
+    Chunks with the same text are dropped, neighbouring chunks of a document (consecutive chunk_index) are merged
+    into one passage without their overlap, and passages are added best first until the token budget is full.
+    """
+    def __init__(self, token_budget=None):
+        self.token_budget = token_budget or settings.context_token_budget
+
+    def pack(self, documents):
+        """
+        Args:
+            documents: Retrieved Document objects, best match first
+
+        Returns:
+            Tuple of (context chunks for build_rag_prompt, the documents they were built from in ranking order)
+        """
+        documents = self._dedupe(documents)
+        passages = self._passages(documents)
+
+        packed = []
+        used = set()
+        remaining = self.token_budget
+
+        for rank, chunks in passages:
+            text = merge_chunks(chunks)
+            tokens = estimate_tokens(text)
+
+            if tokens > remaining:
+                if packed:
+                    continue # Something smaller further down may still fit
+
+                text = text[:remaining * CHARS_PER_TOKEN] # The best passage always goes in, cut to the budget
+                tokens = remaining
+
+            packed.append({"content": text, "source": self._source(chunks[0])})
+            used.update(id(chunk) for chunk in chunks)
+            remaining -= tokens
+
+            if remaining <= 0:
+                break
+
+        return packed, [doc for doc in documents if id(doc) in used]
+
+    def _dedupe(self, documents):
+        seen = set()
+        unique = []
+
+        for doc in documents:
+            key = hashlib.sha256(doc.page_content.encode("utf-8")).digest()
+
+            if key not in seen:
+                seen.add(key)
+                unique.append(doc)
+
+        return unique
+
+    def _passages(self, documents):
+        """Groups runs of consecutive chunks per document, returns (best rank, chunks in reading order) best first."""
+        by_document = {}
+
+        for rank, doc in enumerate(documents):
+            document_key = doc.metadata.get("document_id") or doc.metadata.get("source_path")
+            by_document.setdefault(document_key, []).append((rank, doc))
+
+        passages = []
+
+        for document_key, ranked in by_document.items():
+            if document_key is None or any(doc.metadata.get("chunk_index") is None for _, doc in ranked):
+                passages.extend((rank, [doc]) for rank, doc in ranked) # Nothing to merge on
+                continue
+
+            ranked.sort(key=lambda item: item[1].metadata["chunk_index"])
+            run = [ranked[0]]
+
+            for item in ranked[1:]:
+                if item[1].metadata["chunk_index"] == run[-1][1].metadata["chunk_index"] + 1:
+                    run.append(item)
+                else:
+                    passages.append((min(rank for rank, _ in run), [doc for _, doc in run]))
+                    run = [item]
+
+            passages.append((min(rank for rank, _ in run), [doc for _, doc in run]))
+
+        return sorted(passages, key=lambda passage: passage[0])
+
+    def _source(self, doc):
+        source = doc.metadata.get("source_path", "Unknown")
+        source = Path(source).name if source != "Unknown" else source
+
+        # Structured chunks know where in the document they come from
+        if doc.metadata.get("section"):
+            source += f" ({doc.metadata['section']})"
+
+        return source
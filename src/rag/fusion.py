@@ -0,0 +1,37 @@
+from src.config import settings
+
+def reciprocal_rank_fusion(result_lists, k=None, rrf_k=None):
+    """
+    Merge ranked result lists with Reciprocal Rank Fusion.
+
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears in, so rankings with
+    incomparable scores (cosine similarity, BM25) can be combined.
+
+    Args:
+        result_lists: Lists of Document objects, each ordered best first and carrying chunk_id in the metadata
+        k: Number of fused results to return (all by default)
+        rrf_k: Damping constant, higher values flatten the weight of top ranks
+
+    Returns:
+        A list of Document objects ordered by fused score, with rrf_score in the metadata
+    """
+    rrf_k = rrf_k or settings.rrf_k
+    scores = {}
+    documents = {}
+
+    for results in result_lists:
+        for rank, doc in enumerate(results, 1):
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+
+            if key in documents:
+                documents[key].metadata.update({name: value for name, value in doc.metadata.items() if name not in documents[key].metadata})
+            else:
+                documents[key] = doc
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+
+    for key in ranked:
+        documents[key].metadata["rrf_score"] = scores[key]
+
+    return [documents[key] for key in ranked]
@@ -0,0 +1,154 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from src.config import settings
+from src.vectorstore.embedding_cache import normalize_query
+
+_models = {} # model name -> CrossEncoder, shared by every reranker in the process
+_models_lock = threading.Lock()
+
+def get_cross_encoder(model_name):
+    """Load a CrossEncoder once per process, torch is only imported on first use."""
+    model = _models.get(model_name)
+
+    if model is not None:
+        return model
+
+    with _models_lock:
+        if model_name not in _models:
+            import torch
+            from sentence_transformers import CrossEncoder
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            _models[model_name] = CrossEncoder(model_name, device=device)
+
+        return _models[model_name]
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieved chunks with a cross-encoder, which reads query and chunk together and ranks far better
+    than bi-encoder cosine similarity, so fewer chunks need to go into the prompt.
+
+    All uncached pairs are scored in one batched predict call, pair scores are kept in an in-memory LRU, and
+    reranking is skipped when the expected scoring time would exceed the latency budget. The very first predict
+    call of a model is a throwaway warm-up, so its cold start never enters the estimate. Without an estimate
+    (e.g. in a one-shot CLI run) a small sample of pairs is scored first to measure it, and while reranking is
+    being skipped a sample is re-measured every rerank_probe_interval calls, so a slow spell doesn't switch
+    reranking off for good.
+    """
+    def __init__(self, model_name=None, latency_budget_ms=None, cache_size=None, batch_size=None, probe_pairs=None, probe_interval=None):
+        self.model_name = model_name or settings.reranker_model_name
+        self.latency_budget = (latency_budget_ms or settings.rerank_latency_budget_ms) / 1000
+        self.cache_size = cache_size or settings.rerank_cache_size
+        self.batch_size = batch_size or settings.rerank_batch_size
+        self.probe_pairs = probe_pairs or settings.rerank_probe_pairs
+        self.probe_interval = probe_interval or settings.rerank_probe_interval
+        self.seconds_per_pair = None # Running estimate, measured on every warm predict call
+        self._warm = False
+        self._skipped = 0 # Calls skipped since the estimate was last measured
+        self._scores = OrderedDict() # (query, chunk hash) -> score
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+
+    def warm_up(self):
+        """Load the model and run its cold first call now, e.g. when a daemon starts rather than on its first query."""
+        model = get_cross_encoder(self.model_name)
+
+        with self._warm_lock:
+            if not self._warm:
+                model.predict([("warm up", "warm up")], batch_size=self.batch_size, show_progress_bar=False)
+                self._warm = True
+
+    def rerank(self, query, documents, k):
+        """
+        Args:
+            query: Question text
+            documents: Candidate Document objects, best first
+            k: Number of documents to keep
+
+        Returns:
+            The k best documents by cross-encoder score, with rerank_score in the metadata, or the first k candidates
+            unchanged when scoring wouldn't fit the latency budget
+        """
+        if len(documents) <= 1:
+            return documents[:k]
+
+        query_key = normalize_query(query)
+        keys = [(query_key, hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()) for doc in documents]
+        scores = self._cached_scores(keys)
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+
+        if missing:
+            self.warm_up()
+            pairs = [(query, documents[i].page_content) for i in missing]
+            budget = self.latency_budget
+
+            with self._lock:
+                probe = self.seconds_per_pair is None or (
+                    self.seconds_per_pair * len(missing) > budget and (self._skipped + 1) % self.probe_interval == 0
+                )
+
+            if probe and len(missing) > self.probe_pairs:
+                # Measure on a few of the real pairs, their scores are kept either way
+                start = time.perf_counter()
+                self._score(pairs[:self.probe_pairs], [keys[i] for i in missing[:self.probe_pairs]], scores, probe=True)
+                budget -= time.perf_counter() - start
+                missing, pairs = missing[self.probe_pairs:], pairs[self.probe_pairs:]
+
+            with self._lock:
+                if self.seconds_per_pair is not None and self.seconds_per_pair * len(missing) > budget:
+                    self._skipped += 1
+                    return documents[:k]
+
+                self._skipped = 0
+
+            self._score(pairs, [keys[i] for i in missing], scores)
+
+        for doc, key in zip(documents, keys):
+            doc.metadata["rerank_score"] = scores[key]
+
+        ranked = sorted(range(len(documents)), key=lambda i: scores[keys[i]], reverse=True)
+
+        return [documents[i] for i in ranked[:k]]
+
+    def _score(self, pairs, keys, scores, probe=False):
+        """Predicts pairs, caches them and adds them to scores."""
+        new_scores = {key: float(score) for key, score in zip(keys, self._predict(pairs, probe))}
+        self._store_scores(new_scores)
+        scores.update(new_scores)
+
+    def _predict(self, pairs, probe=False):
+        model = get_cross_encoder(self.model_name) # Loaded and warmed up outside the timing, it's a one-off cost
+
+        start = time.perf_counter()
+        scores = model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        per_pair = (time.perf_counter() - start) / len(pairs)
+
+        with self._lock:
+            # Smoothed, so one slow call doesn't swing the estimate, a probe is a deliberate fresh measurement and replaces it
+            if probe or self.seconds_per_pair is None:
+                self.seconds_per_pair = per_pair
+            else:
+                self.seconds_per_pair = 0.8 * self.seconds_per_pair + 0.2 * per_pair
+
+        return scores
+
+    def _cached_scores(self, keys):
+        scores = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[key] = self._scores[key]
+
+        return scores
+
+    def _store_scores(self, scores):
+        with self._lock:
+            self._scores.update(scores)
+
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
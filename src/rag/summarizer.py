@@ -0,0 +1,131 @@
+import hashlib
+
+from src.config import settings
+from src.llm.cache import ResponseCache, cache_key
+from src.llm.client import AsyncMistralClient
+from src.llm.prompts import SUMMARY_PROMPT_VERSION, build_summarization_prompt, build_section_summary_prompt, build_combine_summaries_prompt
+
+BOUNDARY_MOD = 8 # On average every 8th node closes a group, so boundaries move with content rather than position
+CHARS_PER_TOKEN = 4 # Rough average for the LLM's tokenizer on English text, the embedding model's tokenizer is a different one
+
+def estimate_tokens(text):
+    """Rough LLM token count, good enough for budgeting prompts."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+class HierarchicalSummarizer:
+    """
+    Map-reduce summarizer for documents that don't fit in one prompt.
+
+    Ordered chunks are split into token-budgeted groups, groups are summarized concurrently, and the
+    summaries are grouped and combined again until one summary is left. Every intermediate summary is
+    cached under a hash of its inputs, so after an edit only the groups containing changed chunks and
+    their ancestors are re-summarized.
+    """
+    def __init__(self, llm_client, group_tokens=None, cache=None):
+        self.llm_client = llm_client
+        self.group_tokens = group_tokens or settings.summary_group_tokens
+        self.cache = cache or (ResponseCache() if settings.response_cache_enabled else None)
+
+    def summarize(self, chunks, title, document_id=None):
+        """
+        Summarize a document.
+
+        Args:
+            chunks: Document chunks, in reading order
+            title: Document title
+            document_id: Optional database id, the cached final summary is dropped when the document is re-indexed
+
+        Returns:
+            The summary text
+        """
+        nodes = [(hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest(), chunk.page_content) for chunk in chunks]
+        client = AsyncMistralClient.from_client(self.llm_client)
+
+        return client.run_sync(self._summarize(client, nodes, title, document_id))
+
+    async def _summarize(self, client, nodes, title, document_id):
+        depth = 0
+
+        while True:
+            groups = self._group(nodes, min_size=1 if depth == 0 else 2)
+            final = len(groups) == 1
+
+            nodes = await self._summarize_groups(client, groups, title, depth, final, document_id)
+
+            if final:
+                return nodes[0][1]
+
+            depth += 1
+
+    def _group(self, nodes, min_size):
+        """
+        Split (key, text) nodes into consecutive groups that fit the token budget.
+
+        A group also closes early after a node whose key hashes onto a boundary, which keeps group
+        boundaries stable when text earlier in the document grows or shrinks.
+        """
+        # Everything that fits one prompt is summarized in one call
+        if sum(estimate_tokens(text) for _, text in nodes) <= self.group_tokens:
+            return [list(nodes)]
+
+        groups = []
+        current = []
+        current_tokens = 0
+
+        for key, text in nodes:
+            tokens = estimate_tokens(text)
+
+            if current and len(current) >= min_size and current_tokens + tokens > self.group_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+
+            current.append((key, text))
+            current_tokens += tokens
+
+            if len(current) >= min_size and int(key[:8], 16) % BOUNDARY_MOD == 0:
+                groups.append(current)
+                current, current_tokens = [], 0
+
+        if current:
+            groups.append(current)
+
+        return groups
+
+    async def _summarize_groups(self, client, groups, title, depth, final, document_id=None):
+        """Summarizes every group concurrently, returns one (key, summary) node per group."""
+        keys = [
+            cache_key(client.model_name, client.temp, SUMMARY_PROMPT_VERSION, depth, final, title, *(key for key, _ in group))
+            for group in groups
+        ]
+
+        summaries = self.cache.get_many(keys) if self.cache is not None else {}
+        missing = [(i, key) for i, key in enumerate(keys) if key not in summaries]
+
+        if missing:
+            prompts = [self._prompt(groups[i], title, depth, final, i + 1, len(groups)) for i, _ in missing]
+            responses = await client.chat_many(prompts)
+
+            for response in responses:
+                if isinstance(response, Exception):
+                    raise response
+
+            new_summaries = {key: response for (_, key), response in zip(missing, responses)}
+            summaries.update(new_summaries)
+
+            if self.cache is not None:
+                # Only the final summary is tied to the document, intermediate ones stay reusable across edits
+                links = {key: [document_id] for key in new_summaries} if final and document_id is not None else None
+                self.cache.put_many(new_summaries, links)
+
+        return [(key, summaries[key]) for key in keys]
+
+    def _prompt(self, group, title, depth, final, part, total_parts):
+        texts = [text for _, text in group]
+
+        if depth > 0:
+            return build_combine_summaries_prompt(texts, title, final)
+
+        if final:
+            return build_summarization_prompt("\n\n".join(texts), title)
+
+        return build_section_summary_prompt("\n\n".join(texts), title, part, total_parts)
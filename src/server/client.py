@@ -0,0 +1,116 @@
+import json
+import socket
+from types import SimpleNamespace
+
+from src.config import settings
+
+def connect_daemon():
+    """Client for the running `serve` daemon, or None when there isn't one (or it's disabled in settings)."""
+    if not settings.use_daemon:
+        return None
+
+    client = DaemonClient()
+
+    return client if client.is_running() else None
+
+class DaemonClient:
+    """
+    Talks to BrainyBinderDaemon over its Unix socket.
+
+    Kept free of heavy imports, so CLI commands that go through the daemon start fast. Sources come back as
+    simple objects with page_content and metadata, like the Document objects AnswerEngine returns.
+    """
+    def __init__(self, socket_path=None, connect_timeout=1.0):
+        self.socket_path = str(socket_path or settings.daemon_socket_path)
+        self.connect_timeout = connect_timeout
+
+    def is_running(self):
+        if not hasattr(socket, "AF_UNIX"):
+            return False
+
+        try:
+            self._connect().close()
+            return True
+
+        except OSError:
+            return False
+
+    def request(self, command, **args):
+        """
+        Send one request.
+
+        Yields:
+            Response messages until the daemon reports it's done
+
+        Raises:
+            Exception: With the daemon's message if the command failed
+        """
+        sock = self._connect()
+
+        try:
+            sock.sendall(json.dumps({"command": command, "args": args}).encode("utf-8") + b"\n")
+
+            with sock.makefile("r", encoding="utf-8") as stream:
+                for line in stream:
+                    message = json.loads(line)
+
+                    if message["type"] == "error":
+                        raise Exception(message["message"])
+
+                    if message["type"] == "done":
+                        return
+
+                    yield message
+
+            raise ConnectionError("Daemon closed the connection before finishing")
+
+        finally:
+            sock.close()
+
+    def query(self, question, top_k=None, filter_dict=None, search_type=None, rerank=None):
+        """
+        Same contract as AnswerEngine.answer_question_stream.
+
+        Returns:
+            Tuple of (iterator over answer tokens, source documents)
+        """
+        messages = self.request("query", question=question, top_k=top_k, filter_dict=filter_dict, search_type=search_type, rerank=rerank)
+        sources = [SimpleNamespace(**doc) for doc in next(messages)["data"]]
+
+        return (message["data"] for message in messages), sources
+
+    def summarize(self, document_path=None, document_id=None):
+        """
+        Returns:
+            Dictionary with summary and title
+        """
+        return self._result("summarize", document_path=document_path, document_id=document_id)
+
+    def tag(self, document_path=None, document_id=None):
+        """Same result dictionary as SemanticTaggingAgent.run."""
+        return self._result("tag", document_path=document_path, document_id=document_id)
+
+    def ping(self):
+        return self._result("ping")
+
+    def _result(self, command, **args):
+        result = None
+
+        for message in self.request(command, **args):
+            result = message["data"]
+
+        return result
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.connect_timeout)
+
+        try:
+            sock.connect(self.socket_path)
+
+        except OSError:
+            sock.close()
+            raise
+
+        sock.settimeout(None) # Generations can take a while, the daemon's LLM client enforces its own timeout
+        return sock
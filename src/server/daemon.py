@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import signal
+from pathlib import Path
+
+from src.config import settings
+from src.rag.answer_engine import AnswerEngine
+from src.agents.semantic_tagging import SemanticTaggingAgent
+
+_DONE = object() # Ends the token stream handed from the worker thread to the event loop
+
+def serialize_documents(documents):
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+class BrainyBinderDaemon:
+    """
+    Keeps the answer engine, vector store, embedding model and LLM client warm in one process and serves
+    query, summarize and tag requests over a local Unix socket.
+
+    The protocol is newline delimited JSON. A client sends one {"command": ..., "args": {...}} request per
+    connection, then reads messages until one with type "done" or "error". Engine calls block, so they run
+    in worker threads and a slow generation doesn't hold up other clients.
+    """
+    def __init__(self, socket_path=None, engine=None, tagging_agent=None):
+        self.socket_path = Path(socket_path or settings.daemon_socket_path)
+        self.engine = engine or AnswerEngine()
+        self.tagging_agent = tagging_agent or SemanticTaggingAgent(llm_client=self.engine.llm_client, chroma_store=self.engine.chroma_store)
+
+        self.handlers = {
+            "ping": self._ping,
+            "query": self._query,
+            "summarize": self._summarize,
+            "tag": self._tag,
+        }
+
+    def warm_up(self):
+        """Load the embedding model (and the cross-encoder, when reranking is on) now, so the first query doesn't pay for it."""
+        self.engine.chroma_store.embedding_service.load_model()
+
+        if self.engine.rerank:
+            self.engine.reranker.warm_up()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self):
+        # A socket file left behind by a daemon that didn't shut down cleanly, the CLI checks nothing answers on it first
+        self.socket_path.unlink(missing_ok=True)
+
+        server = await asyncio.start_unix_server(self._handle, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o600) # Only the owner may talk to their knowledge base
+
+        # SIGTERM (kill, systemd, timeout) shuts down as cleanly as Ctrl+C
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+        try:
+            async with server:
+                await stop.wait()
+
+        finally:
+            self.socket_path.unlink(missing_ok=True)
+
+    async def _handle(self, reader, writer):
+        async def send(message):
+            writer.write(json.dumps(message, default=str).encode("utf-8") + b"\n")
+            await writer.drain()
+
+        try:
+            request = json.loads(await reader.readline())
+            handler = self.handlers.get(request.get("command"))
+
+            if handler is None:
+                raise ValueError(f"Unknown command: {request.get('command')}")
+
+            await handler(send, **request.get("args", {}))
+            await send({"type": "done"})
+
+        except Exception as e:
+            try:
+                await send({"type": "error", "message": str(e)})
+
+            except ConnectionError:
+                pass # Client is gone
+
+        finally:
+            writer.close()
+
+    async def _ping(self, send):
+        await send({"type": "result", "data": {"pid": os.getpid()}})
+
+    async def _query(self, send, question, top_k=None, filter_dict=None, search_type=None, rerank=None):
+        tokens, sources = await asyncio.to_thread(self.engine.answer_question_stream, question, top_k, filter_dict, search_type, rerank)
+        await send({"type": "sources", "data": serialize_documents(sources)})
+
+        # The token iterator blocks on the LLM, so a worker thread drains it into a queue the loop can await
+        loop = asyncio.get_running_loop()
+        token_queue = asyncio.Queue()
+
+        def produce():
+            try:
+                for token in tokens:
+                    loop.call_soon_threadsafe(token_queue.put_nowait, token)
+
+            except Exception as e:
+                loop.call_soon_threadsafe(token_queue.put_nowait, e)
+
+            finally:
+                loop.call_soon_threadsafe(token_queue.put_nowait, _DONE)
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+
+        while (token := await token_queue.get()) is not _DONE:
+            if isinstance(token, Exception):
+                raise token
+
+            await send({"type": "token", "data": token})
+
+        await producer
+
+    async def _summarize(self, send, document_path=None, document_id=None):
+        summary = await asyncio.to_thread(self.engine.summarize_document, document_path, document_id)
+        doc_info = await asyncio.to_thread(self.engine.get_document_info, document_path, document_id)
+
+        await send({"type": "result", "data": {"summary": summary, "title": doc_info["title"] if doc_info else "Document"}})
+
+    async def _tag(self, send, document_path=None, document_id=None):
+        result = await asyncio.to_thread(self.tagging_agent.run, document_path=document_path, document_id=document_id)
+        await send({"type": "result", "data": result})
@@ -1,46 +1,204 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 import chromadb
 
 from chromadb import Settings as ChromaSettings
 from langchain_core.documents import Document
-from .embeddings import EmbeddingService
+from .embeddings import get_embedding_service
+from .filters import filter_values
+from .mmr import maximal_marginal_relevance
 from src.config import settings
 
+def make_chunk_id(document_key, chunk_index, text):
+    """
+    Stable id for a chunk, derived from its document, its position and its content.
+
+    The same chunk always maps to the same id, so writes can be upserts and need no coordination.
+
+    Args:
+        document_key: Database document id, or the source path when there is no id yet
+        chunk_index: Position of the chunk within its document
+        text: Chunk text
+
+    Returns:
+        A hex id string
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{document_key}|{chunk_index}|{content_hash}".encode("utf-8")).hexdigest()[:32]
+
+def shard_name(value):
+    """Collection-safe shard name for a metadata value, after applying chroma_shard_groups."""
+    value = "" if value is None else str(value)
+    value = settings.chroma_shard_groups.get(value, value)
+
+    return re.sub(r"[^a-z0-9_-]+", "_", value.lower()).strip("_-") or "other"
+
 class ChromaStore:
     """
     Wrapper for ChromaDB vector store with custom embeddings.
 
     Handles document storage, retrieval, and similarity search using sentence-transformers embeddings.
+
+    With chroma_shard_by set, chunks are routed to one collection (shard) per value of that metadata key, e.g.
+    one HNSW index per document type. Queries search only the shards their filter pins the key to, fanning out
+    over threads when that's more than one, and merge the per-shard top k by score. Shards can be reset alone.
     """
-    def __init__(self, persist_dir=None, collection_name=None, embedding_service=None):
+    def __init__(self, persist_dir=None, collection_name=None, embedding_service=None, shard_by=None):
         self.persist_dir = persist_dir or str(settings.chroma_db_dir)
         self.collection_name = collection_name or settings.chroma_collection_name
-        self.embedding_service = embedding_service or EmbeddingService()
+        self.shard_by = settings.chroma_shard_by if shard_by is None else shard_by
+        self.embedding_service = embedding_service or get_embedding_service()
         self.client = chromadb.PersistentClient(path=self.persist_dir, settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True)) # On disk needed, not ra
-        self.collection = self.client.get_or_create_collection(name=self.collection_name, metadata={"hnsw:space": "cosine"})
+        self._collections = {} # Shard name (None when unsharded) -> collection
+        self._executor = None
+
+        if not self.shard_by:
+            self._collection(None, create=True)
+
+    @property
+    def collection(self):
+        """The single collection of an unsharded store."""
+        if self.shard_by:
+            raise RuntimeError("Sharded store has no single collection, use collections() instead")
+
+        return self._collection(None, create=True)
+
+    def _collection_name(self, shard):
+        return self.collection_name if shard is None else f"{self.collection_name}__{shard}"
+
+    def _collection(self, shard, create=False):
+        """Collection of one shard, or None if it doesn't exist and create is False."""
+        if shard not in self._collections:
+            name = self._collection_name(shard)
+
+            if create:
+                self._collections[shard] = self.client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+
+            elif name in self._collection_names():
+                self._collections[shard] = self.client.get_collection(name=name)
+
+            else:
+                return None
+
+        return self._collections[shard]
 
-    def add_documents(self, documents, ids=None):
+    def _collection_names(self):
+        # Older chromadb returns names, newer returns Collection objects
+        return {getattr(collection, "name", collection) for collection in self.client.list_collections()}
+
+    def shard_of(self, metadata):
+        """Shard a chunk is routed to, None when the store isn't sharded."""
+        if not self.shard_by:
+            return None
+
+        return shard_name(metadata.get(self.shard_by))
+
+    def shards(self):
+        """Names of the shards that exist on disk ([None] when the store isn't sharded)."""
+        if not self.shard_by:
+            return [None]
+
+        prefix = f"{self.collection_name}__"
+
+        return sorted(name[len(prefix):] for name in self._collection_names() if name.startswith(prefix))
+
+    def collections(self, filter_dict=None):
+        """
+        Collections a query with this filter has to search.
+
+        Args:
+            filter_dict: Optional where filter, pinning the shard key to values narrows the shards searched
+
+        Returns:
+            List of (shard name, collection) tuples
+        """
+        shards = self.shards()
+        values = filter_values(filter_dict, self.shard_by) if self.shard_by else None
+
+        if values is not None:
+            wanted = {shard_name(value) for value in values}
+            shards = [shard for shard in shards if shard in wanted]
+
+        collections = [(shard, self._collection(shard)) for shard in shards]
+
+        return [(shard, collection) for shard, collection in collections if collection is not None]
+
+    def _fan_out(self, collections, call):
+        """Runs call(collection) for every collection, in parallel threads when there's more than one."""
+        if len(collections) <= 1:
+            return [call(collection) for _, collection in collections]
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=settings.chroma_shard_workers, thread_name_prefix="chroma-shard")
+
+        return list(self._executor.map(lambda item: call(item[1]), collections))
+
+    def add_documents(self, documents, ids=None, embeddings=None):
         """
         Add documents to vector store.
 
         Args:
             documents: A list of Document objects w page_content and metadata for each element.
-            ids: An optional list of document ids (will generate if custom ids arent given)
+            ids: An optional list of document ids (will generate stable ids if custom ids arent given)
+            embeddings: Optional precomputed embeddings, one per document (skips the embedding model)
+        """
+        self._write("add", documents, ids, embeddings)
+
+    def upsert_documents(self, documents, ids=None, embeddings=None):
         """
+        Insert documents, overwriting any chunk that already has the same id.
+
+        Args:
+            documents: A list of Document objects w page_content and metadata for each element.
+            ids: An optional list of document ids (will generate stable ids if custom ids arent given)
+            embeddings: Optional precomputed embeddings, one per document (skips the embedding model)
+        """
+        self._write("upsert", documents, ids, embeddings)
+
+    def chunk_ids(self, documents):
+        """Stable ids for a list of chunks, see make_chunk_id."""
+        ids = []
+
+        for i, doc in enumerate(documents):
+            document_key = doc.metadata.get("document_id", doc.metadata.get("source_path", ""))
+            ids.append(make_chunk_id(document_key, doc.metadata.get("chunk_index", i), doc.page_content))
+
+        return ids
+
+    def _write(self, method, documents, ids, embeddings):
         if not documents:
             return
-        
+
         texts = [doc.page_content for doc in documents]
         metadatas = [doc.metadata for doc in documents]
 
-        embeddings = self.embedding_service.embed_documents(texts)
+        if embeddings is None:
+            embeddings = self.embedding_service.embed_documents(texts)
 
         if ids is None:
-            existing_count = self.collection.count()
-            ids = [f"doc_{existing_count + i}" for i in range(len(documents))]
+            ids = self.chunk_ids(documents)
+
+        by_shard = {}
+
+        for i, metadata in enumerate(metadatas):
+            by_shard.setdefault(self.shard_of(metadata), []).append(i)
 
-        self.collection.add(embeddings=embeddings, documents=texts, metadatas=metadatas, ids=ids)
+        # Chroma rejects writes above its max batch size, which cross-file batches can hit
+        batch_size = self.client.get_max_batch_size()
 
-    def similarity_search(self, query, filter_dict=None, k=None):
+        for shard, rows in by_shard.items():
+            write = getattr(self._collection(shard, create=True), method)
+
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                write(
+                    embeddings=[embeddings[i] for i in batch], documents=[texts[i] for i in batch],
+                    metadatas=[metadatas[i] for i in batch], ids=[ids[i] for i in batch]
+                )
+
+    def similarity_search(self, query, filter_dict=None, k=None, search_type=None, fetch_k=None, lambda_mult=None):
         """
         Search for similar documents.
 
@@ -48,27 +206,112 @@ class ChromaStore:
             query: A text of your query
             k: Top k results to fetch from similarity search
             filter_dict: Optional filtering logic using metadata
+            search_type: "similarity" for plain top k, or "mmr" to over-fetch fetch_k candidates and re-select k diverse ones
+            fetch_k: Number of candidates fetched in mmr mode
+            lambda_mult: Relevance vs diversity trade-off in mmr mode
 
         Returns:
             A list of Document objects with text content and and corresponding metadata
         """
-        k = settings.top_k
+        k = k or settings.top_k
+        search_type = search_type or settings.search_type
 
         query_embedding = self.embedding_service.embed_query(query)
 
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
+        if search_type == "mmr":
+            return self._mmr_search(query_embedding, filter_dict, k, fetch_k or settings.mmr_fetch_k, lambda_mult)
+
+        return self._query([query_embedding], filter_dict, k)[0]
+
+    def similarity_search_by_vector(self, embedding, k=None, filter_dict=None):
+        """
+        Plain top k search for a query vector that is already embedded, e.g. for recall benchmarks.
+
+        Returns:
+            A list of Document objects with similarity_score in the metadata
+        """
+        return self._query([list(map(float, embedding))], filter_dict, k or settings.top_k)[0]
+
+    def _query(self, query_embeddings, filter_dict, k, with_embeddings=False):
+        """
+        Queries every shard the filter selects and merges each query's per-shard top k by similarity.
+
+        Returns:
+            One list per query of Document objects, or of (Document, embedding) tuples with with_embeddings
+        """
+        include = ['documents', 'metadatas', 'distances'] + (['embeddings'] if with_embeddings else [])
+
+        shard_results = self._fan_out(self.collections(filter_dict), lambda collection: collection.query(
+            query_embeddings=query_embeddings,
             n_results=k,
-            where=filter_dict,
-            include=['documents', 'metadatas', 'distances']
-        )
+            where=filter_dict or None,
+            include=include
+        ))
+
+        rows = []
+
+        for row in range(len(query_embeddings)):
+            merged = []
+
+            for results in shard_results:
+                documents = self._to_documents(results, row)
+                embeddings = results["embeddings"][row] if with_embeddings else [None] * len(documents)
+                merged.extend(zip(documents, embeddings))
+
+            if len(shard_results) > 1:
+                # Cosine similarities come from the same model, so they compare across shards
+                merged = sorted(merged, key=lambda item: item[0].metadata.get("similarity_score", 0.0), reverse=True)[:k]
+
+            rows.append(merged if with_embeddings else [doc for doc, _ in merged])
+
+        return rows
+
+    def _mmr_search(self, query_embedding, filter_dict, k, fetch_k, lambda_mult):
+        """Fetches candidates together with their embeddings in one round trip per shard, then re-selects them with MMR."""
+        if lambda_mult is None:
+            lambda_mult = settings.mmr_lambda
 
+        candidates = self._query([query_embedding], filter_dict, max(k, fetch_k), with_embeddings=True)[0]
+
+        if not candidates:
+            return []
+
+        selected = maximal_marginal_relevance(query_embedding, [embedding for _, embedding in candidates], k, lambda_mult)
+
+        return [candidates[i][0] for i in selected]
+
+    def similarity_search_batch(self, queries, k=None, filter_dict=None):
+        """
+        Search for several queries at once.
+
+        All queries are embedded in one model call and sent to Chroma in one query.
+
+        Args:
+            queries: A list of query texts
+            k: Top k results to fetch for each query
+            filter_dict: Optional filtering logic using metadata, shared by all queries
+
+        Returns:
+            A list with one list of Document objects per query
+        """
+        if not queries:
+            return []
+
+        k = k or settings.top_k
+        query_embeddings = self.embedding_service.embed_queries(queries)
+
+        return self._query(query_embeddings, filter_dict, k)
+
+    def _to_documents(self, results, row):
+        """Turns one query's row of a Chroma query result into Document objects."""
         documents = []
-    
-        if results["documents"] and results["documents"][0]:
-            for i, doc_text in enumerate(results["documents"][0]):
-                metadata = results["metadatas"][0][i] if results["metadatas"] else {}
-                distance = results["distances"][0][i] if results["distances"] else {}
+
+        if results["documents"] and results["documents"][row]:
+            for i, doc_text in enumerate(results["documents"][row]):
+                metadata = results["metadatas"][row][i] if results["metadatas"] else {}
+                distance = results["distances"][row][i] if results["distances"] else None
+
+                metadata["chunk_id"] = results["ids"][row][i]
 
                 if distance is not None:
                     metadata["similarity_score"] = 1 - distance
@@ -77,16 +320,110 @@ class ChromaStore:
 
         return documents
     
-    def reset(self):
-        """Helper function: Deletes all information in brainy_binder collection."""
-        self.client.delete_collection(name=self.collection_name)
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name, metadata={"hnsw:space": "cosine"}
-        )
+    def delete_by_document(self, document_ids, keep_ids=None):
+        """
+        Delete every chunk belonging to one or more documents.
+
+        Args:
+            document_ids: A database document id or a list of them
+            keep_ids: Optional chunk ids to leave in place, e.g. the chunks that were just upserted for these documents
+        """
+        if isinstance(document_ids, int):
+            document_ids = [document_ids]
+
+        if not document_ids:
+            return
+
+        where = {"document_id": {"$in": list(document_ids)}}
+
+        # Document ids don't say which shard holds the chunks, so every shard is checked
+        for _, collection in self.collections():
+            if keep_ids is None:
+                collection.delete(where=where)
+                continue
+
+            keep = set(keep_ids)
+            existing = collection.get(where=where, include=[])["ids"]
+            stale = [chunk_id for chunk_id in existing if chunk_id not in keep]
+
+            if stale:
+                collection.delete(ids=stale)
+
+    def reset(self, shard=None):
+        """
+        Helper function: Deletes all information in the brainy_binder collections.
+
+        Args:
+            shard: Optional shard name, only that shard is dropped and the others are left alone
+        """
+        shards = [shard] if shard is not None else self.shards()
+
+        for name in shards:
+            if self._collection_name(name) in self._collection_names():
+                self.client.delete_collection(name=self._collection_name(name))
+
+            self._collections.pop(name, None)
+
+        if not self.shard_by:
+            self._collection(None, create=True)
 
-    def count(self):
-        """Helper function: Retreives the amount of documents in the collection"""
-        return self.collection.count()
+    def count(self, shard=None):
+        """Helper function: Retreives the amount of documents in the collection (or one shard)"""
+        if shard is not None:
+            collection = self._collection(shard)
+            return collection.count() if collection is not None else 0
+
+        return sum(collection.count() for _, collection in self.collections())
+
+    def shard_counts(self):
+        """Helper function: Chunks per shard."""
+        return {shard: collection.count() for shard, collection in self.collections()}
+
+    def document_ids(self, shard=None, page_size=1000):
+        """
+        Ids of the documents with chunks in the store, or in one shard.
+
+        Returns:
+            Set of database document ids
+        """
+        document_ids = set()
+
+        for _, results in self.iter_batches(page_size, include=["metadatas"], shard=shard):
+            document_ids.update(metadata.get("document_id") for metadata in results["metadatas"])
+
+        document_ids.discard(None)
+
+        return document_ids
+
+    def iter_batches(self, page_size=1000, include=None, shard=None):
+        """
+        Page through every stored chunk, shard by shard.
+
+        Args:
+            page_size: Chunks read per round trip
+            include: Chroma fields to return, documents and metadatas by default
+            shard: Optional shard name to read only that shard
+
+        Yields:
+            (ids, results) tuples, results being the Chroma get() result for the page
+        """
+        include = include or ["documents", "metadatas"]
+        collections = self.collections() if shard is None else [(shard, self._collection(shard))]
+
+        for _, collection in collections:
+            if collection is None:
+                continue
+
+            offset = 0
+
+            while True:
+                results = collection.get(limit=page_size, offset=offset, include=include)
+
+                if not results["ids"]:
+                    break
+
+                yield results["ids"], results
+                offset += page_size
     
     def get_by_metadata(self, filter_dict, limit=100):
         """
@@ -99,13 +436,46 @@ class ChromaStore:
         Returns:
             A list of Document objects
         """
-        results = self.collection.get(where=filter_dict, limit=limit, include=["documents", "metadatas"])
+        shard_results = self._fan_out(
+            self.collections(filter_dict),
+            lambda collection: collection.get(where=filter_dict, limit=limit, include=["documents", "metadatas"])
+        )
 
         documents = []
 
-        if results["documents"]:
-            for i, doc_text in enumerate(results["documents"]):
-                metadata = results["metadatas"][i] if results["metadatas"] else {}
-                documents.append(Document(page_content=doc_text, metadata=metadata))
+        for results in shard_results:
+            if results["documents"]:
+                for i, doc_text in enumerate(results["documents"]):
+                    metadata = results["metadatas"][i] if results["metadatas"] else {}
+                    documents.append(Document(page_content=doc_text, metadata=metadata))
+
+        return documents[:limit] if limit is not None else documents
+
+    def get_by_document_ids(self, document_ids, max_chunks=None):
+        """
+        Fetch the chunks of many documents in one round trip.
+
+        Args:
+            document_ids: Database document ids
+            max_chunks: Optional cap on chunks per document, only the first ones by chunk_index are fetched
+
+        Returns:
+            Dictionary mapping document id to its Document chunks, ordered by chunk_index
+        """
+        if not document_ids:
+            return {}
+
+        where = {"document_id": {"$in": list(document_ids)}}
+
+        if max_chunks is not None:
+            where = {"$and": [where, {"chunk_index": {"$lt": max_chunks}}]}
+
+        by_document = {}
+
+        for doc in self.get_by_metadata(filter_dict=where, limit=None):
+            by_document.setdefault(doc.metadata.get("document_id"), []).append(doc)
+
+        for chunks in by_document.values():
+            chunks.sort(key=lambda x: x.metadata.get("chunk_index", 0))
 
-        return documents
\ No newline at end of file
+        return by_document
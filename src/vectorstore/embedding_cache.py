@@ -0,0 +1,148 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy.dialects.sqlite import insert
+
+from src.config import settings
+from src.db.helpers import BATCH_SIZE, LRUEviction
+from src.db.session import get_session
+from src.db.models import EmbeddingCacheEntry
+
+def text_hash(text):
+    """Sha256 of a chunk's text, the cache key next to the model name."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent chunk embedding cache stored in the SQLite database.
+
+    Vectors are stored as float32 bytes keyed on (model_name, sha256(text)). The least recently used
+    entries are evicted once the cache grows past max_entries.
+    """
+    def __init__(self, model_name, max_entries=None):
+        self.model_name = model_name
+        self.max_entries = max_entries or settings.embedding_cache_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._eviction = LRUEviction(EmbeddingCacheEntry, [EmbeddingCacheEntry.model_name, EmbeddingCacheEntry.text_hash], self.max_entries)
+        self._lock = threading.Lock()
+
+    def get_many(self, hashes):
+        """
+        Look up cached vectors.
+
+        Args:
+            hashes: List of text hashes
+
+        Returns:
+            Dictionary mapping each found hash to its float32 vector
+        """
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+
+        with get_session() as session:
+            for start in range(0, len(unique), BATCH_SIZE):
+                batch = unique[start:start + BATCH_SIZE]
+
+                rows = session.query(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector).filter(
+                    EmbeddingCacheEntry.model_name == self.model_name, EmbeddingCacheEntry.text_hash.in_(batch)
+                ).all()
+
+                for row in rows:
+                    found[row.text_hash] = np.frombuffer(row.vector, dtype=np.float32)
+
+            if found:
+                # Touch hits in bulk so eviction stays least-recently-used
+                session.query(EmbeddingCacheEntry).filter(
+                    EmbeddingCacheEntry.model_name == self.model_name, EmbeddingCacheEntry.text_hash.in_(list(found))
+                ).update({"last_used": time.time()}, synchronize_session=False)
+
+        with self._lock:
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+
+        return found
+
+    def put_many(self, vectors):
+        """
+        Store vectors, then evict if the cache grew past max_entries.
+
+        Args:
+            vectors: Dictionary mapping text hash to embedding vector
+        """
+        if not vectors:
+            return
+
+        now = time.time()
+        rows = [
+            {"model_name": self.model_name, "text_hash": h, "vector": np.asarray(v, dtype=np.float32).tobytes(), "last_used": now}
+            for h, v in vectors.items()
+        ]
+
+        with get_session() as session:
+            result = session.connection().execute(insert(EmbeddingCacheEntry).on_conflict_do_nothing(), rows)
+            self._eviction.added(session, max(result.rowcount, 0))
+
+    def stats(self):
+        """Hit/miss counters for this process."""
+        total = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        """Helper function: Drops all cached vectors of this model."""
+        with get_session() as session:
+            session.query(EmbeddingCacheEntry).filter(EmbeddingCacheEntry.model_name == self.model_name).delete()
+
+        self._eviction.reset()
+
+def normalize_query(text):
+    """Cache key for a query: unicode normalized, surrounding and repeated whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU cache with a TTL for query embeddings.
+
+    Repeated questions in chat sessions and evaluation runs skip the model entirely.
+    """
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or settings.query_cache_size
+        self.ttl = ttl or settings.query_cache_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, vector):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, vector)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,22 +1,102 @@
-from sentence_transformers import SentenceTransformer
-import torch
+import threading
+
+import numpy as np
 
 from src.config import settings
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache, normalize_query, text_hash
+
+_models = {} # model name -> SentenceTransformer, shared by every service in the process
+_services = {}
+_tokenizers = {}
+_registry_lock = threading.Lock()
+
+def get_model(model_name):
+    """
+    Load a SentenceTransformer once per process.
+
+    torch and sentence-transformers are only imported here, so code paths that never embed don't pay for them.
+    """
+    model = _models.get(model_name)
+
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        # Another thread may have finished loading while we waited
+        if model_name not in _models:
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            _models[model_name] = SentenceTransformer(model_name, device=device)
+
+        return _models[model_name]
+
+def get_tokenizer(model_name=None):
+    """
+    Tokenizer of an embedding model, for measuring text the way the model sees it.
+
+    Loaded on its own through transformers when possible, which is far lighter than the model, since chunking
+    runs in every ingest worker process.
+    """
+    model_name = model_name or settings.embedding_model_name
+    tokenizer = _tokenizers.get(model_name)
+
+    if tokenizer is not None:
+        return tokenizer
+
+    if model_name in _models:
+        tokenizer = _models[model_name].tokenizer
+
+    else:
+        try:
+            from transformers import AutoTokenizer
+
+            # Short sentence-transformers names live under their organisation on the hub
+            repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            tokenizer = AutoTokenizer.from_pretrained(repo)
+
+        except Exception:
+            tokenizer = get_model(model_name).tokenizer
+
+    _tokenizers[model_name] = tokenizer # Two threads racing here just load it twice
+
+    return tokenizer
+
+def get_embedding_service(model_name=None):
+    """Shared EmbeddingService for a model, so stores and engines in one process share its caches."""
+    model_name = model_name or settings.embedding_model_name
+
+    with _registry_lock:
+        if model_name not in _services:
+            _services[model_name] = EmbeddingService(model_name)
+
+        return _services[model_name]
 
 class EmbeddingService:
     """
     Service for generating embeddings using sentence-transformers
     
     Provides methods to embed documents and queries and extract dim.
+    Document embeddings go through a persistent cache, so unchanged chunks never reach the model.
+    Query embeddings go through an in-memory LRU cache.
+    The model itself is loaded on first use and shared process-wide (see get_model).
     """
-    def __init__(self, model_name=None):
+    def __init__(self, model_name=None, cache=None, query_cache=None):
         self.model_name = model_name or settings.embedding_model_name
-        self.model = None
-        self.load_model()
+        self.cache = cache
+        self.query_cache = query_cache or QueryEmbeddingCache()
+
+        if self.cache is None and settings.embedding_cache_enabled:
+            self.cache = EmbeddingCache(self.model_name)
+
+    @property
+    def model(self):
+        return get_model(self.model_name)
 
     def load_model(self):
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = SentenceTransformer(self.model_name, device=device)
+        """Load the model now instead of on first encode, e.g. before timing-sensitive work."""
+        return self.model
     
     def embed_documents(self, texts):
         """
@@ -30,10 +110,29 @@ class EmbeddingService:
         """
         if not texts:
             return False
-        
+
+        if self.cache is None:
+            return self.encode(texts).tolist()
+
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(hashes)
+
+        # Only texts we haven't seen go to the model, duplicates within the batch are encoded once
+        missing = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+
+        if missing:
+            encoded = self.encode(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), encoded))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return np.stack([vectors[h] for h in hashes]).tolist()
+
+    def encode(self, texts):
+        """Run the model over a list of texts, returns a float32 array."""
         embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True, batch_size=32)
 
-        return embeddings.tolist()
+        return embeddings.astype(np.float32, copy=False)
     
     def embed_query(self, text):
         """
@@ -45,9 +144,30 @@ class EmbeddingService:
         Returns:
             An embedding vector of the query
         """
-        embedding = self.model.encode(text, convert_to_numpy=True, show_progress_bar=False)
-        
-        return embedding.tolist()
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        """
+        Embed several queries, encoding all cache misses in a single model call.
+
+        Args:
+            texts: list of query texts to embed
+
+        Returns:
+            A list of embedding vectors, one per query
+        """
+        keys = [normalize_query(text) for text in texts]
+        vectors = {key: self.query_cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, vector in vectors.items() if vector is None]
+
+        if missing:
+            encoded = self.model.encode(missing, convert_to_numpy=True, show_progress_bar=False)
+
+            for key, embedding in zip(missing, encoded):
+                vectors[key] = embedding.tolist()
+                self.query_cache.put(key, vectors[key])
+
+        return [vectors[key] for key in keys]
     
     def dimension(self):
         return self.model.get_sentence_embedding_dimension()
\ No newline at end of file
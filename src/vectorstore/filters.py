@@ -0,0 +1,65 @@
+def matches_filter(metadata, filter_dict):
+    """
+    Checks chunk metadata against a Chroma style where filter.
+
+    Supports plain equality, $eq, $ne, $in, $nin and $and / $or, which covers what the app builds.
+    """
+    if not filter_dict:
+        return True
+
+    for key, condition in filter_dict.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+
+        elif metadata.get(key) != condition:
+            return False
+
+    return True
+
+def filter_values(filter_dict, key):
+    """
+    The values a where filter pins a metadata key to, via equality, $eq or $in (top level or $and'ed).
+
+    Returns:
+        A list of values, or None if the filter doesn't restrict the key
+    """
+    if not filter_dict:
+        return None
+
+    condition = filter_dict.get(key)
+
+    if isinstance(condition, dict):
+        if "$eq" in condition:
+            return [condition["$eq"]]
+
+        if "$in" in condition:
+            return list(condition["$in"])
+
+    elif key in filter_dict:
+        return [condition]
+
+    for sub in filter_dict.get("$and", []):
+        values = filter_values(sub, key)
+
+        if values is not None:
+            return values
+
+    return None
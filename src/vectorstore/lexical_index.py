@@ -0,0 +1,184 @@
+import json
+import re
+
+from langchain_core.documents import Document
+from sqlalchemy import func, insert, text
+
+from src.db.helpers import BATCH_SIZE
+from src.db.session import get_session
+from src.db.models import LexicalChunk
+from .filters import filter_values, matches_filter
+
+TOKEN_PATTERN = re.compile(r"\w+") # Same word split as the FTS5 tokenizer below (unicode61, '_' kept inside tokens)
+
+class LexicalIndex:
+    """
+    BM25 keyword index over chunk text, stored as an SQLite FTS5 table next to the document metadata.
+
+    Catches exact identifiers, error codes and names that the embeddings tend to miss. Chunks share ids with
+    Chroma so results can be fused, and the index is updated per document like the vector store.
+    """
+    def __init__(self):
+        with get_session() as session:
+            # detail=column drops token positions (no phrase queries), which keeps the index small
+            session.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+                "content, metadata UNINDEXED, detail=column, tokenize=\"unicode61 tokenchars '_'\")"
+            ))
+
+    def upsert_chunks(self, ids, documents):
+        """
+        Index chunks, replacing any existing entries with the same chunk ids.
+
+        Args:
+            ids: Chunk ids, the same ones used in Chroma
+            documents: Document objects with page_content and metadata
+        """
+        if not documents:
+            return
+
+        with get_session() as session:
+            self._delete_rows(session, self._rows_for_chunks(session, ids))
+
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch_ids = ids[start:start + BATCH_SIZE]
+                batch_docs = documents[start:start + BATCH_SIZE]
+
+                rowids = session.execute(
+                    insert(LexicalChunk).returning(LexicalChunk.id, sort_by_parameter_order=True),
+                    [{"chunk_id": chunk_id, "document_id": doc.metadata.get("document_id")} for chunk_id, doc in zip(batch_ids, batch_docs)]
+                ).scalars().all()
+
+                session.execute(
+                    text("INSERT INTO chunks_fts(rowid, content, metadata) VALUES (:rowid, :content, :metadata)"),
+                    [
+                        {"rowid": rowid, "content": doc.page_content, "metadata": json.dumps(doc.metadata)}
+                        for rowid, doc in zip(rowids, batch_docs)
+                    ]
+                )
+
+    def delete_by_document(self, document_ids, keep_ids=None):
+        """
+        Remove the chunks of one or more documents.
+
+        Args:
+            document_ids: A database document id or a list of them
+            keep_ids: Optional chunk ids to leave in place
+        """
+        if isinstance(document_ids, int):
+            document_ids = [document_ids]
+
+        if not document_ids:
+            return
+
+        keep_ids = set(keep_ids or [])
+
+        with get_session() as session:
+            rows = []
+
+            for start in range(0, len(document_ids), BATCH_SIZE):
+                rows.extend(
+                    session.query(LexicalChunk.id, LexicalChunk.chunk_id)
+                    .filter(LexicalChunk.document_id.in_(document_ids[start:start + BATCH_SIZE]))
+                    .all()
+                )
+
+            self._delete_rows(session, [row.id for row in rows if row.chunk_id not in keep_ids])
+
+    def search(self, query, k=5, filter_dict=None):
+        """
+        BM25 keyword search.
+
+        Args:
+            query: Query text, its words are OR'ed together and ranked by BM25
+            k: Number of results
+            filter_dict: Optional Chroma style metadata filter
+
+        Returns:
+            A list of Document objects, best match first, with chunk_id and bm25_score in the metadata
+        """
+        tokens = dict.fromkeys(TOKEN_PATTERN.findall(query.lower()))
+
+        if not tokens:
+            return []
+
+        match = " OR ".join(f'"{token}"' for token in tokens)
+        limit = k if not filter_dict else k * 10 # Filters are applied after ranking, so over-fetch
+        document_ids = filter_values(filter_dict, "document_id")
+        document_clause = ""
+
+        if document_ids is not None:
+            # Document sets (e.g. from a tag filter) are applied in SQL, so a small subset isn't crowded out by the rest
+            if not document_ids:
+                return []
+
+            document_clause = f"AND lexical_chunks.document_id IN ({', '.join(str(int(doc_id)) for doc_id in document_ids)}) "
+
+        with get_session() as session:
+            rows = session.execute(
+                text(
+                    "SELECT lexical_chunks.chunk_id, chunks_fts.content, chunks_fts.metadata, bm25(chunks_fts) AS score "
+                    "FROM chunks_fts JOIN lexical_chunks ON lexical_chunks.id = chunks_fts.rowid "
+                    f"WHERE chunks_fts MATCH :match {document_clause}ORDER BY score LIMIT :limit"
+                ),
+                {"match": match, "limit": limit}
+            ).all()
+
+        documents = []
+
+        for row in rows:
+            metadata = json.loads(row.metadata)
+
+            if not matches_filter(metadata, filter_dict):
+                continue
+
+            metadata["chunk_id"] = row.chunk_id
+            metadata["bm25_score"] = -row.score # FTS5 reports bm25 as negative, lower is better
+            documents.append(Document(page_content=row.content, metadata=metadata))
+
+            if len(documents) >= k:
+                break
+
+        return documents
+
+    def count(self):
+        """Helper function: Number of indexed chunks."""
+        with get_session() as session:
+            return session.query(func.count(LexicalChunk.id)).scalar()
+
+    def reset(self):
+        """Helper function: Drops every indexed chunk."""
+        with get_session() as session:
+            session.execute(text("DELETE FROM chunks_fts"))
+            session.query(LexicalChunk).delete()
+
+    def rebuild(self, chroma_store, page_size=1000):
+        """
+        Index every chunk already stored in Chroma, e.g. for a vector store built before the lexical index existed.
+
+        Args:
+            chroma_store: ChromaStore to read chunks from
+            page_size: Chunks read per round trip
+        """
+        self.reset()
+
+        for ids, results in chroma_store.iter_batches(page_size):
+            documents = [Document(page_content=doc_text, metadata=metadata) for doc_text, metadata in zip(results["documents"], results["metadatas"])]
+            self.upsert_chunks(ids, documents)
+
+    def _rows_for_chunks(self, session, ids):
+        rowids = []
+
+        for start in range(0, len(ids), BATCH_SIZE):
+            rows = session.query(LexicalChunk.id).filter(LexicalChunk.chunk_id.in_(ids[start:start + BATCH_SIZE])).all()
+            rowids.extend(row.id for row in rows)
+
+        return rowids
+
+    def _delete_rows(self, session, rowids):
+        for start in range(0, len(rowids), BATCH_SIZE):
+            batch = rowids[start:start + BATCH_SIZE]
+            placeholders = ", ".join(str(int(rowid)) for rowid in batch)
+
+            session.execute(text(f"DELETE FROM chunks_fts WHERE rowid IN ({placeholders})"))
+            session.query(LexicalChunk).filter(LexicalChunk.id.in_(batch)).delete(synchronize_session=False)
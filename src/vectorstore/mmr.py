@@ -0,0 +1,43 @@
+import numpy as np
+
+def maximal_marginal_relevance(query_embedding, embeddings, k, lambda_mult=0.5):
+    """
+    Select k diverse results with Maximal Marginal Relevance.
+
+    Each step picks the candidate maximizing lambda * sim(query, doc) - (1 - lambda) * max sim(doc, selected).
+    Similarities are computed once as matrix products, the greedy loop only updates a running max.
+
+    Args:
+        query_embedding: Query vector
+        embeddings: Candidate vectors, one row per candidate
+        k: Number of results to select
+        lambda_mult: 1 favours relevance only, 0 favours diversity only
+
+    Returns:
+        List of selected candidate indices, in selection order
+    """
+    candidates = np.asarray(embeddings, dtype=np.float32)
+
+    if candidates.ndim != 2 or len(candidates) == 0 or k <= 0:
+        return []
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(np.linalg.norm(query), 1e-12)
+
+    query_sim = candidates @ query
+    pair_sim = candidates @ candidates.T
+
+    k = min(k, len(candidates))
+    selected = [int(np.argmax(query_sim))]
+    max_sim_to_selected = pair_sim[selected[0]].copy()
+
+    while len(selected) < k:
+        scores = lambda_mult * query_sim - (1 - lambda_mult) * max_sim_to_selected
+        scores[selected] = -np.inf
+
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(max_sim_to_selected, pair_sim[best], out=max_sim_to_selected)
+
+    return selected
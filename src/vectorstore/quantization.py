@@ -0,0 +1,122 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.config import settings
+from .snapshot import EMBEDDINGS_FILE, MANIFEST_FILE, MemmapVectorIndex, normalize_queries, top_k_rows
+
+CODES_FILE = "embeddings.int8.npy" # (n, dim) int8 codes
+SCALES_FILE = "int8_scales.npy" # (dim,) float32, code * scale approximates the vector
+
+def quantize_snapshot(path=None, keep_full_precision=True, block_rows=None):
+    """
+    Add int8 scalar-quantized vectors to an exported snapshot.
+
+    Every dimension gets a symmetric scale (its max. absolute value / 127), so codes take a quarter of the
+    float32 space (half of float16) and a dot product with a pre-scaled query approximates the cosine
+    similarity. Both passes over the vectors go block by block, memory stays at one block.
+
+    Args:
+        path: Snapshot directory, defaults to snapshot_dir
+        keep_full_precision: Keep embeddings.npy for re-scoring, without it the index ranks by the codes alone
+        block_rows: Rows read per block
+
+    Returns:
+        The updated snapshot manifest
+    """
+    path = Path(path or settings.snapshot_dir)
+    block_rows = block_rows or settings.snapshot_block_rows
+    embeddings = np.load(path / EMBEDDINGS_FILE, mmap_mode="r")
+    n, dim = embeddings.shape
+
+    max_abs = np.zeros(dim, dtype=np.float32)
+
+    for start in range(0, n, block_rows):
+        max_abs = np.maximum(max_abs, np.abs(np.asarray(embeddings[start:start + block_rows], dtype=np.float32)).max(axis=0))
+
+    scales = np.where(max_abs > 0, max_abs / 127, 1.0).astype(np.float32)
+
+    tmp_codes = path / (CODES_FILE + ".tmp")
+    codes = np.lib.format.open_memmap(tmp_codes, mode="w+", dtype=np.int8, shape=(n, dim))
+
+    for start in range(0, n, block_rows):
+        block = np.asarray(embeddings[start:start + block_rows], dtype=np.float32)
+        codes[start:start + len(block)] = np.clip(np.rint(block / scales), -127, 127)
+
+    codes.flush()
+    del codes, embeddings
+
+    np.save(path / SCALES_FILE, scales)
+    os.replace(tmp_codes, path / CODES_FILE)
+
+    with open(path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    manifest["quantization"] = {"type": "int8", "full_precision": keep_full_precision}
+
+    with open(path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if not keep_full_precision:
+        (path / EMBEDDINGS_FILE).unlink()
+
+    return manifest
+
+class QuantizedVectorIndex(MemmapVectorIndex):
+    """
+    Snapshot search over int8 codes, with full precision re-scoring of a shortlist.
+
+    The codes are scanned in blocks like MemmapVectorIndex scans the full vectors, but keep rescore_factor * k
+    candidates per query. Only those rows of embeddings.npy are then read and ranked exactly, so the working
+    set is the codes plus a few rows per query. Snapshots quantized without full precision vectors rank by
+    the codes alone.
+    """
+    def __init__(self, path=None, block_rows=None, embedding_service=None, rescore_factor=None):
+        super().__init__(path, block_rows, embedding_service)
+
+        if self.manifest.get("quantization", {}).get("type") != "int8":
+            raise ValueError(f"{self.path} has no int8 vectors, export it with --quantize int8")
+
+        self.codes = np.load(self.path / CODES_FILE, mmap_mode="r")
+        self.scales = np.load(self.path / SCALES_FILE)
+        self.rescore_factor = settings.quantized_rescore_factor if rescore_factor is None else rescore_factor
+
+    def search(self, query_embeddings, k=None, document_ids=None, rescore_factor=None):
+        """
+        Approximate top k by cosine similarity.
+
+        Args:
+            query_embeddings: One query vector, or a (m, dim) array of them
+            k: Results per query
+            document_ids: Optional ids, only chunks of these documents are searched
+            rescore_factor: Shortlist size as a multiple of k, 0 ranks by the int8 codes only
+
+        Returns:
+            Tuple of (rows, scores), each a (m, k) array (fewer columns if fewer rows match), best first
+        """
+        k = k or settings.top_k
+        rescore_factor = self.rescore_factor if rescore_factor is None else rescore_factor
+        queries = normalize_queries(query_embeddings)
+
+        # Folding the scales into the query keeps the per-block work at one matrix product
+        shortlist, approx_scores = self._scan(queries * self.scales, max(k, k * rescore_factor), document_ids, self._score_codes)
+
+        if not rescore_factor or self.embeddings is None or shortlist.shape[1] == 0:
+            return shortlist[:, :k], approx_scores[:, :k]
+
+        rows = np.empty((len(queries), min(k, shortlist.shape[1])), dtype=np.int64)
+        scores = np.empty(rows.shape, dtype=np.float32)
+
+        for i, (query, candidates) in enumerate(zip(queries, shortlist)):
+            candidates = np.sort(candidates) # Reads the memmap front to back
+            exact = np.asarray(self.embeddings[candidates], dtype=np.float32) @ query
+            top = top_k_rows(exact[:, None], k)[:, 0]
+
+            rows[i], scores[i] = candidates[top], exact[top]
+
+        return rows, scores
+
+    def _score_codes(self, start, stop, scaled_queries):
+        return np.asarray(self.codes[start:stop], dtype=np.float32) @ scaled_queries.T
@@ -0,0 +1,255 @@
+import json
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.config import settings
+from .filters import filter_values
+
+EMBEDDINGS_FILE = "embeddings.npy" # (n, dim) unit-length vectors, float16 or float32
+DOCUMENT_IDS_FILE = "document_ids.npy" # (n,) int64, -1 for chunks without a document
+IDS_FILE = "ids.bin" # Chunk ids, utf-8, concatenated
+OFFSETS_FILE = "ids_offsets.npy" # (n + 1,) int64 byte offsets of each chunk id in ids.bin
+MANIFEST_FILE = "manifest.json"
+
+def export_snapshot(chroma_store, out_dir, dtype=None, page_size=1000):
+    """
+    Write every embedding in the vector store to a read-only snapshot directory.
+
+    Vectors are normalized so a dot product is the cosine similarity Chroma ranks by, and written page by page
+    into a preallocated .npy, so memory stays at one page whatever the corpus size. The snapshot is built next to
+    out_dir and moved into place at the end. An existing snapshot is replaced, any other non-empty directory is
+    refused.
+
+    Args:
+        chroma_store: ChromaStore to read from (every shard)
+        out_dir: Snapshot directory
+        dtype: "float16" (half the size) or "float32", defaults to snapshot_dtype
+        page_size: Chunks read per round trip
+
+    Returns:
+        The snapshot manifest
+    """
+    dtype = np.dtype(dtype or settings.snapshot_dtype)
+
+    if dtype not in (np.float16, np.float32):
+        raise ValueError(f"Unsupported snapshot dtype: {dtype} (use float16 or float32)")
+
+    out_dir = Path(out_dir).expanduser().resolve() # "." has no name to derive the temp directory from
+    check_replaceable(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    total = chroma_store.count()
+    embeddings = None
+    document_ids = np.lib.format.open_memmap(tmp_dir / DOCUMENT_IDS_FILE, mode="w+", dtype=np.int64, shape=(total,))
+    offsets = np.zeros(total + 1, dtype=np.int64)
+    n = 0
+
+    with open(tmp_dir / IDS_FILE, "wb") as ids_file:
+        for ids, results in chroma_store.iter_batches(page_size, include=["embeddings", "metadatas"]):
+            if n + len(ids) > total:
+                raise RuntimeError("The vector store changed during the export, try again")
+
+            vectors = np.asarray(results["embeddings"], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+            # Dimension is only known once the first page is in
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(tmp_dir / EMBEDDINGS_FILE, mode="w+", dtype=dtype, shape=(total, vectors.shape[1]))
+
+            embeddings[n:n + len(ids)] = vectors
+            document_ids[n:n + len(ids)] = [metadata.get("document_id", -1) if metadata else -1 for metadata in results["metadatas"]]
+
+            encoded = [chunk_id.encode("utf-8") for chunk_id in ids]
+            ids_file.write(b"".join(encoded))
+            offsets[n + 1:n + len(ids) + 1] = offsets[n] + np.cumsum([len(chunk_id) for chunk_id in encoded])
+
+            n += len(ids)
+
+    if n != total:
+        raise RuntimeError("The vector store changed during the export, try again")
+
+    if embeddings is None:
+        embeddings = np.lib.format.open_memmap(tmp_dir / EMBEDDINGS_FILE, mode="w+", dtype=dtype, shape=(0, 0))
+
+    embeddings.flush()
+    document_ids.flush()
+    np.save(tmp_dir / OFFSETS_FILE, offsets)
+
+    manifest = {
+        "count": n,
+        "dim": int(embeddings.shape[1]),
+        "dtype": dtype.name,
+        "normalized": True,
+        "embedding_model_name": chroma_store.embedding_service.model_name,
+        "collection_name": chroma_store.collection_name,
+        "created_at": time.time(),
+    }
+
+    with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    del embeddings, document_ids # Closes the memmaps before the directory moves
+
+    check_replaceable(out_dir) # Again, something may have been written there during the export
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+
+    tmp_dir.rename(out_dir)
+
+    return manifest
+
+def check_replaceable(out_dir):
+    """Raises unless out_dir is missing, an empty directory or an earlier snapshot, so an export never wipes other files."""
+    if not out_dir.exists():
+        return
+
+    if not out_dir.is_dir():
+        raise ValueError(f"{out_dir} exists and is not a directory")
+
+    if any(out_dir.iterdir()) and not (out_dir / MANIFEST_FILE).is_file():
+        raise ValueError(f"{out_dir} is not empty and doesn't hold a snapshot, choose another --out directory")
+
+def normalize_queries(query_embeddings):
+    """One query vector or a (m, dim) array of them, as unit-length float32 rows."""
+    queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+    return queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+def top_k_rows(scores, k):
+    """Indices of the k highest scores of each column, best first, as a (k, m) array."""
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=0), axis=0, kind="stable")
+
+    return np.take_along_axis(top, order, axis=0)
+
+class MemmapVectorIndex:
+    """
+    Exact (brute force) vector search over an exported snapshot, without the Chroma client.
+
+    The vectors are memory mapped, so opening the index reads nothing but the manifest and processes searching
+    the same snapshot share the OS page cache. Searches scan the matrix in blocks of block_rows rows: one
+    matrix product per block, then a partial sort that keeps only each query's running top k. Results are exact,
+    which makes it the reference when measuring HNSW recall.
+    """
+    def __init__(self, path=None, block_rows=None, embedding_service=None):
+        self.path = Path(path or settings.snapshot_dir)
+        self.block_rows = block_rows or settings.snapshot_block_rows
+        self._embedding_service = embedding_service
+
+        with open(self.path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        # Int8-only snapshots (see quantization.py) have no full precision vectors
+        self.embeddings = np.load(self.path / EMBEDDINGS_FILE, mmap_mode="r") if (self.path / EMBEDDINGS_FILE).exists() else None
+        self.document_ids = np.load(self.path / DOCUMENT_IDS_FILE, mmap_mode="r")
+        self.offsets = np.load(self.path / OFFSETS_FILE, mmap_mode="r")
+        self._ids = np.memmap(self.path / IDS_FILE, dtype=np.uint8, mode="r") if self.offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    @property
+    def embedding_service(self):
+        """Embeds query text with the model the snapshot was exported from, loaded on first use."""
+        if self._embedding_service is None:
+            from .embeddings import get_embedding_service
+
+            self._embedding_service = get_embedding_service(self.manifest["embedding_model_name"])
+
+        return self._embedding_service
+
+    def chunk_id(self, row):
+        """Chunk id stored at one row."""
+        return bytes(self._ids[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def search(self, query_embeddings, k=None, document_ids=None):
+        """
+        Exact top k by cosine similarity.
+
+        Args:
+            query_embeddings: One query vector, or a (m, dim) array of them
+            k: Results per query
+            document_ids: Optional ids, only chunks of these documents are searched
+
+        Returns:
+            Tuple of (rows, scores), each a (m, k) array (fewer columns if fewer rows match), best first
+        """
+        if self.embeddings is None:
+            raise ValueError(f"{self.path} only holds int8 vectors, search it with QuantizedVectorIndex")
+
+        k = k or settings.top_k
+        queries = normalize_queries(query_embeddings)
+
+        return self._scan(queries, k, document_ids, self._score_block)
+
+    def _score_block(self, start, stop, queries):
+        """Cosine similarities of rows start:stop with every query, a (rows, m) array."""
+        return np.asarray(self.embeddings[start:stop], dtype=np.float32) @ queries.T
+
+    def _scan(self, queries, k, document_ids, score_block):
+        """Blocked top k over every row, scoring each block with score_block(start, stop, queries)."""
+        allowed = np.asarray(sorted(document_ids), dtype=np.int64) if document_ids is not None else None
+
+        best_rows = np.empty((0, len(queries)), dtype=np.int64)
+        best_scores = np.empty((0, len(queries)), dtype=np.float32)
+
+        for start in range(0, len(self), self.block_rows):
+            stop = min(start + self.block_rows, len(self))
+            mask = None
+
+            if allowed is not None:
+                mask = np.isin(self.document_ids[start:stop], allowed)
+
+                if not mask.any():
+                    continue
+
+            scores = score_block(start, stop, queries) # (block, m)
+
+            if mask is not None:
+                scores[~mask] = -np.inf
+
+            top = top_k_rows(scores, k)
+
+            # Merge the block's winners into the running top k
+            rows = np.concatenate([best_rows, top + start])
+            merged = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=0)])
+            keep = top_k_rows(merged, k)
+
+            best_rows = np.take_along_axis(rows, keep, axis=0)
+            best_scores = np.take_along_axis(merged, keep, axis=0)
+
+        rows, scores = best_rows.T, best_scores.T
+        valid = np.isfinite(scores).all(axis=0) # Filtered-out rows only show up when fewer than k rows match
+
+        return rows[:, valid], scores[:, valid]
+
+    def similarity_search(self, query, k=None, filter_dict=None):
+        """
+        Same ranking as ChromaStore.similarity_search, served from the snapshot.
+
+        Args:
+            query: Query text, or a query vector
+            k: Number of results
+            filter_dict: Optional where filter, only document_id restrictions are supported
+
+        Returns:
+            A list of dictionaries with chunk_id, document_id and similarity_score, best first
+        """
+        document_ids = filter_values(filter_dict, "document_id")
+
+        if filter_dict and document_ids is None:
+            raise ValueError("Snapshots only store document ids, filter with {'document_id': {'$in': [...]}}")
+
+        query_embedding = self.embedding_service.embed_query(query) if isinstance(query, str) else query
+        rows, scores = self.search(query_embedding, k, document_ids)
+
+        return [
+            {"chunk_id": self.chunk_id(row), "document_id": int(self.document_ids[row]), "similarity_score": float(score)}
+            for row, score in zip(rows[0], scores[0])
+        ]
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from src.config import settings
+from src.db import session as db_session
+from src.vectorstore.embeddings import EmbeddingService
+
+class SSEStub:
+    """
+    What the stub server answers to POST /chat/completions.
+
+    events are written one by one as "data: ..." lines, dicts as JSON, strings as they are. drop closes the
+    connection without ending the chunked body, like a server dying mid-answer.
+    """
+    def __init__(self):
+        self.status = 200
+        self.error_body = ""
+        self.events = []
+        self.drop = False
+        self.requests = []
+
+    def stream(self, tokens, done=True):
+        """Answer with one OpenAI-style delta event per token."""
+        self.events = [{"choices": [{"index": 0, "delta": {"content": token}}]} for token in tokens]
+
+        if done:
+            self.events.append("[DONE]")
+
+class SSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Chunked responses, so a dropped connection is detectable
+
+    def do_POST(self):
+        stub = self.server.stub
+        stub.requests.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+
+        if stub.status != 200:
+            body = stub.error_body.encode("utf-8")
+
+            self.send_response(stub.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for event in stub.events:
+            data = f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("utf-8") + data + b"\r\n")
+            self.wfile.flush()
+
+        if stub.drop:
+            self.close_connection = True
+            return
+
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def sse_server():
+    """An http.server speaking the chat completions SSE protocol, yields (base_url, SSEStub)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SSEHandler)
+    server.stub = SSEStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1", server.stub
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+def hash_vector(text, dim=32):
+    """Deterministic bag of words vector: every word adds one to a bucket picked by its hash."""
+    vector = np.full(dim, 1e-3, dtype=np.float32)
+
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.sha256(word.encode("utf-8")).hexdigest(), 16) % dim] += 1
+
+    return vector / np.linalg.norm(vector)
+
+class HashEmbeddingService(EmbeddingService):
+    """EmbeddingService with hash_vector in place of the model, counting the texts it encodes."""
+    def __init__(self):
+        super().__init__("hash-test-model")
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        return np.stack([hash_vector(text) for text in texts])
+
+    def embed_queries(self, texts):
+        return [hash_vector(text).tolist() for text in texts]
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Points the metadata database at a fresh file under tmp_path."""
+    monkeypatch.setattr(settings, "sqlite_db_path", tmp_path / "brainy_binder.db")
+    monkeypatch.setattr(db_session, "engine", None)
+    monkeypatch.setattr(db_session, "session_factory", None)
+    db_session.init_db()
+
+    yield tmp_path / "brainy_binder.db"
+
+    db_session.engine.dispose()
+
+@pytest.fixture
+def embedding_service(temp_db):
+    return HashEmbeddingService()
+
+@pytest.fixture
+def chroma_store(tmp_path, embedding_service):
+    from src.vectorstore.chroma_store import ChromaStore
+
+    return ChromaStore(persist_dir=str(tmp_path / "chroma"), collection_name="test", embedding_service=embedding_service, shard_by="")
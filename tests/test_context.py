@@ -0,0 +1,103 @@
+from langchain_core.documents import Document
+
+from src.rag.context import ContextPacker, merge_chunks, strip_overlap
+from src.rag.summarizer import CHARS_PER_TOKEN, estimate_tokens
+
+TEXT = (
+    "Binders keep loose notes in order. Each note is split into chunks before it is embedded, "
+    "and neighbouring chunks repeat a little text so no sentence is cut in half."
+)
+
+def overlapping_chunks(text, size=70, overlap=25, document_id=1, source_path="notes.md"):
+    """Chunks of text the way the splitter cuts them, every chunk repeating the last overlap characters."""
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        chunks.append(Document(
+            page_content=text[start:start + size],
+            metadata={"document_id": document_id, "chunk_index": len(chunks), "source_path": source_path}
+        ))
+
+        if start + size >= len(text):
+            break
+
+        start += size - overlap
+
+    return chunks
+
+# strip_overlap / merge_chunks
+
+def test_strip_overlap_finds_the_repeated_text():
+    left = "The quick brown fox jumps over the lazy dog"
+    right = "jumps over the lazy dog and keeps running"
+
+    assert strip_overlap(left, right) == len("jumps over the lazy dog")
+
+def test_strip_overlap_ignores_short_or_missing_matches():
+    assert strip_overlap("first sentence ends here", "second sentence starts here") == 0
+    assert strip_overlap("ends with the dog", "the dog starts", min_overlap=20) == 0
+
+def test_strip_overlap_prefers_the_longest_match():
+    left = "abababababababababababababab"
+    right = "ababababababababababababababX"
+
+    assert strip_overlap(left, right) == len(left)
+
+def test_merge_chunks_restores_the_original_text():
+    chunks = overlapping_chunks(TEXT)
+
+    assert len(chunks) > 2
+    assert merge_chunks(chunks) == TEXT
+
+def test_merge_chunks_without_overlap_separates_paragraphs():
+    chunks = [Document(page_content="First paragraph."), Document(page_content="Second paragraph.")]
+
+    assert merge_chunks(chunks) == "First paragraph.\n\nSecond paragraph."
+
+def test_merge_chunks_drops_repeated_section_heading():
+    chunks = [
+        Document(page_content="## Setup\nInstall the package first.", metadata={"section": "Setup"}),
+        Document(page_content="## Setup\nThen run the ingest command.", metadata={"section": "Setup"}),
+    ]
+
+    assert merge_chunks(chunks) == "## Setup\nInstall the package first.\n\nThen run the ingest command."
+
+# ContextPacker
+
+def test_pack_merges_neighbours_and_dedupes():
+    chunks = overlapping_chunks(TEXT)
+    duplicate = Document(page_content=chunks[0].page_content, metadata={"source_path": "copy.md"})
+    ranked = [chunks[1], chunks[0], duplicate, chunks[2]] # The first of two equal texts is kept
+
+    packed, used = ContextPacker(token_budget=1000).pack(ranked)
+
+    assert packed == [{"content": merge_chunks(chunks[:3]), "source": "notes.md"}]
+    assert used == [chunks[1], chunks[0], chunks[2]]
+
+def test_pack_keeps_ranking_between_documents():
+    first = Document(page_content="Best match.", metadata={"document_id": 2, "chunk_index": 5, "source_path": "b.md"})
+    second = Document(page_content="Second match.", metadata={"document_id": 1, "chunk_index": 0, "source_path": "a.md"})
+    gap = Document(page_content="Not a neighbour.", metadata={"document_id": 2, "chunk_index": 7, "source_path": "b.md"})
+
+    packed, _ = ContextPacker(token_budget=1000).pack([first, second, gap])
+
+    assert [passage["content"] for passage in packed] == ["Best match.", "Second match.", "Not a neighbour."]
+
+def test_pack_skips_passages_over_the_budget_but_fills_with_smaller_ones():
+    best = Document(page_content="best " * 10, metadata={"source_path": "a.md"})
+    large = Document(page_content="large " * 100, metadata={"source_path": "b.md"})
+    small = Document(page_content="small", metadata={"source_path": "c.md"})
+    budget = estimate_tokens(best.page_content) + estimate_tokens(small.page_content)
+
+    _, used = ContextPacker(token_budget=budget).pack([best, large, small])
+
+    assert used == [best, small]
+
+def test_pack_cuts_the_best_passage_to_the_budget():
+    large = Document(page_content="x" * 1000, metadata={"source_path": "a.md"})
+
+    packed, used = ContextPacker(token_budget=10).pack([large])
+
+    assert packed[0]["content"] == "x" * (10 * CHARS_PER_TOKEN)
+    assert used == [large]
@@ -0,0 +1,95 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.rag.fusion import reciprocal_rank_fusion
+from src.vectorstore.lexical_index import LexicalIndex
+
+def doc(chunk_id, text=None, **metadata):
+    return Document(page_content=text or f"text of {chunk_id}", metadata=dict(metadata, chunk_id=chunk_id))
+
+def chunk_ids(documents):
+    return [d.metadata["chunk_id"] for d in documents]
+
+# reciprocal_rank_fusion
+
+def test_rrf_known_ordering():
+    vector = [doc("a"), doc("b"), doc("c")]
+    lexical = [doc("c"), doc("a"), doc("d")]
+
+    fused = reciprocal_rank_fusion([vector, lexical], rrf_k=60)
+
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62, d: 1/63
+    assert chunk_ids(fused) == ["a", "c", "b", "d"]
+    assert fused[0].metadata["rrf_score"] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[-1].metadata["rrf_score"] == pytest.approx(1 / 63)
+
+def test_rrf_agreement_beats_one_top_rank():
+    # Second in both lists outranks first in only one
+    fused = reciprocal_rank_fusion([[doc("x"), doc("both")], [doc("y"), doc("both")]], rrf_k=60)
+
+    assert chunk_ids(fused)[0] == "both"
+
+def test_rrf_returns_k_and_merges_metadata():
+    vector = [doc("a", similarity_score=0.9), doc("b")]
+    lexical = [doc("a", bm25_score=4.2), doc("c")]
+
+    fused = reciprocal_rank_fusion([vector, lexical], k=2, rrf_k=60)
+
+    assert chunk_ids(fused) == ["a", "b"]
+    assert fused[0].metadata["similarity_score"] == 0.9
+    assert fused[0].metadata["bm25_score"] == 4.2
+
+def test_rrf_without_chunk_ids_keys_on_text():
+    fused = reciprocal_rank_fusion([[Document(page_content="same")], [Document(page_content="same")]], rrf_k=60)
+
+    assert len(fused) == 1
+    assert fused[0].metadata["rrf_score"] == pytest.approx(2 / 61)
+
+# LexicalIndex
+
+@pytest.fixture
+def lexical_index(temp_db):
+    index = LexicalIndex()
+    index.upsert_chunks(
+        ["1-0", "1-1", "2-0"],
+        [
+            Document(page_content="Restart the worker when ERR_4021 shows up in the log.", metadata={"document_id": 1}),
+            Document(page_content="The worker reads its settings from the environment.", metadata={"document_id": 1}),
+            Document(page_content="Binders hold notes about indexing and search.", metadata={"document_id": 2}),
+        ]
+    )
+
+    return index
+
+def test_lexical_search_finds_exact_identifier(lexical_index):
+    results = lexical_index.search("what does err_4021 mean", k=3)
+
+    assert chunk_ids(results) == ["1-0"]
+    assert results[0].metadata["document_id"] == 1
+    assert results[0].metadata["bm25_score"] > 0
+
+def test_lexical_search_ranks_by_bm25(lexical_index):
+    results = lexical_index.search("worker environment", k=3)
+
+    assert chunk_ids(results) == ["1-1", "1-0"] # Matches both words before matching one
+
+def test_lexical_search_filters_by_document(lexical_index):
+    assert chunk_ids(lexical_index.search("worker notes", filter_dict={"document_id": {"$in": [2]}})) == ["2-0"]
+    assert lexical_index.search("worker", filter_dict={"document_id": {"$in": []}}) == []
+
+def test_lexical_search_without_words_returns_nothing(lexical_index):
+    assert lexical_index.search("?! ...") == []
+
+def test_lexical_upsert_replaces_same_chunk_id(lexical_index):
+    lexical_index.upsert_chunks(["1-0"], [Document(page_content="Rotate the API keys every month.", metadata={"document_id": 1})])
+
+    assert lexical_index.count() == 3
+    assert lexical_index.search("err_4021") == []
+    assert chunk_ids(lexical_index.search("rotate keys")) == ["1-0"]
+
+def test_lexical_delete_by_document_keeps_ids(lexical_index):
+    lexical_index.delete_by_document(1, keep_ids=["1-1"])
+
+    assert lexical_index.count() == 2
+    assert lexical_index.search("err_4021") == []
+    assert chunk_ids(lexical_index.search("worker")) == ["1-1"]
@@ -0,0 +1,186 @@
+import os
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from src.config import settings
+from src.db.models import Document as dbDocument
+from src.db.session import get_session
+from src.ingestion.chunking import chunk_documents
+from src.ingestion.loaders import load_document
+from src.ingestion import pipeline
+from src.ingestion.pipeline import IngestionPipeline
+
+NOTES = {
+    "alpha.md": "# Alpha\n\nAlpha notes about binders.\n\n" + "Alpha paragraph sentence. " * 80,
+    "beta.txt": "Beta plain text about indexing. " * 60,
+    "sub/gamma.md": "# Gamma\n\nGamma is short.",
+}
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / "data"
+
+    for name, text in NOTES.items():
+        (data_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (data_dir / name).write_text(text, encoding="utf-8")
+
+    return data_dir
+
+@pytest.fixture
+def ingest(mocker, data_dir, chroma_store):
+    """Runs a fresh pipeline over data_dir against the temp stores, returns its stats."""
+    mocker.patch("src.ingestion.pipeline.ChromaStore", return_value=chroma_store)
+
+    def run():
+        return IngestionPipeline(reset_index=False, data_dir=data_dir, num_workers=2).run()
+
+    return run
+
+def expected_chunks(data_dir):
+    """Chunks the pipeline should have stored for the files currently in data_dir."""
+    return sum(len(chunk_documents(load_document(path))[0]) for path in sorted(data_dir.rglob("*")) if path.is_file())
+
+def write_pdf(path, pages):
+    """A PDF with one line of Helvetica text per page."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"), NameObject("/BaseFont"): NameObject("/Helvetica")
+    }))
+
+    for text in pages:
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+
+    with open(path, "wb") as f:
+        writer.write(f)
+
+def document_rows():
+    with get_session() as session:
+        return {row.path: row for row in session.query(dbDocument).all()}
+
+def lexical_count():
+    from src.vectorstore.lexical_index import LexicalIndex
+
+    return LexicalIndex().count()
+
+def assert_index_matches(data_dir, chroma_store):
+    n = expected_chunks(data_dir)
+
+    assert chroma_store.count() == n
+    assert lexical_count() == n
+    assert set(document_rows()) == {str(path) for path in data_dir.rglob("*") if path.is_file()}
+    assert chroma_store.document_ids() == {row.id for row in document_rows().values()}
+
+def test_first_ingest_indexes_every_file(data_dir, chroma_store, ingest):
+    stats = ingest()
+
+    assert stats["files_processed"] == len(NOTES)
+    assert stats["files_failed"] == 0
+    assert stats["chunks_created"] == expected_chunks(data_dir)
+    assert_index_matches(data_dir, chroma_store)
+
+    for path, row in document_rows().items():
+        stat = os.stat(path)
+        assert (row.file_size, row.file_mtime) == (stat.st_size, stat.st_mtime)
+        assert row.content_hash is not None
+
+def test_unchanged_files_are_skipped_on_stat(data_dir, chroma_store, embedding_service, ingest, mocker):
+    ingest()
+    encoded = embedding_service.encoded
+    hash_file = mocker.spy(pipeline, "hash_file")
+
+    stats = ingest()
+
+    assert stats["files_processed"] == 0
+    assert stats["chunks_created"] == 0
+    assert embedding_service.encoded == encoded
+    hash_file.assert_not_called() # Nothing was even hashed, the stat matched
+    assert_index_matches(data_dir, chroma_store)
+
+def test_touched_file_is_rehashed_but_not_reembedded(data_dir, chroma_store, embedding_service, ingest):
+    ingest()
+    encoded = embedding_service.encoded
+    path = data_dir / "alpha.md"
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 100))
+
+    stats = ingest()
+
+    assert stats["files_processed"] == 0
+    assert embedding_service.encoded == encoded
+    assert document_rows()[str(path)].file_mtime == path.stat().st_mtime # Next run skips it on stat again
+    assert_index_matches(data_dir, chroma_store)
+
+def test_changed_file_keeps_its_id_and_replaces_its_chunks(data_dir, chroma_store, ingest):
+    ingest()
+    path = data_dir / "alpha.md"
+    document_id = document_rows()[str(path)].id
+    old_chunk_ids = set(chroma_store.collection.get(where={"document_id": document_id}, include=[])["ids"])
+
+    path.write_text("# Alpha\n\nRewritten from scratch, nothing of the old text is left.", encoding="utf-8")
+    stats = ingest()
+
+    new_chunk_ids = set(chroma_store.collection.get(where={"document_id": document_id}, include=[])["ids"])
+
+    assert stats["files_processed"] == 1
+    assert document_rows()[str(path)].id == document_id
+    assert new_chunk_ids and not new_chunk_ids & old_chunk_ids
+    assert_index_matches(data_dir, chroma_store)
+
+def test_appended_file_keeps_unchanged_chunks(data_dir, chroma_store, ingest):
+    ingest()
+    path = data_dir / "beta.txt"
+    document_id = document_rows()[str(path)].id
+    old_chunk_ids = set(chroma_store.collection.get(where={"document_id": document_id}, include=[])["ids"])
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n\nA new closing paragraph about something else entirely. " * 20)
+
+    ingest()
+    new_chunk_ids = set(chroma_store.collection.get(where={"document_id": document_id}, include=[])["ids"])
+
+    assert old_chunk_ids & new_chunk_ids # Chunks before the edit survive (keep_ids), only the tail changed
+    assert new_chunk_ids - old_chunk_ids
+    assert_index_matches(data_dir, chroma_store)
+
+def test_deleted_file_is_purged_everywhere(data_dir, chroma_store, ingest):
+    ingest()
+    path = data_dir / "sub" / "gamma.md"
+    document_id = document_rows()[str(path)].id
+
+    path.unlink()
+    ingest()
+
+    assert str(path) not in document_rows()
+    assert document_id not in chroma_store.document_ids()
+    assert_index_matches(data_dir, chroma_store)
+
+def test_failed_write_leaves_the_file_to_retry(data_dir, chroma_store, ingest, mocker):
+    upsert = mocker.patch.object(chroma_store, "upsert_documents", side_effect=RuntimeError("vector store down"))
+
+    stats = ingest()
+
+    assert stats["files_failed"] == len(NOTES)
+    assert all(row.content_hash is None and row.file_size is None for row in document_rows().values())
+
+    mocker.stop(upsert)
+    stats = ingest()
+
+    assert stats["files_processed"] == len(NOTES)
+    assert_index_matches(data_dir, chroma_store)
+
+def test_long_pdf_is_streamed_whatever_its_size(data_dir, chroma_store, ingest, mocker, monkeypatch):
+    write_pdf(data_dir / "short.pdf", ["A short PDF about binders."])
+    write_pdf(data_dir / "long.pdf", [f"Page {i} of a long PDF about indexing." for i in range(5)])
+    monkeypatch.setattr(settings, "stream_threshold_pages", 3)
+    stream_file = mocker.spy(IngestionPipeline, "_stream_file")
+
+    stats = ingest()
+
+    assert [call.args[1].name for call in stream_file.call_args_list] == ["long.pdf"]
+    assert stats["files_processed"] == len(NOTES) + 2
+    assert_index_matches(data_dir, chroma_store)
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from src.vectorstore.quantization import QuantizedVectorIndex, quantize_snapshot
+from src.vectorstore.snapshot import MemmapVectorIndex, export_snapshot, top_k_rows
+
+N, DIM = 1000, 16
+
+class ArrayStore:
+    """The part of ChromaStore export_snapshot reads, over a fixed (n, dim) array."""
+    collection_name = "test"
+
+    def __init__(self, vectors, document_ids):
+        self.vectors = vectors
+        self.document_ids = document_ids
+        self.embedding_service = type("Service", (), {"model_name": "array-test-model"})()
+
+    def count(self):
+        return len(self.vectors)
+
+    def iter_batches(self, page_size=1000, include=None):
+        for start in range(0, len(self.vectors), page_size):
+            rows = range(start, min(start + page_size, len(self.vectors)))
+            yield [f"chunk-{row}" for row in rows], {
+                "embeddings": self.vectors[start:start + page_size].tolist(),
+                "metadatas": [{"document_id": int(self.document_ids[row])} for row in rows],
+            }
+
+@pytest.fixture
+def vectors():
+    vectors = np.random.default_rng(0).standard_normal((N, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.fixture
+def queries():
+    return np.random.default_rng(1).standard_normal((8, DIM)).astype(np.float32)
+
+@pytest.fixture
+def document_ids():
+    return np.arange(N) // 10 # Ten chunks per document
+
+@pytest.fixture
+def snapshot_dir(tmp_path, vectors, document_ids):
+    export_snapshot(ArrayStore(vectors, document_ids), tmp_path / "snapshot", dtype="float32", page_size=128)
+    return tmp_path / "snapshot"
+
+def brute_force(vectors, queries, k):
+    """Reference top k: every score, fully sorted."""
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ vectors.T
+
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k], -np.sort(-scores, axis=1)[:, :k]
+
+def test_top_k_rows_is_sorted_per_column():
+    scores = np.array([[0.1, 0.9], [0.7, 0.2], [0.4, 0.5], [0.9, 0.1]])
+
+    assert top_k_rows(scores, 2).tolist() == [[3, 0], [1, 2]]
+    assert top_k_rows(scores, 10).shape == (4, 2) # k is capped at the number of rows
+
+def test_export_writes_ids_and_manifest(snapshot_dir, document_ids):
+    index = MemmapVectorIndex(snapshot_dir)
+
+    assert len(index) == N
+    assert index.manifest["dim"] == DIM
+    assert index.manifest["embedding_model_name"] == "array-test-model"
+    assert index.chunk_id(0) == "chunk-0"
+    assert index.chunk_id(N - 1) == f"chunk-{N - 1}"
+    assert np.array_equal(index.document_ids, document_ids)
+
+@pytest.mark.parametrize("block_rows", [7, 100, N, 5000])
+def test_blocked_search_matches_brute_force(snapshot_dir, vectors, queries, block_rows):
+    rows, scores = MemmapVectorIndex(snapshot_dir, block_rows=block_rows).search(queries, k=10)
+    expected_rows, expected_scores = brute_force(vectors, queries, 10)
+
+    assert np.array_equal(rows, expected_rows)
+    assert np.allclose(scores, expected_scores, atol=1e-5)
+
+def test_search_is_restricted_to_document_ids(snapshot_dir, vectors, queries, document_ids):
+    allowed = {3, 42, 77}
+    rows, _ = MemmapVectorIndex(snapshot_dir, block_rows=64).search(queries, k=5, document_ids=allowed)
+
+    subset = np.flatnonzero(np.isin(document_ids, list(allowed)))
+    expected_rows, _ = brute_force(vectors[subset], queries, 5)
+
+    assert np.array_equal(rows, subset[expected_rows])
+
+def test_search_returns_fewer_columns_when_fewer_rows_match(snapshot_dir, queries):
+    rows, scores = MemmapVectorIndex(snapshot_dir, block_rows=64).search(queries, k=20, document_ids={5})
+
+    assert rows.shape == scores.shape == (len(queries), 10)
+    assert set(rows.ravel()) == set(range(50, 60))
+
+def test_export_replaces_a_snapshot_but_not_other_directories(tmp_path, snapshot_dir, vectors, document_ids):
+    store = ArrayStore(vectors[:10], document_ids[:10])
+
+    assert export_snapshot(store, snapshot_dir)["count"] == 10
+
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "notes.md").write_text("keep me", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="doesn't hold a snapshot"):
+        export_snapshot(store, other)
+
+    assert (other / "notes.md").read_text(encoding="utf-8") == "keep me"
+
+# Int8 quantization
+
+def test_quantized_codes_reconstruct_the_vectors(snapshot_dir, vectors):
+    manifest = quantize_snapshot(snapshot_dir, block_rows=64)
+    index = QuantizedVectorIndex(snapshot_dir)
+
+    assert manifest["quantization"] == {"type": "int8", "full_precision": True}
+    assert index.codes.dtype == np.int8
+    assert np.abs(index.codes).max() == 127
+    assert (np.abs(index.codes * index.scales - vectors) <= index.scales / 2 + 1e-6).all() # Within half a step per dimension
+
+def test_quantized_search_with_rescoring_is_exact(snapshot_dir, vectors, queries):
+    quantize_snapshot(snapshot_dir)
+    rows, scores = QuantizedVectorIndex(snapshot_dir, block_rows=100).search(queries, k=10, rescore_factor=4)
+    expected_rows, expected_scores = brute_force(vectors, queries, 10)
+
+    assert np.array_equal(rows, expected_rows)
+    assert np.allclose(scores, expected_scores, atol=1e-5) # Scores come from the full precision vectors
+
+def test_quantized_search_without_rescoring_is_close(snapshot_dir, vectors, queries):
+    quantize_snapshot(snapshot_dir)
+    rows, _ = QuantizedVectorIndex(snapshot_dir, block_rows=100).search(queries, k=10, rescore_factor=0)
+    expected_rows, _ = brute_force(vectors, queries, 10)
+
+    recall = np.mean([len(set(got) & set(expected)) / 10 for got, expected in zip(rows, expected_rows)])
+    assert recall >= 0.9
+
+def test_quantized_only_snapshot_ranks_by_codes(snapshot_dir, vectors, queries):
+    quantize_snapshot(snapshot_dir, keep_full_precision=False)
+    index = QuantizedVectorIndex(snapshot_dir)
+
+    assert index.embeddings is None
+    rows, _ = index.search(queries, k=10)
+    assert rows.shape == (len(queries), 10)
+
+    with pytest.raises(ValueError, match="only holds int8 vectors"):
+        MemmapVectorIndex(snapshot_dir).search(queries, k=10)
+
+def test_unquantized_snapshot_is_refused(snapshot_dir):
+    with pytest.raises(ValueError, match="has no int8 vectors"):
+        QuantizedVectorIndex(snapshot_dir)
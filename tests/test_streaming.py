@@ -0,0 +1,150 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.llm.client import MistralClient
+from src.rag.answer_engine import AnswerEngine
+
+MESSAGES = [{"role": "user", "content": "What is a binder?"}]
+TOKENS = ["A ", "binder ", "holds ", "notes", "."]
+
+@pytest.fixture
+def llm_client(sse_server):
+    base_url, _ = sse_server
+    client = MistralClient(base_url=base_url, model_name="stub-model", max_retries=0)
+
+    yield client
+
+    client.close()
+
+@pytest.fixture
+def engine(mocker, llm_client):
+    response_cache = mocker.Mock()
+    response_cache.get.return_value = None
+
+    engine = AnswerEngine(
+        chroma_store=mocker.Mock(), llm_client=llm_client, lexical_index=mocker.Mock(), response_cache=response_cache,
+        rerank=False, reranker=mocker.Mock()
+    )
+
+    documents = [Document(page_content="A binder holds notes.", metadata={"document_id": 1, "chunk_index": 0, "chunk_id": "1-0", "source_path": "notes.md"})]
+    mocker.patch.object(engine, "retrieve", return_value=documents)
+
+    return engine
+
+# MistralClient.chat_stream
+
+def test_chat_stream_yields_tokens_in_order(sse_server, llm_client):
+    _, stub = sse_server
+    stub.stream(TOKENS)
+    stub.events.insert(0, {"choices": [{"index": 0, "delta": {"role": "assistant"}}]}) # First event has no content
+
+    assert list(llm_client.chat_stream(MESSAGES)) == TOKENS
+    assert stub.requests[0]["stream"] is True
+    assert stub.requests[0]["messages"] == MESSAGES
+
+def test_chat_stream_stops_at_done(sse_server, llm_client):
+    _, stub = sse_server
+    stub.stream(TOKENS)
+    stub.events.append({"choices": [{"index": 0, "delta": {"content": "after done"}}]})
+
+    assert list(llm_client.chat_stream(MESSAGES)) == TOKENS
+
+def test_chat_stream_without_done_raises(sse_server, llm_client):
+    _, stub = sse_server
+    stub.stream(TOKENS, done=False)
+    tokens = []
+
+    with pytest.raises(Exception, match=r"ended before \[DONE\]"):
+        for token in llm_client.chat_stream(MESSAGES):
+            tokens.append(token)
+
+    assert tokens == TOKENS
+
+def test_chat_stream_http_error_includes_status_and_body(sse_server, llm_client):
+    _, stub = sse_server
+    stub.status = 401
+    stub.error_body = '{"error": "invalid api key"}'
+
+    with pytest.raises(Exception, match="LLM request failed") as info:
+        list(llm_client.chat_stream(MESSAGES))
+
+    assert "401" in str(info.value)
+    assert "invalid api key" in str(info.value)
+
+def test_chat_stream_error_event_raises_after_earlier_tokens(sse_server, llm_client):
+    _, stub = sse_server
+    stub.stream(TOKENS[:2], done=False)
+    stub.events += [{"error": {"message": "model overloaded"}}, "[DONE]"]
+    tokens = []
+
+    with pytest.raises(Exception, match="mid-stream: .*model overloaded"):
+        for token in llm_client.chat_stream(MESSAGES):
+            tokens.append(token)
+
+    assert tokens == TOKENS[:2]
+
+def test_chat_stream_dropped_connection_raises(sse_server, llm_client):
+    _, stub = sse_server
+    stub.stream(TOKENS[:2], done=False)
+    stub.drop = True
+
+    with pytest.raises(Exception, match="LLM request failed"):
+        list(llm_client.chat_stream(MESSAGES))
+
+# AnswerEngine.answer_question_stream
+
+def test_answer_stream_is_lazy_and_caches_the_full_answer(sse_server, engine):
+    _, stub = sse_server
+    stub.stream(TOKENS)
+
+    tokens, sources = engine.answer_question_stream("What is a binder?")
+
+    assert stub.requests == [] # Nothing is sent before the tokens are consumed
+    assert [doc.metadata["chunk_id"] for doc in sources] == ["1-0"]
+    assert list(tokens) == TOKENS
+    assert len(stub.requests) == 1
+
+    engine.response_cache.put.assert_called_once()
+    _, answer, document_ids = engine.response_cache.put.call_args.args
+    assert answer == "".join(TOKENS)
+    assert document_ids == [1]
+
+def test_answer_stream_serves_cached_answer_without_request(sse_server, engine):
+    _, stub = sse_server
+    engine.response_cache.get.return_value = "cached answer"
+
+    tokens, _ = engine.answer_question_stream("What is a binder?")
+
+    assert list(tokens) == ["cached answer"]
+    assert stub.requests == []
+
+def test_answer_stream_http_error_is_raised_and_not_cached(sse_server, engine):
+    _, stub = sse_server
+    stub.status = 503
+    stub.error_body = "upstream unavailable"
+
+    tokens, _ = engine.answer_question_stream("What is a binder?")
+
+    with pytest.raises(Exception, match="503"):
+        list(tokens)
+
+    engine.response_cache.put.assert_not_called()
+
+@pytest.mark.parametrize("events", [
+    [{"error": {"message": "model overloaded"}}],
+    [], # Stream ends without [DONE]
+])
+def test_answer_stream_mid_stream_error_keeps_partial_answer_out_of_cache(sse_server, engine, events):
+    _, stub = sse_server
+    stub.stream(TOKENS[:2], done=False)
+    stub.events += events
+    received = []
+
+    tokens, _ = engine.answer_question_stream("What is a binder?")
+
+    with pytest.raises(Exception, match="LLM request failed"):
+        for token in tokens:
+            received.append(token)
+
+    assert received == TOKENS[:2]
+    engine.response_cache.put.assert_not_called()